@@ -1,28 +1,41 @@
 import sys
-import tables
 from collections import OrderedDict
 import datetime
+import time
 import os
+import json
 import numpy as np
 from copy import deepcopy
-from qtpy import QtGui, QtWidgets
+from qtpy import QtGui, QtWidgets, QtCore
 from qtpy.QtCore import QObject, Slot, Signal, QLocale, QDateTime, QRectF, QDate, QThread, Qt
 from pathlib import Path
-import pickle
 from pyqtgraph.dockarea import Dock
 from pymodaq.daq_utils.gui_utils import DockArea, select_file
 from pyqtgraph.parametertree import Parameter, ParameterTree
 import pyqtgraph.parametertree.parameterTypes as pTypes
 import pymodaq.daq_utils.custom_parameter_tree as custom_tree
-from pymodaq.daq_utils.daq_utils import Enm2cmrel, Ecmrel2Enm, nm2eV, eV2nm, eV2radfs, l2w, getLineInfo, ThreadCommand
-from pymodaq.daq_utils.plotting.qled import QLED
-from pymodaq.daq_viewer.daq_viewer_main import DAQ_Viewer
+from pymodaq.daq_utils.daq_utils import getLineInfo, ThreadCommand
+try:
+    from pymodaq.daq_utils.gui_utils.widgets.qled import QLED
+except ImportError:  # pymodaq < 3.5.6
+    from pymodaq.daq_utils.plotting.qled import QLED
 from pymodaq.daq_utils.plotting.viewer1D.viewer1D_main import Viewer1D
 from pymodaq.daq_utils import daq_utils as utils
-from pymodaq.daq_utils.h5modules import H5Browser, H5Saver, browse_data, H5BrowserUtil
-from pymodaq_spectro.utils.calibration import Calibration
-from pymodaq.dashboard import DashBoard
-from units_converter.main import UnitsConverter
+from pymodaq_spectro.utils.spectro_detector import SpectroDetector, merge_spectra
+from pymodaq_spectro.utils.instrumentation import FrameInstrumentation, DiagnosticsWidget
+from pymodaq_spectro.utils.decimation import decimate_axis, decimate_minmax, lod_bins
+from pymodaq_spectro.utils import units
+from pymodaq_spectro.utils.log_model import LogModel, LogView
+from pymodaq_spectro.utils.rate_limit import RateLimiter
+from pymodaq_spectro.utils.calibration_store import CalibrationStore
+from pymodaq_spectro.utils import session
+from pymodaq_spectro.utils import reduction
+from pymodaq_spectro.utils.indexing import range_to_indexes
+from pymodaq_spectro.utils import baseline
+from pymodaq_spectro.utils import filters
+# heavy modules (DashBoard, h5modules, Calibration with pandas/scipy, UnitsConverter) and the feature modules (server,
+# shared memory, sequencer, mapping, analysis docks) are imported where first used to keep the application startup
+# fast, see utils.benchmarks.import_time
 
 import logging
 
@@ -47,11 +60,54 @@ class Spectrometer(QObject):
     params = [{'title': 'Configuration settings:', 'name': 'config_settings', 'type': 'group', 'children': [
                         {'title': 'Laser wavelength (nm):', 'name': 'laser_wl', 'type': 'float', 'value': 515.},
                         {'title': 'Laser wavelength (nm):', 'name': 'laser_wl_list', 'type': 'list', 'limits':['']},
+                        {'title': 'Selected Detector:', 'name': 'selected_det', 'type': 'list', 'limits': []},
                         {'title': 'Current Detector:', 'name': 'curr_det', 'type': 'str', 'value': ''},
+                        {'title': 'Display detectors:', 'name': 'display_mode', 'type': 'list', 'value': 'Side by side',
+                         'limits': ['Side by side', 'Merged']},
+                        {'title': 'Remote server:', 'name': 'server', 'type': 'group', 'expanded': False, 'children': [
+                            {'title': 'Enable:', 'name': 'server_enabled', 'type': 'bool', 'value': False, 'tooltip':
+                                'Publish the spectra and accept commands on a local TCP port'},
+                            {'title': 'Port:', 'name': 'server_port', 'type': 'int', 'value': 6341},
+                            {'title': 'Max client buffer (kB):', 'name': 'server_buffer_kb', 'type': 'int',
+                             'value': 4096, 'min': 1},
+                        ]},
+                        {'title': 'Shared memory:', 'name': 'shm', 'type': 'group', 'expanded': False, 'children': [
+                            {'title': 'Enable:', 'name': 'shm_enabled', 'type': 'bool', 'value': False, 'tooltip':
+                                'Publish the frames in a shared memory ring buffer named prefix_detectortitle'},
+                            {'title': 'Prefix:', 'name': 'shm_prefix', 'type': 'str', 'value': 'pymodaq_spectro'},
+                            {'title': 'Slots:', 'name': 'shm_slots', 'type': 'int', 'value': 64, 'min': 2},
+                        ]},
+                        {'title': 'Session:', 'name': 'session', 'type': 'group', 'expanded': False, 'children': [
+                            {'title': 'Restore at startup:', 'name': 'restore_session', 'type': 'bool',
+                             'value': True, 'tooltip': 'Restore the layout, settings, detectors and calibrations '
+                                                       'of the last session'},
+                            {'title': 'Autosave (s):', 'name': 'autosave_s', 'type': 'int', 'value': 30, 'min': 0,
+                             'tooltip': 'Interval of the session snapshots (0 to only save when quitting)'},
+                        ]},
+                        {'title': 'Logger:', 'name': 'log', 'type': 'group', 'expanded': False, 'children': [
+                            {'title': 'Max messages:', 'name': 'log_max', 'type': 'int', 'value': 10000, 'min': 10},
+                            {'title': 'Save to file:', 'name': 'log_to_file', 'type': 'bool', 'value': False,
+                             'tooltip': 'Write the messages to a rotating log file (in a background thread)'},
+                            {'title': 'File:', 'name': 'log_file', 'type': 'str',
+                             'value': str(Path(spectro_path).joinpath('spectrometer.log'))},
+                            {'title': 'Max file size (kB):', 'name': 'log_file_kb', 'type': 'int', 'value': 1000,
+                             'min': 1},
+                        ]},
+                        {'title': 'Min. interval of moves (ms):', 'name': 'move_interval_ms', 'type': 'int',
+                         'value': 200, 'min': 0, 'tooltip': 'Hardware moves (grating, laser) requested faster than '
+                                                            'this are deferred, only the last one being sent'},
                         {'title': 'Show detector:', 'name': 'show_det', 'type': 'bool', 'value': False},
                         ],},
               {'title': 'Calibration settings:', 'name': 'calib_settings', 'type': 'group', 'children': [
                   {'title': 'Use calibration:', 'name': 'use_calib', 'type': 'bool', 'value': False},
+                  {'title': 'Store calibration', 'name': 'store_calib', 'type': 'bool_push', 'value': False,
+                   'tooltip': 'Add the current calibration to the calibration store (all the history is kept)'},
+                  {'title': 'Stored calibrations:', 'name': 'calib_history', 'type': 'list', 'value': '',
+                   'limits': [''], 'tooltip': 'Select a calibration of the store to apply it'},
+                  {'title': 'Export stored calibration', 'name': 'export_calib', 'type': 'bool_push', 'value': False,
+                   'tooltip': 'Save the selected stored calibration as an xml file (read by Load calibration)'},
+                  {'title': 'Restore on preset load:', 'name': 'auto_restore_calib', 'type': 'bool', 'value': True,
+                   'tooltip': 'Apply the most recent stored calibration matching the detector configuration'},
                   {'title': 'Save calibration', 'name': 'save_calib', 'type': 'bool_push', 'value': False},
                   {'title': 'Load calibration', 'name': 'load_calib', 'type': 'bool_push', 'value': False},
                   {'title': 'Calibration coeffs:', 'name': 'calib_coeffs', 'type': 'group', 'children': [
@@ -65,8 +121,44 @@ class Spectrometer(QObject):
               {'title': 'Acquisition settings:', 'name': 'acq_settings', 'type': 'group', 'children': [
                   {'title': 'Spectro. Center:', 'name': 'spectro_center_freq', 'type': 'float', 'value': 800,},
                   {'title': 'Spectro. Center:', 'name': 'spectro_center_freq_txt', 'type': 'str', 'value': '????', 'readonly':True },
-                  {'title': 'Units:', 'name': 'units', 'type': 'list', 'value': 'nm', 'limits': ['nm', 'cm-1', 'eV']},
+                  {'title': 'Units:', 'name': 'units', 'type': 'list', 'value': 'nm', 'limits': list(units.units.keys())},
                   {'title': 'Exposure (ms):', 'name': 'exposure_ms', 'type': 'float', 'value': 100, },
+                  {'title': 'Decimate display:', 'name': 'lod', 'type': 'bool', 'value': True, 'tooltip':
+                      'Display the min/max envelope of large spectra at the screen resolution, full resolution is '
+                      'displayed when zoomed in'},
+                  {'title': 'Intensity per unit:', 'name': 'jacobian', 'type': 'bool', 'value': False, 'tooltip':
+                      'Rescale the spectra by the Jacobian |dλ/dE| of the unit conversion so that they are spectral '
+                      'densities per displayed unit (line areas are conserved)'},
+                  {'title': 'Baseline removal:', 'name': 'baseline', 'type': 'group', 'expanded': False,
+                   'children': [
+                      {'title': 'Method:', 'name': 'baseline_method', 'type': 'list', 'value': 'None',
+                       'limits': baseline.methods},
+                      {'title': 'Smoothness:', 'name': 'lam', 'type': 'float', 'value': 1e5, 'min': 1e-3,
+                       'tooltip': 'Smoothness of the ALS/airPLS baselines (typically 1e2 to 1e9)'},
+                      {'title': 'Asymmetry:', 'name': 'asymmetry', 'type': 'float', 'value': 0.01, 'min': 1e-6,
+                       'max': 0.5, 'tooltip': 'Weight of the points above the ALS baseline (typically 0.001 to 0.1)'},
+                      {'title': 'Radius (pxls):', 'name': 'radius', 'type': 'int', 'value': 50, 'min': 1,
+                       'tooltip': 'Radius of the rolling ball, larger than the width of the peaks'},
+                      {'title': 'Order:', 'name': 'order', 'type': 'int', 'value': 3, 'min': 0, 'max': 10},
+                  ]},
+                  {'title': 'Filter:', 'name': 'filter', 'type': 'group', 'expanded': False, 'children': [
+                      {'title': 'Method:', 'name': 'filter_method', 'type': 'list', 'value': 'None',
+                       'limits': filters.methods},
+                      {'title': 'Window (pxls):', 'name': 'filter_window', 'type': 'int', 'value': 11, 'min': 1},
+                      {'title': 'Order:', 'name': 'filter_order', 'type': 'int', 'value': 2, 'min': 0, 'max': 10,
+                       'tooltip': 'Polynomial order of the Savitzky-Golay filter'},
+                      {'title': 'Derivative:', 'name': 'derivative', 'type': 'list', 'value': 0, 'limits': [0, 1, 2]},
+                  ]},
+                  {'title': '2D detectors:', 'name': 'image_reduction', 'type': 'group', 'expanded': False,
+                   'children': [
+                      {'title': 'Reduction:', 'name': 'reduction_mode', 'type': 'list', 'value': 'FVB',
+                       'limits': reduction.modes, 'tooltip': 'Full vertical binning or one spectrum per track'},
+                      {'title': 'Tracks (rows):', 'name': 'tracks', 'type': 'str', 'value': '0-0', 'tooltip':
+                          'first-last rows (inclusive) of each track separated by semicolons, ex: 0-127; 128-255'},
+                      {'title': 'Smile (pxls):', 'name': 'smile', 'type': 'float', 'value': 0., 'tooltip':
+                          'Horizontal shift of the rows at the edges of a track relative to its center, corrected '
+                          'before summing the rows'},
+                  ]},
               ]},
               ]
 
@@ -77,35 +169,45 @@ class Spectrometer(QObject):
         if not isinstance(parent, DockArea):
             raise Exception('no valid parent container, expected a DockArea')
 
-        self.wait_time = 2000 #ms
+        self.wait_time = 2000 #ms, timeout for the replies of the detectors to the initialization queries
         self.offline = True
+        self.preset_initialized = False
         self.dockarea = parent
         self.mainwindow = parent.parent()
         self.spectro_widget = QtWidgets.QWidget()
-        self.data_dict = None
-        """
-        List of the possible plugins that could be used with Spectrometer module
-        type : dimensionality of the detector
-        name: name of the plugin
-        calib = True means there is a builtin calibration of the frequency axis
-        movable : tells if the dispersion can be set (for instance by moving a grating)
-        unit: valid only if calib is True. Unit of the calibration axis (x_axis of the detector), most often in
-              nanometers. Possible values are 'nm', 'radfs' (rad/femtosecond), 'eV'
-        laser: if False,  laser cannot be changed by the program, do it manually
-        laser_list: if laser is True, laser_list gives a list of selectable lasers
-        
-        """
-
-        self.current_det = None  # will be after initialization
 
         self.laser_set_manual = True
 
         #init the object parameters
-        self.detector = None
+        self.detectors = OrderedDict([])  # SpectroDetector objects (one per detector module) keyed by their title
+        self.offline_det = SpectroDetector()  # used to display loaded data when no detector is selected
+        self.selected = self.offline_det
         self.save_file_pathname = None
         self._spectro_wl = 550 # center wavelngth of the spectrum
-        self.viewer_freq_axis = utils.Axis(data=None, label='Photon energy', units='')
-        self.raw_data = []
+
+        self.instrumentation = FrameInstrumentation()
+        self.server = None  # SpectrumServer, created when first enabled
+        self.shm_writers = dict([])  # SharedSpectraWriter objects keyed by detector title
+
+        self._merge_timer = QtCore.QTimer()
+        self._merge_timer.setSingleShot(True)
+        self._merge_timer.setInterval(0)
+        self._merge_timer.timeout.connect(self.show_merged)
+
+        # tree changes are coalesced: dependent updates are scheduled and run once at the next event loop iteration
+        self._pending_updates = OrderedDict([])
+        self._tree_timer = QtCore.QTimer()
+        self._tree_timer.setSingleShot(True)
+        self._tree_timer.setInterval(0)
+        self._tree_timer.timeout.connect(self.run_pending_updates)
+        self.hardware_limiters = dict([])
+        self.spectral_filter = filters.SpectralFilter()  # smoothing/derivative applied to the spectra of all detectors
+
+        try:
+            self.calib_store = CalibrationStore(Path(spectro_path).joinpath('calibrations.sqlite'))
+        except Exception as e:
+            logger.exception(str(e))
+            self.calib_store = None
 
         #init the user interface
         self.dashboard = self.set_dashboard()
@@ -118,6 +220,12 @@ class Spectrometer(QObject):
         self.show_detector(False)
         self.dockarea.setEnabled(False)
 
+        self._session_detectors = dict([])  # detectors state of the restored session, applied when they are created
+        self._session_spectra = dict([])
+        self.autosave_timer = QtCore.QTimer()
+        self.autosave_timer.timeout.connect(self.save_session)
+        QtCore.QTimer.singleShot(0, self.restore_session)
+
     def set_dashboard(self):
         params = [{'title': 'Spectro Settings:', 'name': 'spectro_settings', 'type': 'group', 'children': [
             {'title': 'Is calibrated?', 'name': 'iscalibrated', 'type': 'bool', 'value': False, 'tooltip':
@@ -130,7 +238,11 @@ class Spectrometer(QObject):
             {'title': 'Laser ray:', 'name': 'laser_ray', 'type': 'list', 'value': '', 'show_pb': True, 'tooltip':
                 'List of settable laser rays (not manual ones)'},]},
         ]
-        dashboard = DashBoard(self.dockarea.addTempArea())
+        from pymodaq.dashboard import DashBoard
+        win = QtWidgets.QMainWindow()  # the DashBoard builds its menu in the main window holding its dockarea
+        area = DockArea()
+        win.setCentralWidget(area)
+        dashboard = DashBoard(area)
         dashboard.set_preset_path(spectro_path)
         options =[dict(path='saving_options', options_dict=dict(visible=False)),
                   dict(path='use_pid', options_dict=dict(visible=False)),
@@ -152,12 +264,49 @@ class Spectrometer(QObject):
         target_widget = QtWidgets.QWidget()
         self.viewer = Viewer1D(target_widget)
         self.dock_viewer.addWidget(target_widget)
+        self.offline_det.viewer = self.viewer
+        self.viewer.viewer.plotwidget.plotItem.vb.sigXRangeChanged.connect(
+            lambda *args: self.lod_range_changed(self.offline_det))
+
+        #create a dock displaying the last spectra of the selected detector versus time
+        self.dock_waterfall = Dock('Waterfall', size=(350, 350))
+        self.dockarea.addDock(self.dock_waterfall, 'bottom', self.dock_viewer)
+        from pymodaq_spectro.utils.waterfall import WaterfallWidget
+        self.waterfall = WaterfallWidget()
+        self.dock_waterfall.addWidget(self.waterfall)
+
+        #create a dock tracking the parameters of peaks selected on the viewer
+        self.dock_peaks = Dock('Peak tracking', size=(350, 350))
+        self.dockarea.addDock(self.dock_peaks, 'above', self.dock_waterfall)
+        from pymodaq_spectro.utils.peak_tracking import PeakTrackerWidget
+        self.peak_tracker = PeakTrackerWidget()
+        self.peak_tracker.set_plot_item(self.viewer.viewer.plotwidget.plotItem)
+        self.dock_peaks.addWidget(self.peak_tracker)
+
+        #create a dock integrating named spectral ROIs as 0D channels
+        self.dock_rois = Dock('ROI integration', size=(350, 350))
+        self.dockarea.addDock(self.dock_rois, 'above', self.dock_waterfall)
+        from pymodaq_spectro.utils.roi import RoiWidget
+        self.rois = RoiWidget()
+        self.rois.set_plot_item(self.viewer.viewer.plotwidget.plotItem)
+        self.dock_rois.addWidget(self.rois)
+
+        #create a dock comparing many spectra from files and snapshots
+        self.dock_comparison = Dock('Comparison', size=(350, 350))
+        self.dockarea.addDock(self.dock_comparison, 'above', self.dock_waterfall)
+        from pymodaq_spectro.utils.comparison import ComparisonWidget
+        self.comparison = ComparisonWidget()
+        self.comparison.snapshot_requested.connect(self.snapshot_to_comparison)
+        self.comparison.file_requested.connect(lambda: self.load_file(show=False))
+        self.dock_comparison.addWidget(self.comparison)
+        self.dock_waterfall.raiseDock()
 
 
         ################################################################
         #create a logger dock where to store info senf from the programm
         self.dock_logger = Dock("Logger")
-        self.logger_list = QtWidgets.QListWidget()
+        self.log_model = LogModel(max_size=10000)
+        self.logger_list = LogView(self.log_model)
         self.logger_list.setMinimumWidth(300)
         self.dock_logger.addWidget(self.logger_list)
         self.dockarea.addDock(self.dock_logger, 'right')
@@ -240,30 +389,107 @@ class Spectrometer(QObject):
         self.acq_settings_tree.setMinimumWidth(300)
         self.acq_settings_tree.setParameters(self.settings.child(('acq_settings')), showTop=False)
 
+        #sequencer of parameter changes and acquisitions
+        from pymodaq_spectro.utils.sequencer import Sequencer
+        self.sequencer = Sequencer()
+        self.sequencer.start_requested.connect(self.start_sequence)
+        self.sequencer.status_signal.connect(lambda txt: self.update_status(txt, log_type='log'))
+        dock_sequencer = Dock('Sequencer', size=(300, 350))
+        self.dockarea.addDock(dock_sequencer, 'below', dock_acq_settings)
+        self.sequencer_tree = ParameterTree()
+        dock_sequencer.addWidget(self.sequencer_tree, 10)
+        self.sequencer_tree.setMinimumWidth(300)
+        self.sequencer_tree.setParameters(self.sequencer.settings, showTop=False)
+
+        #hyperspectral maps on a grid of positions
+        from pymodaq_spectro.utils.mapping import Mapper, MapWidget
+        self.mapper = Mapper()
+        self.mapper.start_requested.connect(self.start_mapping)
+        self.mapper.status_signal.connect(lambda txt: self.update_status(txt, log_type='log'))
+        self.dock_mapping = Dock('Mapping', size=(350, 350))
+        self.dockarea.addDock(self.dock_mapping, 'above', self.dock_waterfall)
+        self.mapping = MapWidget(self.mapper)
+        self.dock_mapping.addWidget(self.mapping)
+
+        #component analysis of recorded sequences and maps
+        self.dock_decomposition = Dock('Decomposition', size=(350, 350))
+        self.dockarea.addDock(self.dock_decomposition, 'above', self.dock_waterfall)
+        from pymodaq_spectro.utils.decomposition import DecompositionWidget
+        self.decomposition = DecompositionWidget()
+        self.decomposition.status_signal.connect(lambda txt: self.update_status(txt, log_type='log'))
+        self.dock_decomposition.addWidget(self.decomposition)
+
+        #diagnostics of the per frame processing times
+        self.dock_diagnostics = Dock('Diagnostics', size=(300, 350))
+        self.dockarea.addDock(self.dock_diagnostics, 'below', self.dock_logger)
+        self.diagnostics = DiagnosticsWidget(self.instrumentation)
+        self.dock_diagnostics.addWidget(self.diagnostics)
+
+
+    @property
+    def detector(self):
+        """The DAQ_Viewer module of the selected detector (None if offline)"""
+        return self.selected.module
+
+    @property
+    def current_det(self):
+        return self.selected.current_det
+
+    @property
+    def viewer_freq_axis(self):
+        return self.selected.viewer_freq_axis
+
+    @property
+    def raw_data(self):
+        return self.selected.raw_data
+
+    @property
+    def data_dict(self):
+        return self.selected.data_dict
 
     @Slot(ThreadCommand)
-    def cmd_from_det(self,status):
+    def cmd_from_det(self, status, det=None):
+        """
+        Process the commands sent back by a detector plugin, the settings tree is only updated if this detector is
+        the selected one
+
+        Parameters
+        ----------
+        status: (ThreadCommand)
+        det: (SpectroDetector) the detector that sent the command, default is the selected one
+        """
+        if det is None:
+            det = self.selected
         try:
+            became_ready = det.reply_received(status.command)
+
             if status.command == 'spectro_wl':
-                self.status_center.setStyleSheet("background-color: green")
-                self.spectro_wl_is(status.attributes[0])
+                det.spectro_wl = status.attributes[0]
+                if det is self.selected:
+                    self.status_center.setStyleSheet("background-color: green")
+                    self.spectro_wl_is(status.attributes[0])
 
             elif status.command == 'laser_wl':
-                #self.laser_set_manual = False
-                self.settings.child('config_settings', 'laser_wl_list').setValue(status.attributes[0])
-                self.status_laser.setText('{:}nm'.format(status.attributes[0]))
-                self.status_laser.setStyleSheet("background-color: green")
-                self.update_center_frequency(self.spectro_wl)
-
+                det.laser_wl = status.attributes[0]
+                if det is self.selected:
+                    #self.laser_set_manual = False
+                    self.settings.child('config_settings', 'laser_wl_list').setValue(status.attributes[0])
+                    self.status_laser.setText('{:}nm'.format(status.attributes[0]))
+                    self.status_laser.setStyleSheet("background-color: green")
+                    self.update_center_frequency(self.spectro_wl)
 
             elif status.command == 'exposure_ms':
-                self.settings.child('acq_settings', 'exposure_ms').setValue(status.attributes[0])
+                det.exposure_ms = status.attributes[0]
+                if det is self.selected:
+                    self.settings.child('acq_settings', 'exposure_ms').setValue(status.attributes[0])
 
             elif status.command == "x_axis":
-                x_axis = status.attributes[0]
-                if np.any(x_axis['data'] != self.viewer_freq_axis['data']) and self.current_det['calib']:
-                    self.viewer_freq_axis.update(x_axis)
-                    self.update_axis()
+                if det.update_axis_from_det(status.attributes[0]):
+                    self.update_axis(det)
+
+            if became_ready:  # once the reply has been applied
+                self.detector_ready(det)
+            self.sequencer.ack(status, det)
 
         except Exception as e:
             logger.exception(str(e))
@@ -278,23 +504,121 @@ class Spectrometer(QObject):
 
 
     def set_detector(self):
+        """
+        Create a SpectroDetector for each detector module of the loaded preset. Each one is connected to its own
+        DAQ_Viewer signals and get its own viewer (side by side display), the first one being selected.
+        """
+        self.clear_detectors()
+        for module in self.dashboard.detector_modules:
+            current_det = \
+                dict(laser=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'laser_selectable').value(),
+                     laser_list=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'laser_ray').opts['limits'],
+                     movable=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'ismovable').value(),
+                     calib=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'iscalibrated').value(),
+                     )
+            self.add_detector(SpectroDetector(module, current_det))
+        self.restore_detectors_state()
+        self.mapper.set_actuators([module.title for module in getattr(self.dashboard, 'move_modules', [])])
+
+        self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
+        self.settings.child('config_settings', 'selected_det').setLimits(list(self.detectors.keys()))
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+        self.update_display_mode()
+        if len(self.detectors) != 0:
+            self.select_detector(list(self.detectors.keys())[0])
+
+        self.status_init.set_as_false()
+        for det in self.detectors.values():
+            self.init_detector(det)
+
+    def set_simulated_detector(self, n_detectors=1):
+        """
+        Use synthetic spectrometers instead of the detectors of a preset, for tests without hardware. Their
+        simulation settings are displayed in a dedicated dock.
+        """
+        from pymodaq_spectro.utils.simulated_detector import SimulatedSpectrometer
+        self.clear_detectors()
+        for ind in range(n_detectors):
+            module = SimulatedSpectrometer(f'Simulated{ind:02d}')
+            self.add_detector(SpectroDetector(module, dict(laser=True, laser_list=module.lasers, movable=True,
+                                                           calib=True)))
+            dock = Dock(f'{module.title} settings', size=(300, 350))
+            self.dockarea.addDock(dock, 'below', self.dock_logger)
+            tree = ParameterTree()
+            tree.setParameters(module.settings, showTop=False)
+            dock.addWidget(tree)
+            self.detectors[module.title].settings_dock = dock
+        self.restore_detectors_state()
+
+        self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
+        self.settings.child('config_settings', 'selected_det').setLimits(list(self.detectors.keys()))
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+        self.update_display_mode()
+        self.select_detector(list(self.detectors.keys())[0])
+        self.status_init.set_as_false()
+        for det in self.detectors.values():
+            self.init_detector(det)
+        self.initialized(True)
+
+    def add_detector(self, det):
+        """
+        Register a SpectroDetector, connect its module signals and set a viewer to display its data
 
-        self.detector = self.dashboard.detector_modules[0]
-        self.settings.child('config_settings', 'curr_det').setValue(
-            f"{self.detector.settings.child('main_settings','DAQ_type').value()} / "
-            f"{self.detector.settings.child('main_settings','detector_type').value()} / {self.detector.title}")
-        self.detector.custom_sig[ThreadCommand].connect(self.cmd_from_det)
-        self.current_det = \
-            dict(laser=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'laser_selectable').value(),
-                 laser_list=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'laser_ray').opts['limits'],
-                 movable=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'ismovable').value(),
-                 calib=self.dashboard.preset_manager.preset_params.child('spectro_settings', 'iscalibrated').value(),
-                 )
+        Parameters
+        ----------
+        det: (SpectroDetector)
+        """
+        self.detectors[det.title] = det
+        self.configure_baseline(det)
+        det.module.custom_sig[ThreadCommand].connect(lambda status, det=det: self.cmd_from_det(status, det))
+        det.module.grab_done_signal.connect(lambda data, det=det: self.show_data(data, det))
+        if len(self.detectors) == 1:
+            det.viewer = self.viewer
+        else:
+            det.dock = Dock(det.title, size=(350, 350))
+            self.dockarea.addDock(det.dock, 'right', self.dock_viewer)
+            target_widget = QtWidgets.QWidget()
+            det.viewer = Viewer1D(target_widget)
+            det.dock.addWidget(target_widget)
+        det.viewer.viewer.plotwidget.plotItem.vb.sigXRangeChanged.connect(
+            lambda *args, det=det: self.lod_range_changed(det))
+
+    def clear_detectors(self):
+        for det in self.detectors.values():
+            if det.dock is not None:
+                det.dock.close()
+            if det.settings_dock is not None:
+                det.settings_dock.close()
+                det.module.quit_fun()
+        self.detectors = OrderedDict([])
+        self.selected = self.offline_det
+        self.peak_tracker.set_plot_item(self.viewer.viewer.plotwidget.plotItem)
+        self.rois.set_plot_item(self.viewer.viewer.plotwidget.plotItem)
+
+    def select_detector(self, title):
+        """
+        Select the detector whose parameters are displayed and controlled from the settings tree, the tree is
+        restored from this detector's own state
 
-        self.detector.grab_done_signal.connect(self.show_data)
+        Parameters
+        ----------
+        title: (str) the title of the detector module
+        """
+        self.selected = self.detectors[title]
+        det = self.selected
+        self.peak_tracker.set_plot_item(det.viewer.viewer.plotwidget.plotItem)
+        self.rois.set_plot_item(det.viewer.viewer.plotwidget.plotItem)
 
         self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
-        if self.current_det['laser']:
+        self.settings.child('config_settings', 'selected_det').setValue(title)
+        self.settings.child('config_settings', 'curr_det').setValue(det.info)
+        for name, coeff in zip(['third_calib', 'second_calib', 'slope_calib', 'center_calib'], det.calib_coeffs):
+            self.settings.child('calib_settings', 'calib_coeffs', name).setValue(coeff)
+        self.settings.child('calib_settings', 'use_calib').setValue(det.use_calib)
+        self.set_reduction_settings(det.reducer)
+        if det.exposure_ms is not None:
+            self.settings.child('acq_settings', 'exposure_ms').setValue(det.exposure_ms)
+        if det.current_det['laser']:
             self.settings.child('config_settings', 'laser_wl_list').show()
             self.settings.child('config_settings', 'laser_wl').hide()
             self.settings.child('config_settings', 'laser_wl_list').setOpts(limits=self.current_det['laser_list'])
@@ -303,47 +627,180 @@ class Spectrometer(QObject):
             self.settings.child('config_settings', 'laser_wl_list').hide()
         self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
 
-        #apply current detector particularities
-        #self.settings.child('acq_settings', 'spectro_center_freq').setOpts(readonly=not self.current_det['movable'])
-        self.get_spectro_wl()
-        QtWidgets.QApplication.processEvents()
+        if det.current_det['calib'] or det.use_calib:
+            self.settings.child('acq_settings', 'spectro_center_freq').show()
+            self.settings.child('acq_settings', 'spectro_center_freq_txt').hide()
+        else:
+            self.settings.child('acq_settings', 'spectro_center_freq').hide()
+            self.settings.child('acq_settings', 'spectro_center_freq_txt').show()
+        self.update_center_frequency(det.spectro_wl)
+        self.update_calib_history()
+
+    def init_detector(self, det):
+        """
+        Query the detector plugin for its current state. All queries are sent at once without waiting, the replies
+        are tracked in cmd_from_det and the detector set ready as soon as the required ones have been received (or
+        after wait_time if the plugin never answers), see detector_ready
+        """
+        if det is self.selected:
+            show_center = det.current_det['calib']
+            self.settings.child('acq_settings', 'spectro_center_freq').show(show_center)
+            self.settings.child('acq_settings', 'spectro_center_freq_txt').show(not show_center)
+            if not det.current_det['laser']:
+                self.settings.child('config_settings', 'laser_wl').setValue(0)
+        if not det.current_det['calib']:
+            det.viewer_freq_axis['units'] = 'Pxls'
+
+        for command in det.init_queries():
+            det.send_command(command)
+        QtCore.QTimer.singleShot(self.wait_time, lambda det=det: self.init_timeout(det))
+        if det.ready:  # nothing required from the plugin
+            self.detector_ready(det)
+
+    def init_timeout(self, det):
+        if det.module is None or self.detectors.get(det.title) is not det or len(det.pending_replies) == 0:
+            return
+        self.update_status(f'{det.title}: no reply for {", ".join(sorted(det.pending_replies))}', log_type='log')
+        was_ready = det.ready
+        det.pending_replies.clear()
+        if was_ready:
+            self.update_acquisition_state()
+        else:
+            self.detector_ready(det)
+
+    def detector_ready(self, det):
+        """
+        Called once a detector knows its minimum state (laser and grating configuration): the stored calibration
+        matching this configuration is restored and the acquisitions enabled if all detectors are ready
+        """
+        if not det.current_det['calib'] and not det.use_calib and \
+                self.settings.child('calib_settings', 'auto_restore_calib').value():
+            self.restore_calibration(det)
+        self.update_acquisition_state()
+
+    def detectors_ready(self):
+        return len(self.detectors) != 0 and all([det.ready for det in self.detectors.values()])
+
+    def update_acquisition_state(self):
+        """
+        Enable the acquisition actions once the preset is loaded and the detectors know their minimum state
+        """
+        state = self.preset_initialized and self.detectors_ready()
+        self.grab_action.setEnabled(state)
+        self.snap_action.setEnabled(state)
+        if state or self.offline:
+            self.status_init.set_as_true()
+        else:
+            self.status_init.set_as_false()
 
+    def update_display_mode(self):
+        """
+        Show each detector in its own viewer (side by side) or all of them in the main viewer, resampled onto a common
+        energy axis (merged)
+        """
+        merged = self.settings.child('config_settings', 'display_mode').value() == 'Merged'
+        for det in self.detectors.values():
+            if det.dock is not None:
+                det.dock.setVisible(not merged)
+        if merged:
+            self.show_merged()
+        else:
+            for det in self.detectors.values():
+                det.displayed_axis = None
+                self.display(det)
 
-        self.get_laser_wl()
-        QtWidgets.QApplication.processEvents()
+    def is_merged(self):
+        return len(self.detectors) > 1 and \
+               self.settings.child('config_settings', 'display_mode').value() == 'Merged'
 
-        self.get_exposure_ms()
-        QtWidgets.QApplication.processEvents()
+    def show_merged(self):
+        """
+        Display all the detectors data in the main viewer resampled onto one common axis
+        """
+        try:
+            common_axis, datas, labels = merge_spectra(self.detectors.values())
+            if common_axis is not None:
+                unit = self.settings.child('acq_settings', 'units').value()
+                if self.settings.child('acq_settings', 'jacobian').value() and unit != 'nm':
+                    jacobian = units.jacobian(common_axis, unit)
+                    datas = [data * jacobian for data in datas]
+                self.viewer.show_data(datas, labels=labels)
+                self.viewer.x_axis = self.convert_axis(common_axis)
+                for det in self.detectors.values():
+                    det.displayed_axis = None
+        except Exception as e:
+            logger.exception(str(e))
 
-    def get_exposure_ms(self):
-        self.detector.command_detector.emit(ThreadCommand('get_exposure_ms'))
+    def get_exposure_ms(self, det=None):
+        if det is None:
+            det = self.selected
+        det.send_command('get_exposure_ms')
 
-    def set_exposure_ms(self, data):
-        self.detector.command_detector.emit(ThreadCommand('set_exposure_ms', [data]))
+    def set_exposure_ms(self, data, det=None):
+        if det is None:
+            det = self.selected
+        det.exposure_ms = data
+        det.send_command('set_exposure_ms', [data])
 
     @Slot(bool)
     def initialized(self, state, offline=False):
         self.offline = offline
-        self.grab_action.setEnabled(state)
-        self.snap_action.setEnabled(state)
+        self.preset_initialized = state
+        self.update_acquisition_state()
         if state or offline:
-            self.status_init.set_as_true()
             self.dockarea.setEnabled(True)
-        else:
-            self.status_init.set_as_false()
 
     def update_center_frequency(self, spectro_wl):
         self._spectro_wl = spectro_wl
-        if self.settings.child('acq_settings', 'units').value() == 'nm':
-            self.settings.child('acq_settings', 'spectro_center_freq').setValue(spectro_wl)
-        elif self.settings.child('acq_settings', 'units').value() == 'cm-1':
-            self.settings.child('acq_settings', 'spectro_center_freq').setValue(Enm2cmrel(spectro_wl,
-                                                                                          self.settings.child(
-                                                                                              'config_settings',
-                                                                                              'laser_wl').value()))
-        elif self.settings.child('acq_settings', 'units').value() == 'eV':
-            self.settings.child('acq_settings', 'spectro_center_freq').setValue(nm2eV(spectro_wl))
+        self.settings.child('acq_settings', 'spectro_center_freq').setValue(self.to_units(spectro_wl))
+        self.schedule_update('status', self.update_status_center)
+
+    def reduction_changed(self):
+        """
+        Apply the 2D reduction settings to the selected detector, the shift maps are computed again on the next image
+        """
+        settings = self.settings.child('acq_settings', 'image_reduction')
+        try:
+            tracks = reduction.parse_tracks(settings.child('tracks').value())
+        except ValueError as e:
+            self.update_status(f'Invalid tracks: {str(e)}', log_type='log')
+            return
+        self.selected.reducer.configure(mode=settings.child('reduction_mode').value(), tracks=tracks,
+                                        smile=settings.child('smile').value())
+
+    def baseline_changed(self):
+        """
+        Apply the baseline removal settings to all the detectors (their cached factorizations are dropped)
+        """
+        for det in list(self.detectors.values()) + [self.offline_det]:
+            self.configure_baseline(det)
 
+    def configure_baseline(self, det):
+        settings = self.settings.child('acq_settings', 'baseline')
+        det.baseline.configure(method=settings.child('baseline_method').value(), lam=settings.child('lam').value(),
+                               p=settings.child('asymmetry').value(), radius=settings.child('radius').value(),
+                               order=settings.child('order').value())
+
+    def filter_changed(self):
+        settings = self.settings.child('acq_settings', 'filter')
+        try:
+            self.spectral_filter.configure(method=settings.child('filter_method').value(),
+                                           window=settings.child('filter_window').value(),
+                                           order=settings.child('filter_order').value(),
+                                           deriv=settings.child('derivative').value())
+            if self.spectral_filter.enabled:
+                self.spectral_filter.kernel  # computed (and checked) once, not at the next frame
+        except ValueError as e:
+            self.spectral_filter.configure(method='None')
+            self.update_status(f'Invalid filter: {str(e)}', log_type='log')
+
+    def set_reduction_settings(self, reducer):
+        settings = self.settings.child('acq_settings', 'image_reduction')
+        settings.child('reduction_mode').setValue(reducer.mode)
+        settings.child('tracks').setValue(reduction.tracks_to_str(reducer.tracks))
+        settings.child('smile').setValue(reducer.smile)
+
+    def update_status_center(self):
         self.set_status_center(self.settings.child('acq_settings', 'spectro_center_freq').value(),
                                self.settings.child('acq_settings', 'units').value())
 
@@ -358,31 +815,40 @@ class Spectrometer(QObject):
         spectro_wl
         """
         self._spectro_wl = spectro_wl
+        self.selected.spectro_wl = spectro_wl
         self.update_center_frequency(spectro_wl)
 
 
-    def set_spectro_wl(self, spectro_wl):
+    def set_spectro_wl(self, spectro_wl, det=None):
+        if det is None:
+            det = self.selected
         try:
-            if self.current_det['movable']:
-                self.detector.command_detector.emit(ThreadCommand('set_spectro_wl', [spectro_wl]))
+            if det.current_det['movable']:
+                self.send_hardware_command(det, 'set_spectro_wl', [spectro_wl])
         except Exception as e:
             logger.exception(str(e))
 
-    def get_spectro_wl(self):
-        if self.current_det['calib']:
-            self.settings.child('acq_settings', 'spectro_center_freq').show()
-            self.settings.child('acq_settings', 'spectro_center_freq_txt').hide()
-            self.detector.command_detector.emit(ThreadCommand('get_spectro_wl'))
-            self.detector.command_detector.emit(ThreadCommand('get_axis'))
-        else:
-            self.settings.child('acq_settings', 'spectro_center_freq').hide()
-            self.settings.child('acq_settings', 'spectro_center_freq_txt').show()
-            self.viewer_freq_axis['units'] = 'Pxls'
-
-    def get_laser_wl(self):
-        if self.current_det['laser']:
-            self.detector.command_detector.emit(ThreadCommand('get_laser_wl'))
+    def get_spectro_wl(self, det=None):
+        if det is None:
+            det = self.selected
+        if det.current_det['calib']:
+            if det is self.selected:
+                self.settings.child('acq_settings', 'spectro_center_freq').show()
+                self.settings.child('acq_settings', 'spectro_center_freq_txt').hide()
+            det.send_command('get_spectro_wl')
+            det.send_command('get_axis')
         else:
+            if det is self.selected:
+                self.settings.child('acq_settings', 'spectro_center_freq').hide()
+                self.settings.child('acq_settings', 'spectro_center_freq_txt').show()
+            det.viewer_freq_axis['units'] = 'Pxls'
+
+    def get_laser_wl(self, det=None):
+        if det is None:
+            det = self.selected
+        if det.current_det['laser']:
+            det.send_command('get_laser_wl')
+        elif det is self.selected:
             self.settings.child('config_settings', 'laser_wl').setValue(0)
     @property
     def spectro_wl(self):
@@ -402,6 +868,158 @@ class Spectrometer(QObject):
 
 
 
+    def store_calibration(self, det):
+        """
+        Add the calibration of a detector to the calibration store
+        """
+        if self.calib_store is None:
+            return
+        try:
+            settings = None
+            if det.module is not None:
+                settings = custom_tree.parameter_to_xml_string(det.module.settings).decode()
+            self.calib_store.add(det.title, det.calib_coeffs, grating=det.grating,
+                                 center_wl=det.spectro_wl if det.current_det['calib'] else None,
+                                 laser_wl=self.effective_laser_wl(det), settings=settings)
+            self.update_calib_history()
+        except Exception as e:
+            logger.exception(str(e))
+
+    def restore_calibration(self, det):
+        """
+        Apply the most recent stored calibration matching the detector configuration, if any
+        """
+        if self.calib_store is None:
+            return
+        try:
+            calib = self.calib_store.latest(det.title, det.grating,
+                                            center_wl=det.spectro_wl if det.current_det['calib'] else None,
+                                            laser_wl=self.effective_laser_wl(det))
+            if calib is not None:
+                self.apply_stored_calibration(det, calib)
+                self.update_status(f'{det.title}: calibration restored ({self.calib_store.describe(calib)})',
+                                   log_type='log')
+        except Exception as e:
+            logger.exception(str(e))
+        if det is self.selected:
+            self.update_calib_history()
+
+    def effective_laser_wl(self, det):
+        """
+        Get the laser wavelength actually used by a detector: the one reported by (or selected for) a detector
+        controlling its laser, else the configured one
+
+        Returns
+        -------
+        float or None: the wavelength in nm, None if unknown
+        """
+        laser_wl = det.laser_wl if det.current_det['laser'] else \
+            self.settings.child('config_settings', 'laser_wl').value()
+        try:
+            laser_wl = float(laser_wl)
+        except (TypeError, ValueError):
+            return None
+        return laser_wl if laser_wl > 0 else None
+
+    def export_stored_calibration(self):
+        """
+        Save the calibration selected in the store history as an xml file
+        """
+        selected = self.settings.child('calib_settings', 'calib_history').value()
+        if self.calib_store is None or not selected:
+            self.update_status('Select a stored calibration to export', log_type='log')
+            return
+        filename = select_file(start_path=self.save_file_pathname, save=True, ext='xml')
+        if filename != '':
+            self.calib_store.export_xml(int(selected.split(':')[0]), filename)
+
+    def apply_stored_calibration(self, det, calib):
+        if det is self.selected:
+            for name, coeff in zip(['third_calib', 'second_calib', 'slope_calib', 'center_calib'], calib['coeffs']):
+                self.settings.child('calib_settings', 'calib_coeffs', name).setValue(coeff)
+            self.settings.child('calib_settings', 'use_calib').setValue(True)
+        else:
+            det.calib_coeffs = list(calib['coeffs'])
+            det.use_calib = True
+            if det.apply_calibration():
+                self.update_axis(det)
+
+    def update_calib_history(self):
+        if self.calib_store is None:
+            return
+        history = [self.calib_store.describe(calib) for calib in self.calib_store.history(self.selected.title)]
+        param = self.settings.child('calib_settings', 'calib_history')
+        self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
+        param.setLimits([''] + history)
+        param.setValue('')
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+
+    def send_hardware_command(self, det, command, attributes):
+        """
+        Send a command moving some hardware, rate limited per detector and command (see move_interval_ms)
+        """
+        key = (det.title, command)
+        if key not in self.hardware_limiters:
+            self.hardware_limiters[key] = RateLimiter(
+                det.send_command, self.settings.child('config_settings', 'move_interval_ms').value())
+        self.hardware_limiters[key](command, attributes)
+
+    def schedule_update(self, name, func):
+        """
+        Schedule an update to be run once at the next event loop iteration, whatever the number of tree changes
+        requesting it in the meantime
+
+        Parameters
+        ----------
+        name: (str) identifies the update
+        func: (callable) the update, called without argument
+        """
+        if name not in self._pending_updates:
+            self._pending_updates[name] = func
+        if not self._tree_timer.isActive():
+            self._tree_timer.start()
+
+    def run_pending_updates(self):
+        while len(self._pending_updates) != 0:  # updates may schedule other ones
+            name, func = self._pending_updates.popitem(last=False)
+            try:
+                func()
+            except Exception as e:
+                logger.exception(str(e))
+
+    def center_freq_changed(self):
+        center_wavelength = units.to_nm(self.settings.child('acq_settings', 'spectro_center_freq').value(),
+                                        self.settings.child('acq_settings', 'units').value(),
+                                        self.settings.child('config_settings', 'laser_wl').value())
+        if int(self.spectro_wl*100) != int(100*center_wavelength): #comprison at 1e-2
+            self.spectro_wl = center_wavelength
+
+    def units_changed(self):
+        if self.settings.child('acq_settings', 'spectro_center_freq').value() > 0.000000001:
+            self.settings.child('acq_settings', 'spectro_center_freq').setValue(self.to_units(self._spectro_wl))
+            self.schedule_update('status', self.update_status_center)
+        self.schedule_update('axis', lambda: self.update_axis(all_dets=True))  # the peak regions follow the units
+
+    def calib_changed(self):
+        self.selected.use_calib = self.settings.child('calib_settings', 'use_calib').value()
+        self.selected.calib_coeffs = \
+            [self.settings.child('calib_settings', 'calib_coeffs', 'third_calib').value(),
+             self.settings.child('calib_settings', 'calib_coeffs', 'second_calib').value(),
+             self.settings.child('calib_settings', 'calib_coeffs', 'slope_calib').value(),
+             self.settings.child('calib_settings', 'calib_coeffs', 'center_calib').value()]
+        if self.selected.use_calib:
+            self.update_center_frequency(self.settings.child('calib_settings', 'calib_coeffs', 'center_calib').value())
+            self.settings.child('acq_settings', 'spectro_center_freq').show()
+            self.settings.child('acq_settings', 'spectro_center_freq').setOpts(readonly=True)
+            self.status_center.setStyleSheet("background-color: green")
+            self.settings.child('acq_settings', 'spectro_center_freq_txt').hide()
+            if self.selected.apply_calibration():
+                self.schedule_update('axis', lambda: self.update_axis(all_dets=True))
+        else:
+            self.settings.child('acq_settings', 'spectro_center_freq').hide()
+            self.settings.child('acq_settings', 'spectro_center_freq_txt').show()
+            self.status_center.setStyleSheet("background-color: red")
+
     def parameter_tree_changed(self, param, changes):
         for param, change, data in changes:
             path = self.settings.childPath(param)
@@ -416,37 +1034,56 @@ class Spectrometer(QObject):
                 if param.name() == 'show_det':
                     self.show_detector(data)
 
-                elif param.name() == 'spectro_center_freq':
-                    unit = self.settings.child('acq_settings', 'units').value()
-                    if unit == 'nm':
-                        center_wavelength = data
-                    elif unit == 'cm-1':
-                        center_wavelength = Ecmrel2Enm(data, self.settings.child( 'config_settings', 'laser_wl').value())
-                    elif unit == 'eV':
-                        center_wavelength = eV2nm(data)
+                elif param.name() == 'selected_det':
+                    if data in self.detectors:
+                        self.select_detector(data)
+
+                elif param.name() == 'display_mode':
+                    self.update_display_mode()
+
+                elif param.name() in ['server_enabled', 'server_port', 'server_buffer_kb']:
+                    self.update_server()
+
+                elif param.name() == 'autosave_s':
+                    self.update_autosave()
 
-                    if int(self.spectro_wl*100) != int(100*center_wavelength): #comprison at 1e-2
-                        self.spectro_wl = center_wavelength
+                elif param.name() == 'log_max':
+                    self.log_model.set_max_size(data)
 
-                    self.update_axis()
+                elif param.name() in ['log_to_file', 'log_file', 'log_file_kb']:
+                    self.update_log_file()
 
+                elif param.name() in ['shm_enabled', 'shm_prefix', 'shm_slots']:
+                    self.close_shared()
 
+                elif param.name() == 'move_interval_ms':
+                    for limiter in self.hardware_limiters.values():
+                        limiter.min_interval_ms = data
+
+                elif param.name() == 'spectro_center_freq':
+                    self.schedule_update('spectro_wl', self.center_freq_changed)
+                    self.schedule_update('axis', lambda: self.update_axis(all_dets=True))
+
+                elif param.name() == 'jacobian':
+                    self.schedule_update('axis', lambda: self.update_axis(all_dets=True))
+                    if self.is_merged():
+                        self.schedule_update('merged', self.show_merged)
 
                 elif param.name() == 'units':
-                    if self.settings.child('acq_settings', 'spectro_center_freq').value() > 0.000000001:
-                        if data == 'nm':
-                            self.settings.child('acq_settings', 'spectro_center_freq').setValue(self._spectro_wl)
-                        elif data == 'cm-1':
-                            self.settings.child('acq_settings', 'spectro_center_freq').setValue(Enm2cmrel(self._spectro_wl,
-                                                    self.settings.child( 'config_settings', 'laser_wl').value()))
-                        elif data == 'eV':
-                            self.settings.child('acq_settings', 'spectro_center_freq').setValue(nm2eV(self._spectro_wl))
-
-                        self.set_status_center(self.settings.child('acq_settings', 'spectro_center_freq').value(),
-                                               self.settings.child('acq_settings', 'units').value())
+                    self.schedule_update('units', self.units_changed)
+
+                elif param.name() in ['baseline_method', 'lam', 'asymmetry', 'radius', 'order']:
+                    self.schedule_update('baseline', self.baseline_changed)
+
+                elif param.name() in ['filter_method', 'filter_window', 'filter_order', 'derivative']:
+                    self.schedule_update('filter', self.filter_changed)
+
+                elif param.name() in ['reduction_mode', 'tracks', 'smile']:
+                    self.schedule_update('reduction', self.reduction_changed)
 
                 elif param.name() == 'laser_wl_list':
                     if data is not None:
+                        self.selected.laser_wl = data
                         self.move_laser_wavelength(data)
 
                 elif param.name() == 'laser_wl':
@@ -470,6 +1107,7 @@ class Spectrometer(QObject):
                         if data:
                             self.calib_dock = Dock('Calibration module')
                             self.dockarea.addDock(self.calib_dock)
+                            from pymodaq_spectro.utils.calibration import Calibration
                             self.calibration = Calibration(self.dockarea)
                             self.calib_dock.addWidget(self.calibration)
 
@@ -477,6 +1115,18 @@ class Spectrometer(QObject):
                         else:
                             self.calib_dock.close()
 
+                elif param.name() == 'store_calib':
+                    self.store_calibration(self.selected)
+
+                elif param.name() == 'calib_history':
+                    if data and self.calib_store is not None:
+                        calib = self.calib_store.get(int(data.split(':')[0]))
+                        if calib is not None:
+                            self.apply_stored_calibration(self.selected, calib)
+
+                elif param.name() == 'export_calib':
+                    self.export_stored_calibration()
+
                 elif param.name() == 'save_calib':
                     filename = select_file(start_path=self.save_file_pathname, save=True, ext='xml')
                     if filename != '':
@@ -489,29 +1139,15 @@ class Spectrometer(QObject):
                         self.settings.child('calib_settings', 'calib_coeffs').restoreState(
                             Parameter.create(title='Calibration coeffs:', name='calib_coeffs', type='group',
                                              children=children).saveState())
+                        if self.calib_store is not None:
+                            self.calib_store.import_xml(filename, self.selected.title, grating=self.selected.grating)
+                            self.update_calib_history()
 
 
 
                 elif param.name() in custom_tree.iter_children(self.settings.child('calib_settings', 'calib_coeffs')) \
                         or param.name() == 'use_calib':
-                    if self.settings.child('calib_settings', 'use_calib').value():
-                        calib_coeffs = [self.settings.child('calib_settings', 'calib_coeffs', 'third_calib').value(),
-                                        self.settings.child('calib_settings', 'calib_coeffs', 'second_calib').value(),
-                                        self.settings.child('calib_settings', 'calib_coeffs', 'slope_calib').value(),
-                                        self.settings.child('calib_settings', 'calib_coeffs', 'center_calib').value()]
-
-                        self.update_center_frequency(self.settings.child('calib_settings', 'calib_coeffs', 'center_calib').value())
-                        self.settings.child('acq_settings', 'spectro_center_freq').show()
-                        self.settings.child('acq_settings', 'spectro_center_freq').setOpts(readonly=True)
-                        self.status_center.setStyleSheet("background-color: green")
-                        self.settings.child('acq_settings', 'spectro_center_freq_txt').hide()
-                        x_axis_pxls = np.linspace(0, self.raw_data[0].size-1, self.raw_data[0].size)
-                        self.viewer_freq_axis['data'] = np.polyval(calib_coeffs, x_axis_pxls-np.max(x_axis_pxls)/2)
-                        self.update_axis()
-                    else:
-                        self.settings.child('acq_settings', 'spectro_center_freq').hide()
-                        self.settings.child('acq_settings', 'spectro_center_freq_txt').show()
-                        self.status_center.setStyleSheet("background-color: red")
+                    self.schedule_update('calib', self.calib_changed)
 
 
             elif change == 'parent':
@@ -547,53 +1183,245 @@ class Spectrometer(QObject):
         #do hardware stuff if possible (Mock, labspec...)
         try:
             if self.current_det['laser']:
-                self.detector.command_detector.emit(ThreadCommand('set_laser_wl', [laser_wavelength]))
+                self.send_hardware_command(self.selected, 'set_laser_wl', [laser_wavelength])
         except Exception as e:
             logger.exception(str(e))
 
     @Slot(OrderedDict)
-    def show_data(self, data):
+    def show_data(self, data, det=None):
         """
         do stuff with data from the detector if its grab_done_signal has been connected
         Parameters
         ----------
         data: (OrderedDict) #OrderedDict(name=self.title,x_axis=None,y_axis=None,z_axis=None,data0D=None,data1D=None,data2D=None)
+        det: (SpectroDetector) the detector that emitted the data, default is the selected one (or offline)
         """
-        self.data_dict = data
-        if 'data1D' in data:
-            self.raw_data = []
-            for key in data['data1D']:
-                self.raw_data.append(data['data1D'][key]['data'])
-                if 'x_axis' in data['data1D'][key]:
-                    x_axis = data['data1D'][key]['x_axis']
+        t0 = time.perf_counter()
+        if det is None:
+            det = self.selected
+        self.instrumentation.new_frame(det.title, data, t0)
+        if det.update_data(data):
+            self.instrumentation.add('ingestion', time.perf_counter() - t0)
+            self.process_data(det)
+            if self.is_merged():
+                # coalesce the frames of all detectors received during the same event loop iteration
+                if not self._merge_timer.isActive():
+                    self._merge_timer.start()
                 else:
-                    x_axis = utils.Axis(
-                        data=np.linspace(0, len(data['data1D'][key]['data'])-1, len(data['data1D'][key]['data'])),
-                        units='pxls',
-                        label='')
-                if self.viewer_freq_axis['data'] is None:
-                    self.viewer_freq_axis.update(x_axis)
-                elif np.any(x_axis['data'] != self.viewer_freq_axis['data']) and self.current_det['calib']:
-                    self.viewer_freq_axis.update(x_axis)
-
-            self.viewer.show_data(self.raw_data)
-            self.update_axis()
+                    self.instrumentation.frame_dropped()
+            else:
+                self.display(det)
+            extra = dict()
+            if det is self.selected:
+                self.waterfall.add_spectra(det.processed_data)
+                t1 = time.perf_counter()
+                axis = self.display_axis(det)  # fitted on the densities per displayed unit if jacobian is set
+                extra['peaks'] = self.peak_tracker.process(self.display_data(det), axis['data'])
+                if extra['peaks'] is not None:
+                    self.instrumentation.add('peaks', time.perf_counter() - t1)
+                t1 = time.perf_counter()
+                extra['rois'] = self.rois.process(det.processed_data, self.display_axis(det),
+                                                  lambda unit: self.convert_axis(det.viewer_freq_axis['data'],
+                                                                                 unit)['data'])
+                if extra['rois'] is not None:
+                    extra['roi_names'] = np.array(self.rois.integrator.names, dtype='S')
+                    self.instrumentation.add('rois', time.perf_counter() - t1)
+            self.sequencer.data_received(det, extra)
+            self.mapper.data_received(det)
+            if self.server is not None and self.server.running:  # the raw spectra, as saved
+                self.server.publish(det.title, det.raw_data, det.viewer_freq_axis['data'],
+                                    det.viewer_freq_axis['units'])
+            if self.settings.child('config_settings', 'shm', 'shm_enabled').value():
+                self.publish_shared(det)
+            self.instrumentation.add('total', time.perf_counter() - t0)
+
+    def process_data(self, det):
+        """
+        Compute the spectra of a detector that are displayed and analysed (processed_data) from its raw spectra, left
+        untouched to be saved, published and recorded: the baseline is removed then the spectra are filtered, if
+        enabled
+        """
+        det.processed_data = det.raw_data
+        if det.baseline.enabled and len(det.raw_data) != 0:
+            t0 = time.perf_counter()
+            try:
+                det.processed_data = det.baseline.process(det.raw_data)
+            except Exception as e:
+                logger.exception(str(e))
+            self.instrumentation.add('baseline', time.perf_counter() - t0)
+        if self.spectral_filter.enabled and len(det.processed_data) != 0:
+            t0 = time.perf_counter()
+            try:
+                det.processed_data = self.spectral_filter.process(det.processed_data)
+            except Exception as e:
+                logger.exception(str(e))
+            self.instrumentation.add('filter', time.perf_counter() - t0)
+
+    def processing_state(self, det):
+        """
+        Describe the processing of the displayed and analysed spectra of a detector, saved as attributes along with
+        its raw spectra
 
+        Returns
+        -------
+        dict: the baseline method and its options, the filter method and its options
+        """
+        state = dict(baseline_method=det.baseline.method)
+        if det.baseline.enabled:
+            state.update([(f'baseline_{key}', value) for key, value in det.baseline.options.items()])
+        state['filter_method'] = self.spectral_filter.method
+        if self.spectral_filter.enabled:
+            state.update(filter_window=self.spectral_filter.window, filter_order=self.spectral_filter.order,
+                         filter_derivative=self.spectral_filter.deriv)
+        return state
+
+    def convert_axis(self, data_nm, unit=None):
+        """
+        Convert an axis in nm into the selected units
 
+        Parameters
+        ----------
+        data_nm: (ndarray) axis in nm
+        unit: (str) the units to convert into, default is the selected ones
 
-    def update_axis(self):
+        Returns
+        -------
+        utils.Axis: the converted axis
+        """
         axis = utils.Axis()
-        unit = self.settings.child('acq_settings', 'units').value()
-        if unit == 'nm':
-            axis['data'] = self.viewer_freq_axis['data']
-        elif unit == 'cm-1':
-            axis['data'] = Enm2cmrel(self.viewer_freq_axis['data'],
-                                     self.settings.child('config_settings', 'laser_wl').value())
-        elif unit == 'eV':
-            axis['data'] = nm2eV(self.viewer_freq_axis['data'])
+        if unit is None:
+            unit = self.settings.child('acq_settings', 'units').value()
+        axis['data'] = None if data_nm is None else self.to_units(data_nm, unit)
         axis['units'] = unit
-        axis['label'] = 'Photon energy'
-        self.viewer.x_axis = axis
+        axis['label'] = units.label(unit)
+        return axis
+
+    def to_units(self, data_nm, unit=None, out=None):
+        """
+        Convert wavelengths in nm into the selected units (or the given ones), see units.from_nm
+        """
+        if unit is None:
+            unit = self.settings.child('acq_settings', 'units').value()
+        return units.from_nm(data_nm, unit, self.settings.child('config_settings', 'laser_wl').value(), out=out)
+
+    def display_axis(self, det):
+        """
+        Get the axis of a detector converted in the selected units, cached until the detector axis, the units or the
+        laser wavelength change. The Jacobian of the conversion is cached alongside, see display_data
+
+        Returns
+        -------
+        utils.Axis: the converted axis
+        """
+        unit = self.settings.child('acq_settings', 'units').value()
+        laser_wl = self.settings.child('config_settings', 'laser_wl').value()
+        cache = det.display_cache
+        if cache.get('source', None) is not det.viewer_freq_axis['data'] or cache['unit'] != unit or \
+                cache['laser_wl'] != laser_wl:
+            cache.clear()
+            cache.update(source=det.viewer_freq_axis['data'], unit=unit, laser_wl=laser_wl,
+                         axis=self.convert_axis(det.viewer_freq_axis['data']),
+                         jacobian=None if unit == 'nm' or det.viewer_freq_axis['data'] is None else
+                         units.jacobian(np.asarray(det.viewer_freq_axis['data'], dtype=float), unit))
+        return cache['axis']
+
+    def display_data(self, det):
+        """
+        Get the spectra of a detector to be displayed: if jacobian is set, the spectra are rescaled by the cached
+        Jacobian of the unit conversion into a buffer reused from frame to frame
+
+        Returns
+        -------
+        list of ndarray or ndarray: the processed spectra or the rescaled ones (n_channels, n_pixels), a list if the
+            channels have different sizes
+        """
+        jacobian = det.display_cache.get('jacobian', None)
+        if not self.settings.child('acq_settings', 'jacobian').value() or jacobian is None or \
+                len(det.processed_data) == 0 or np.size(det.processed_data[0]) != jacobian.size:
+            return det.processed_data
+        if any([np.size(spectrum) != jacobian.size for spectrum in det.processed_data]):
+            # channels of different sizes: only those matching the axis are rescaled
+            return [spectrum * jacobian if np.size(spectrum) == jacobian.size else spectrum
+                    for spectrum in det.processed_data]
+        buffer = det.display_cache.get('corrected', None)
+        if buffer is None or buffer.shape != (len(det.processed_data), jacobian.size):
+            buffer = np.empty((len(det.processed_data), jacobian.size))
+            det.display_cache['corrected'] = buffer
+        for ind, spectrum in enumerate(det.processed_data):
+            np.multiply(spectrum, jacobian, out=buffer[ind])
+        return buffer
+
+    def display(self, det):
+        """
+        Display the data of a detector in its viewer. Large spectra are decimated to their min/max envelope at the
+        screen resolution (if lod is set) and the axis is only sent to the viewer when it changed.
+        """
+        if det.viewer is None or len(det.processed_data) == 0 or det.viewer_freq_axis['data'] is None:
+            return
+        t0 = time.perf_counter()
+        axis = self.display_axis(det)
+        datas = self.display_data(det)
+        self.instrumentation.add('update_axis', time.perf_counter() - t0)
+        t1 = time.perf_counter()
+
+        n_bins = None
+        if self.settings.child('acq_settings', 'lod').value():
+            view_box = det.viewer.viewer.plotwidget.plotItem.vb
+            n_bins = lod_bins(axis['data'], view_box.viewRange()[0], view_box.width())
+        if n_bins is not None:
+            cache = det.display_cache
+            if cache.get('n_bins', None) != n_bins:
+                cache.update(n_bins=n_bins, lod_axis=utils.Axis(data=decimate_axis(axis['data'], n_bins),
+                                                                units=axis['units'], label=axis['label']))
+            datas = decimate_minmax(datas, n_bins)
+            axis = cache['lod_axis']
+        t2 = time.perf_counter()
+        self.instrumentation.add('lod', t2 - t1)
+
+        if det.displayed_axis is not axis:
+            det.viewer.show_data(datas, x_axis=axis)
+            det.displayed_axis = axis
+        else:
+            det.viewer.show_data(datas)
+        self.instrumentation.add('viewer', time.perf_counter() - t2)
+
+    def lod_range_changed(self, det):
+        """
+        Display again the last data of a detector if the zoom changes the level of detail
+        """
+        if not self.settings.child('acq_settings', 'lod').value() or len(det.processed_data) == 0 or \
+                det.viewer_freq_axis['data'] is None or self.is_merged():
+            return
+        view_box = det.viewer.viewer.plotwidget.plotItem.vb
+        if lod_bins(self.display_axis(det)['data'], view_box.viewRange()[0], view_box.width()) != \
+                det.display_cache.get('n_bins', None):
+            self.display(det)
+
+    def update_axis(self, det=None, all_dets=False):
+        """
+        Update the axis displayed in the viewer of a detector (the selected one by default or all of them)
+        """
+        if self.is_merged():
+            self.show_merged()
+            return
+        if all_dets:
+            dets = list(self.detectors.values()) if len(self.detectors) != 0 else [self.selected]
+        else:
+            dets = [self.selected if det is None else det]
+        for det in dets:
+            if det.viewer is not None and det.viewer_freq_axis['data'] is not None:
+                axis = self.display_axis(det)
+                if len(det.processed_data) != 0:
+                    self.display(det)
+                elif det.displayed_axis is not axis:
+                    det.viewer.x_axis = axis
+                    det.displayed_axis = axis
+                if det is self.selected:
+                    self.waterfall.set_axis(axis)
+                    self.rois.set_display_axis(axis['data'], axis['units'])
+                    self.comparison.set_units(axis['units'], self.settings.child('config_settings', 'laser_wl').value())
+                    self.peak_tracker.set_units(axis['units'],
+                                                self.settings.child('config_settings', 'laser_wl').value())
 
 
     def create_menu(self, menubar):
@@ -625,6 +1453,7 @@ class Spectrometer(QObject):
         self.preset_menu = menubar.addMenu(self.dashboard.preset_menu)
         self.preset_menu.menu().addSeparator()
         self.preset_menu.menu().addAction('Offline Mode', lambda: self.initialized(state=False, offline=True))
+        self.preset_menu.menu().addAction('Simulated detector', lambda: self.set_simulated_detector())
 
     def load_layout_state(self, file=None):
         """
@@ -637,35 +1466,139 @@ class Spectrometer(QObject):
         try:
             if file is None:
                 file = select_file(save=False, ext='dock')
-            if file is not None:
-                with open(str(file), 'rb') as f:
-                    dockstate = pickle.load(f)
-                    self.dockarea.restoreState(dockstate)
-            file = file.name
-            self.settings.child('loaded_files', 'layout_file').setValue(file)
+            if file:
+                with open(str(file), 'r') as f:
+                    self.dockarea.restoreState(json.load(f))
         except Exception as e:
             logger.exception(str(e))
 
     def save_layout_state(self, file=None):
         """
-            Save the current layout state in the select_file obtained pathname file.
-            Once done dump the pickle.
+            Save the current layout state (as json) in the select_file obtained pathname file.
 
             See Also
             --------
             utils.select_file
         """
         try:
-            dockstate = self.dockarea.saveState()
-            if 'float' in dockstate:
-                dockstate['float'] = []
+            dockstate = session.dock_state_to_json(self.dockarea.saveState())
             if file is None:
                 file = select_file(start_path=None, save=True, ext='dock')
-            if file is not None:
-                with open(str(file), 'wb') as f:
-                    pickle.dump(dockstate, f, pickle.HIGHEST_PROTOCOL)
+            if file:
+                with open(str(file), 'w') as f:
+                    json.dump(dockstate, f)
+        except Exception as e:
+            logger.exception(str(e))
+
+    def session_state(self):
+        """
+        Returns
+        -------
+        dict: JSON serializable state of the application, see utils.session
+        """
+        source = None
+        if len(self.detectors) != 0:
+            source = 'simulated' if all([det.module.__class__.__name__ == 'SimulatedSpectrometer'
+                                         for det in self.detectors.values()]) else 'preset'
+        preset_file = getattr(self.dashboard, 'preset_file', None)
+        return dict(
+            docks=session.dock_state_to_json(self.dockarea.saveState()),
+            settings=session.filter_settings(self.settings.saveState(filter='user')),
+            source=source, n_detectors=len(self.detectors),
+            preset_file=None if preset_file is None else str(preset_file),
+            selected=self.selected.title,
+            detectors=dict([(det.title, dict(calib_coeffs=det.calib_coeffs, use_calib=det.use_calib,
+                                             spectro_wl=det.spectro_wl, exposure_ms=det.exposure_ms,
+                                             axis_units=det.viewer_freq_axis['units'], reduction=det.reducer.state))
+                            for det in list(self.detectors.values()) + [self.offline_det]]))
+
+    def save_session(self):
+        try:
+            spectra = dict([(det.title, (det.viewer_freq_axis['data'], det.raw_data))
+                            for det in list(self.detectors.values()) + [self.offline_det]])
+            session.save_session(Path(spectro_path).joinpath('session'), self.session_state(), spectra)
+        except Exception as e:
+            logger.exception(str(e))
+
+    def update_autosave(self):
+        interval = self.settings.child('config_settings', 'session', 'autosave_s').value()
+        if interval > 0:
+            self.autosave_timer.start(interval * 1000)
+        else:
+            self.autosave_timer.stop()
+
+    def restore_session(self):
+        """
+        Restore in one pass the last saved session: settings (without triggering the tree changes one by one), dock
+        layout, then the detectors (preset or simulated) whose state and calibration are applied as soon as they are
+        created, and the last spectra
+        """
+        try:
+            state, spectra = session.load_session(Path(spectro_path).joinpath('session'))
+            if state is None or not state['settings']['children']['config_settings']['children']['session'][
+                    'children']['restore_session']['value']:
+                return
+            self.settings.restoreState(state['settings'], addChildren=False, removeChildren=False, blockSignals=True)
+            self.settings.child('config_settings', 'show_det').setValue(False)
+            try:  # the docks of the detectors are created later, when they are loaded
+                self.dockarea.restoreState(state['docks'], missing='ignore')
+            except TypeError:  # older pyqtgraph
+                self.dockarea.restoreState(state['docks'])
+            self._session_detectors = state['detectors']
+            self._session_spectra = spectra
+            self.update_log_file()
+            self.log_model.set_max_size(self.settings.child('config_settings', 'log', 'log_max').value())
+            self.update_server()
+            self.update_display_mode()
+            self.baseline_changed()
+            self.filter_changed()
+
+            if state['source'] == 'preset' and state['preset_file'] and Path(state['preset_file']).is_file():
+                self.dashboard.set_preset_mode(state['preset_file'])
+            elif state['source'] == 'simulated':
+                self.set_simulated_detector(state['n_detectors'])
+            else:
+                self.restore_detectors_state([self.offline_det])
+                if len(self.offline_det.raw_data) != 0:
+                    self.initialized(False, offline=True)
+            if state['selected'] in self.detectors:
+                self.settings.child('config_settings', 'selected_det').setValue(state['selected'])
+            self.update_status('Session restored', log_type='log')
         except Exception as e:
             logger.exception(str(e))
+        finally:
+            self.update_autosave()
+
+    def restore_detectors_state(self, detectors=None):
+        """
+        Apply the state saved in the restored session to the detectors (done once, when they are created)
+        """
+        if detectors is None:
+            detectors = list(self.detectors.values())
+        for det in detectors:
+            det_state = self._session_detectors.pop(det.title, None)
+            if det_state is not None:
+                det.calib_coeffs = list(det_state['calib_coeffs'])
+                det.use_calib = det_state['use_calib']
+                if det_state['exposure_ms'] is not None:
+                    self.set_exposure_ms(det_state['exposure_ms'], det)
+                if 'reduction' in det_state:
+                    det.reducer.configure(**det_state['reduction'])
+                    if det is self.selected:
+                        self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
+                        self.set_reduction_settings(det.reducer)
+                        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+                if det.use_calib:
+                    det.apply_calibration()
+            if det.title in self._session_spectra:
+                axis, datas = self._session_spectra.pop(det.title)
+                if axis is not None and det.viewer_freq_axis['data'] is None:
+                    det.viewer_freq_axis['data'] = axis
+                    if det_state is not None:
+                        det.viewer_freq_axis['units'] = det_state['axis_units']
+                det.raw_data = [data for data in datas]
+                self.process_data(det)
+                self.display(det)
 
 
 
@@ -674,12 +1607,17 @@ class Spectrometer(QObject):
         webbrowser.open(logging.getLogger('pymodaq').handlers[0].baseFilename)
 
     def show_units_converter(self):
+        from units_converter.main import UnitsConverter
         self.units_converter = UnitsConverter()
         dock_converter = Dock('Units Converter', size=(300, 350))
         self.dockarea.addDock(dock_converter, 'bottom', self.dock_logger)
         dock_converter.addWidget(self.units_converter.parent)
 
-    def load_file(self):
+    def load_file(self, show=True):
+        """
+        Load a 1D data node of a h5 file, it is added to the comparison workspace and (if show) displayed
+        """
+        from pymodaq.daq_utils.h5modules import browse_data, H5BrowserUtil
         data, fname, node_path = browse_data(ret_all=True)
         if data is not None:
             h5utils = H5BrowserUtil()
@@ -688,16 +1626,38 @@ class Spectrometer(QObject):
             data_node = h5utils.get_node(node_path)
             if data_node.attrs['type'] == 'data':
                 if data_node.attrs['data_dimension'] == '1D':
-                    data_dict = OrderedDict(data1D=dict(raw=dict(data=data, x_axis=axes['x_axis'])))
-                    self.show_data(data_dict)
+                    x_axis = axes['x_axis']
+                    self.comparison.add_trace(f'{Path(fname).stem}{node_path}', x_axis['data'], data,
+                                              x_axis['units'] if x_axis['units'] else 'nm')
+                    if show:
+                        data_dict = OrderedDict(data1D=dict(raw=dict(data=data, x_axis=x_axis)))
+                        self.show_data(data_dict)
             h5utils.close_file()
 
+    def snapshot_to_comparison(self):
+        det = self.selected
+        if len(det.processed_data) != 0:
+            calibrated = det.current_det['calib'] or det.use_calib
+            self.comparison.add_spectra(f'{det.title} {datetime.datetime.now():%H:%M:%S}',
+                                        det.viewer_freq_axis['data'], det.processed_data,
+                                        'nm' if calibrated else 'Pxls')
+
     def quit_function(self):
         #close all stuff that need to be
-        if self.detector is not None:
-            self.detector.quit_fun()
+        self.autosave_timer.stop()
+        self.mapper.stop()
+        self.decomposition.stop_thread()
+        self.save_session()
+        if self.server is not None:
+            self.server.stop()
+        self.close_shared()
+        self.log_model.close()
+        if self.calib_store is not None:
+            self.calib_store.close()
+        for det in self.detectors.values():
+            det.module.quit_fun()
             QtWidgets.QApplication.processEvents()
-            self.mainwindow.close()
+        self.mainwindow.close()
 
     def create_toolbar(self):
         self.toolbar.addWidget(QtWidgets.QLabel('Acquisition:'))
@@ -741,11 +1701,135 @@ class Spectrometer(QObject):
 
 
     def grab_detector(self):
-        self.detector.ui.grab_pb.click()
+        """
+        Start (or stop) the grab loop of all the detectors, each one grabbing independently
+        """
+        for det in self.detectors.values():
+            if det.module.ui.grab_pb.isChecked() != self.grab_action.isChecked():
+                det.module.ui.grab_pb.click()
 
     def snap_detector(self):
-        self.detector.ui.single_pb.click()
+        for det in self.detectors.values():
+            det.module.ui.single_pb.click()
+
+    def update_server(self):
+        if self.settings.child('config_settings', 'server', 'server_enabled').value():
+            port = self.settings.child('config_settings', 'server', 'server_port').value()
+            if self.server is None:
+                from pymodaq_spectro.utils.server import SpectrumServer
+                self.server = SpectrumServer()
+                self.server.command_signal.connect(self.server_command)
+            if self.server.start(port, self.settings.child('config_settings', 'server', 'server_buffer_kb').value() * 1024):
+                self.update_status(f'Spectrum server listening on port {port}', log_type='log')
+        elif self.server is not None:
+            self.server.stop()
+
+    def publish_shared(self, det):
+        """
+        Copy the frame of a detector into its shared memory ring buffer, the buffer is (re)created when the number
+        of channels or pixels changes
+        """
+        try:
+            if len(det.raw_data) == 0:
+                return
+            shape = (len(det.raw_data), np.size(det.raw_data[0]))
+            writer = self.shm_writers.get(det.title, None)
+            if writer is None or writer.shape != shape:
+                from pymodaq_spectro.utils.shared_memory import SharedSpectraWriter, segment_name
+                if writer is not None:
+                    writer.close()
+                writer = SharedSpectraWriter(
+                    segment_name(self.settings.child('config_settings', 'shm', 'shm_prefix').value(), det.title),
+                    self.settings.child('config_settings', 'shm', 'shm_slots').value(), *shape,
+                    dtype=np.asarray(det.raw_data[0]).dtype)
+                self.shm_writers[det.title] = writer
+            writer.write(det.raw_data, det.viewer_freq_axis['data'])
+        except Exception as e:
+            logger.exception(str(e))
+
+    def close_shared(self):
+        for writer in self.shm_writers.values():
+            writer.close()
+        self.shm_writers = dict([])
 
+    def server_command(self, header):
+        """
+        Apply a command sent by a client of the spectrum server and acknowledge it
+
+        Parameters
+        ----------
+        header: (dict) with keys command, value, client and optionally source (the detector title)
+        """
+        client = header['client']
+        try:
+            det = self.detectors.get(header.get('source', self.selected.title), None)
+            if det is None or det.module is None:
+                self.server.acknowledge(client, header['command'], False, 'no such detector')
+                return
+            if header['command'] == 'set_exposure_ms':
+                if det is self.selected:
+                    self.settings.child('acq_settings', 'exposure_ms').setValue(float(header['value']))
+                else:
+                    self.set_exposure_ms(float(header['value']), det)
+            elif header['command'] == 'set_spectro_wl':
+                self.set_spectro_wl(float(header['value']), det)
+            elif header['command'] == 'snap':
+                det.module.ui.single_pb.click()
+            elif header['command'] == 'grab':
+                if det.module.ui.grab_pb.isChecked() != bool(header['value']):
+                    det.module.ui.grab_pb.click()
+            self.server.acknowledge(client, header['command'])
+        except Exception as e:
+            logger.exception(str(e))
+            try:
+                self.server.acknowledge(client, header['command'], False, str(e))
+            except Exception as e:
+                logger.exception(str(e))
+
+    def start_sequence(self):
+        """
+        Start the sequence defined in the sequencer settings on the selected detector, frames are saved in the
+        selected h5 file
+        """
+        try:
+            if self.detector is None:
+                self.update_status('No detector to run a sequence with', log_type='log')
+                return
+            steps = self.sequencer.get_steps()
+            if len(steps) == 0:
+                return
+            path = select_file(start_path=self.save_file_pathname, save=True, ext='h5')
+            if not (not(path)):
+                self.sequencer.start(self.selected, steps, path, self.processing_state(self.selected))
+        except Exception as e:
+            logger.exception(str(e))
+
+
+    def start_mapping(self):
+        """
+        Start the map defined in the mapping settings on the selected detector, spectra are saved in the selected h5
+        file. The band integrated in the live map is given in the displayed units.
+        """
+        try:
+            if self.detector is None:
+                self.update_status('No detector to run a map with', log_type='log')
+                return
+            det = self.selected
+            band = None
+            band_bounds = (self.mapper.settings.child('band_min').value(),
+                           self.mapper.settings.child('band_max').value())
+            if band_bounds[0] != band_bounds[1] and det.viewer_freq_axis['data'] is not None:
+                band = range_to_indexes(self.display_axis(det)['data'], band_bounds)
+                if band is None:
+                    self.update_status('The band of the map is out of the spectral range', log_type='log')
+                    return
+            path = select_file(start_path=self.save_file_pathname, save=True, ext='h5')
+            if not (not(path)):
+                move_modules = dict([(module.title, module) for module in getattr(self.dashboard, 'move_modules', [])])
+                self.mapper.start(det, move_modules, path, band, self.processing_state(det))
+                self.dock_mapping.raiseDock()
+        except Exception as e:
+            logger.exception(str(e))
 
     def save_data(self, export=False):
         try:
@@ -756,37 +1840,53 @@ class Spectrometer(QObject):
             path = select_file(start_path=self.save_file_pathname, save=True, ext=ext)
             if not (not(path)):
                 if not export:
+                    from pymodaq.daq_utils.h5modules import H5Saver
                     h5saver = H5Saver(save_type='detector')
                     h5saver.init_file(update_h5=True, custom_naming=False, addhoc_file_path=path)
 
-                    settings_str = b'<All_settings>' + custom_tree.parameter_to_xml_string(self.settings)
-                    if self.detector is not None:
-                        settings_str += custom_tree.parameter_to_xml_string(self.detector.settings)
-                        if hasattr(self.detector.ui.viewers[0], 'roi_manager'):
-                            settings_str += custom_tree.parameter_to_xml_string(self.detector.ui.viewers[0].roi_manager.settings)
-                    settings_str += custom_tree.parameter_to_xml_string(h5saver.settings)
-                    settings_str += b'</All_settings>'
-
-                    det_group = h5saver.add_det_group(h5saver.raw_group, "Data", settings_str)
-                    try:
-                        self.channel_arrays = OrderedDict([])
-                        data_dim = 'data1D'
-                        if not h5saver.is_node_in_group(det_group, data_dim):
-                            self.channel_arrays['data1D'] = OrderedDict([])
-                            data_group = h5saver.add_data_group(det_group, data_dim)
-                            for ind_channel, data in enumerate(self.raw_data):  # list of numpy arrays
-                                channel = f'CH{ind_channel:03d}'
-                                channel_group = h5saver.add_CH_group(data_group, title=channel)
-
-                                self.channel_arrays[data_dim]['parent'] = channel_group
-                                self.channel_arrays[data_dim][channel] = h5saver.add_data(channel_group,
-                                                                                          dict(data=data,
-                                                                                               x_axis=self.viewer_freq_axis),
-                                                                                          scan_type='',
-                                                                                          enlargeable=False)
-                        h5saver.close_file()
-                    except Exception as e:
-                        logger.exception(str(e))
+                    dets = [det for det in self.detectors.values() if len(det.raw_data) != 0]
+                    if len(dets) == 0:
+                        dets = [self.selected]
+                    self.channel_arrays = OrderedDict([])
+                    for det in dets:
+                        settings_str = b'<All_settings>' + custom_tree.parameter_to_xml_string(self.settings)
+                        if det.module is not None:
+                            settings_str += custom_tree.parameter_to_xml_string(det.module.settings)
+                            if hasattr(det.module.ui.viewers[0], 'roi_manager'):
+                                settings_str += custom_tree.parameter_to_xml_string(det.module.ui.viewers[0].roi_manager.settings)
+                        settings_str += custom_tree.parameter_to_xml_string(h5saver.settings)
+                        settings_str += b'</All_settings>'
+
+                        det_group = h5saver.add_det_group(h5saver.raw_group, "Data" if len(dets) == 1 else det.title,
+                                                          settings_str)
+                        for key, value in self.processing_state(det).items():  # of the displayed spectra and ROIs
+                            det_group.attrs[key] = value
+                        try:
+                            data_dim = 'data1D'
+                            if not h5saver.is_node_in_group(det_group, data_dim):
+                                self.channel_arrays[det.title] = OrderedDict([])
+                                data_group = h5saver.add_data_group(det_group, data_dim)
+                                for ind_channel, data in enumerate(det.raw_data):  # list of numpy arrays
+                                    channel = f'CH{ind_channel:03d}'
+                                    channel_group = h5saver.add_CH_group(data_group, title=channel)
+
+                                    self.channel_arrays[det.title]['parent'] = channel_group
+                                    self.channel_arrays[det.title][channel] = h5saver.add_data(channel_group,
+                                                                                              dict(data=data,
+                                                                                                   x_axis=det.viewer_freq_axis),
+                                                                                              scan_type='',
+                                                                                              enlargeable=False)
+                            if det is self.selected and self.rois.last_values is not None:
+                                data_group = h5saver.add_data_group(det_group, 'data0D')
+                                for ind_channel, values in enumerate(self.rois.last_values):
+                                    for name, value in zip(self.rois.integrator.names, values):
+                                        channel_group = h5saver.add_CH_group(data_group,
+                                                                             title=f'{name}_CH{ind_channel:03d}')
+                                        h5saver.add_data(channel_group, dict(data=np.array([value])), scan_type='',
+                                                         enlargeable=False)
+                        except Exception as e:
+                            logger.exception(str(e))
+                    h5saver.close_file()
                 else:
                     data_to_save = [self.viewer_freq_axis['data']]
                     data_to_save.extend([dat for dat in self.raw_data])
@@ -808,11 +1908,17 @@ class Spectrometer(QObject):
             ================ ========= ======================
 
         """
-        now = datetime.datetime.now()
-        new_item = QtWidgets.QListWidgetItem(str(now) + ": " + txt)
-        self.logger_list.addItem(new_item)
-        ##to do
-        ##self.save_parameters.logger_array.append(str(now)+": "+txt)
+        self.log_model.add(txt)
+
+    def update_log_file(self):
+        log_settings = self.settings.child('config_settings', 'log')
+        try:
+            self.log_model.set_writer(log_settings.child('log_file').value()
+                                      if log_settings.child('log_to_file').value() else None,
+                                      max_bytes=log_settings.child('log_file_kb').value() * 1000)
+        except OSError as e:
+            logger.exception(str(e))
+            self.log_model.set_writer(None)
 
     @Slot(str)
     def emit_log(self, txt):
@@ -0,0 +1,250 @@
+"""
+Baseline (fluorescence background) estimation of spectra:
+
+* ALS: asymmetric least squares smoothing, points above the baseline being weighted by p and the others by 1 - p
+* airPLS: adaptive iteratively reweighted penalized least squares, without asymmetry parameter
+* Rolling ball: morphological opening by a flat element of a given radius, then smoothed
+* Polynomial: polynomial iteratively fitted below the spectrum (modified polyfit)
+
+ALS and airPLS solve (W + lam D'D) z = W y (D second order difference), a pentadiagonal system solved in O(n) by a
+banded Cholesky factorization. The penalty band is cached per (pixel count, smoothness). A BaselineRemover keeps, per
+channel, the converged weights and their factorization: the next frame is first solved with the cached factor (no
+factorization) and only iterated again if its weights differ, so that a steady live signal costs one back
+substitution per frame. Channels of the same size are processed at once, channels of different sizes one by one.
+scipy is only imported when a baseline is first computed.
+"""
+import functools
+import numpy as np
+
+methods = ['None', 'ALS', 'airPLS', 'Rolling ball', 'Polynomial']
+
+
+def spectra_list(spectra):
+    """
+    The spectra (list of ndarray, 1D or 2D ndarray) as a list of float ndarray, channels may have different sizes
+    """
+    if isinstance(spectra, np.ndarray):
+        return list(np.atleast_2d(spectra.astype(float, copy=False)))
+    datas = [np.asarray(data, dtype=float) for data in spectra]
+    if len(datas) != 0 and datas[0].ndim == 0:  # one spectrum given as a list of values
+        return [np.array(datas)]
+    return datas
+
+
+@functools.lru_cache(maxsize=16)
+def penalty_band(n_pixels, lam):
+    """
+    Upper banded storage (3, n_pixels) of lam * D'D, D being the second order difference matrix (read only, cached)
+    """
+    if n_pixels < 4:
+        raise ValueError('At least 4 pixels are needed to estimate a baseline')
+    band = np.zeros((3, n_pixels))
+    band[2] = 6
+    band[2, [0, -1]] = 1
+    band[2, [1, -2]] = 5
+    band[1, 1:] = -4
+    band[1, [1, -1]] = -2
+    band[0, 2:] = 1
+    band *= lam
+    band.flags.writeable = False
+    return band
+
+
+@functools.lru_cache(maxsize=16)
+def polynomial_basis(n_pixels, order):
+    """
+    Vandermonde matrix (n_pixels, order + 1) and its pseudo inverse for least squares polynomial fits (cached)
+    """
+    vander = np.polynomial.polynomial.polyvander(np.linspace(-1, 1, n_pixels), order)
+    pinv = np.linalg.pinv(vander)
+    vander.flags.writeable = False
+    pinv.flags.writeable = False
+    return vander, pinv
+
+
+def _weighted_smooth(y, weights, lam):
+    from scipy.linalg import cholesky_banded, cho_solve_banded
+    ab = penalty_band(y.size, lam).copy()
+    ab[2] += weights
+    factor = cholesky_banded(ab, lower=False)
+    return factor, cho_solve_banded((factor, False), weights * y)
+
+
+def _new_weights(method, y, z, p, iteration):
+    """
+    Returns
+    -------
+    ndarray: the weights for the next iteration
+    float: residual used to test the convergence (fraction of weights changed for ALS, relative negative residual
+        for airPLS)
+    """
+    if method == 'ALS':
+        return np.where(y > z, p, 1 - p), None
+    d = y - z
+    negative = d < 0
+    dssn = np.abs(d[negative].sum())
+    weights = np.zeros_like(y)
+    if dssn != 0:
+        weights[negative] = np.exp(iteration * np.abs(d[negative]) / dssn)
+        weights[[0, -1]] = np.exp(iteration * np.abs(d[negative]).max() / dssn)
+    return weights, dssn / max(np.abs(y).sum(), np.finfo(float).tiny)
+
+
+def _converged(method, weights, new_weights, residual, tol):
+    if method == 'ALS':
+        return np.count_nonzero(weights != new_weights) <= tol * weights.size
+    return residual < tol
+
+
+def smooth_baseline(y, method='ALS', lam=1e5, p=0.01, n_iter=15, tol=1e-3, reuse_tol=0.05, state=None):
+    """
+    ALS or airPLS baseline of one spectrum
+
+    Parameters
+    ----------
+    y: (ndarray) the spectrum
+    method: (str) ALS or airPLS
+    lam: (float) smoothness
+    p: (float) asymmetry (ALS only)
+    n_iter: (int) maximum number of iterations
+    tol: (float) convergence: fraction of changed weights (ALS) or relative negative residual (airPLS)
+    reuse_tol: (float) fraction of changed ALS weights (noise around the baseline) below which the cached
+        factorization of the previous frame is reused as is
+    state: (dict) weights and factor of a previous call, used as a starting point and updated in place
+
+    Returns
+    -------
+    ndarray: the baseline
+    """
+    from scipy.linalg import cho_solve_banded
+    y = np.asarray(y, dtype=float)
+    if state is not None and state.get('weights', None) is not None and state['weights'].size == y.size:
+        # first try the cached factorization of the previous frame
+        weights, factor = state['weights'], state['factor']
+        z = cho_solve_banded((factor, False), weights * y)
+        new_weights, residual = _new_weights(method, y, z, p, 1)
+        if _converged(method, weights, new_weights, residual, reuse_tol if method == 'ALS' else tol):
+            return z
+        weights = new_weights if method == 'ALS' else weights
+    else:
+        weights = np.ones_like(y)
+    for iteration in range(1, n_iter + 1):
+        factor, z = _weighted_smooth(y, weights, lam)
+        new_weights, residual = _new_weights(method, y, z, p, iteration)
+        if _converged(method, weights, new_weights, residual, tol) or not np.any(new_weights):
+            break
+        weights = new_weights
+    if state is not None:
+        state.update(weights=weights, factor=factor)
+    return z
+
+
+def rolling_ball(datas, radius=50):
+    """
+    Baseline of several spectra at once (2D ndarray, one spectrum per row) by a morphological opening with a flat
+    element of 2 * radius + 1 pixels, smoothed by a moving average of the same width
+    """
+    from scipy import ndimage
+    size = 2 * int(radius) + 1
+    opened = ndimage.maximum_filter1d(ndimage.minimum_filter1d(datas, size, axis=-1, mode='nearest'), size,
+                                      axis=-1, mode='nearest')
+    return ndimage.uniform_filter1d(opened, size, axis=-1, mode='nearest')
+
+
+def polynomial(datas, order=3, n_iter=100, tol=1e-3):
+    """
+    Baseline of several spectra at once (2D ndarray, one spectrum per row): a polynomial is fitted, the spectra
+    clipped to it and fitted again until the fit is stable (modified polyfit)
+    """
+    vander, pinv = polynomial_basis(datas.shape[-1], order)
+    clipped = np.array(datas, dtype=float)
+    for ind in range(n_iter):
+        fit = (clipped @ pinv.T) @ vander.T
+        np.minimum(clipped, fit, out=clipped)
+        if np.all(np.abs(fit - clipped).sum(axis=-1) <= tol * np.abs(fit).sum(axis=-1)):
+            break
+    return fit
+
+
+class BaselineRemover:
+    """
+    Baseline removal of the spectra of a detector, the ALS/airPLS weights and factorizations are kept per channel
+    from frame to frame
+
+    Parameters
+    ----------
+    method: (str) one of methods
+    lam: (float) smoothness (ALS, airPLS)
+    p: (float) asymmetry (ALS)
+    radius: (int) radius in pixels (Rolling ball)
+    order: (int) polynomial order (Polynomial)
+    """
+    def __init__(self, method='None', lam=1e5, p=0.01, radius=50, order=3):
+        self.method = method
+        self.options = dict(lam=lam, p=p, radius=radius, order=order)
+        self.states = dict([])
+        self.baselines = None
+
+    def configure(self, method=None, **options):
+        if method is not None:
+            if method not in methods:
+                raise ValueError(f'{method} is not a valid baseline method, expected one of {methods}')
+            self.method = method
+        self.options.update(options)
+        self.states = dict([])
+
+    @property
+    def enabled(self):
+        return self.method != 'None'
+
+    def _batch_baseline(self, datas):
+        if self.method == 'Rolling ball':
+            return rolling_ball(datas, self.options['radius'])
+        elif self.method == 'Polynomial':
+            return polynomial(datas, self.options['order'])
+        return np.zeros_like(datas)
+
+    def baseline(self, spectra):
+        """
+        Parameters
+        ----------
+        spectra: (list of ndarray or 2D ndarray) the spectra of all channels (or a batch of spectra), possibly of
+            different sizes
+
+        Returns
+        -------
+        list of ndarray: the baseline of each spectrum
+        """
+        datas = spectra_list(spectra)
+        if self.method in ['ALS', 'airPLS']:
+            return [smooth_baseline(data, self.method, self.options['lam'], self.options['p'],
+                                    state=self.states.setdefault(ind, dict([]))) for ind, data in enumerate(datas)]
+        if len(datas) == 0:
+            return []
+        if len(set([data.size for data in datas])) == 1:
+            return list(self._batch_baseline(np.array(datas)))
+        return [self._batch_baseline(data[None, :])[0] for data in datas]
+
+    def process(self, spectra):
+        """
+        Returns
+        -------
+        list of ndarray: the spectra without their baseline, the baselines are kept in the baselines attribute
+        """
+        datas = spectra_list(spectra)
+        self.baselines = self.baseline(datas)
+        return [data - baseline for data, baseline in zip(datas, self.baselines)]
+
+
+def remove_baseline(spectra, method='ALS', **options):
+    """
+    Batch baseline removal of a set of spectra (2D ndarray, one spectrum per row), see BaselineRemover
+
+    Returns
+    -------
+    ndarray: the corrected spectra
+    ndarray: the baselines
+    """
+    remover = BaselineRemover(method, **options)
+    corrected = np.array(remover.process(spectra))
+    return corrected, np.array(remover.baselines)
@@ -0,0 +1,83 @@
+"""
+Startup benchmark of the spectrometer application. Run it with:
+
+    python -m pymodaq_spectro.utils.benchmarks --budget-ms 2000
+
+the script exits with a non zero code if the cold import of the spectrometer module takes longer than the budget. The
+same check is run by the test suite (tests/test_import_time.py) in CI.
+
+The per frame hot paths are benchmarked by the pytest-benchmark suite of tests/benchmarks:
+
+    python -m pytest tests/benchmarks
+"""
+import sys
+import argparse
+import subprocess
+
+
+def import_time(module='pymodaq_spectro.spectrometer', python=None):
+    """
+    Measure the cold import time of a module in a fresh interpreter using python -X importtime
+
+    Parameters
+    ----------
+    module: (str) the module to import
+    python: (str) the python executable, default is the current one
+
+    Returns
+    -------
+    float: cumulative import time of the module in ms
+    list of tuple: (cumulative time in ms, name) of all the imported modules, slowest first
+    """
+    if python is None:
+        python = sys.executable
+    proc = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        raise ImportError(f'Could not import {module}:\n{proc.stderr[-2000:]}')
+
+    timings = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(fields[1])
+        except ValueError:  # header line
+            continue
+        timings.append((cumulative / 1000, fields[2].strip()))
+
+    total = max([timing for timing, name in timings if name == module] + [0.])
+    return total, sorted(timings, reverse=True)
+
+
+def check_import_time(budget_ms, module='pymodaq_spectro.spectrometer', repeat=3, show=10):
+    """
+    Check that the cold import time of a module (best of repeat runs) is within budget
+
+    Returns
+    -------
+    bool: True if within budget
+    """
+    runs = [import_time(module) for ind in range(repeat)]
+    total, timings = min(runs, key=lambda run: run[0])
+    print(f'import {module}: {total:.1f} ms (budget: {budget_ms:.1f} ms)')
+    for timing, name in timings[:show]:
+        print(f'    {timing:10.1f} ms  {name}')
+    return total <= budget_ms
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Spectrometer import time benchmark')
+    parser.add_argument('--module', default='pymodaq_spectro.spectrometer', help='module whose import is timed')
+    parser.add_argument('--budget-ms', type=float, default=2000., help='maximum cold import time in ms')
+    parser.add_argument('--repeat', type=int, default=3, help='number of import runs, the best one is kept')
+    options = parser.parse_args(args)
+
+    if not check_import_time(options.budget_ms, options.module, options.repeat):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
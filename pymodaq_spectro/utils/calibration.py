@@ -9,12 +9,14 @@ from pymodaq.daq_utils.gui_utils import DockArea
 from pymodaq.daq_utils.plotting.viewer1D.viewer1D_main import Viewer1D
 from pyqtgraph.parametertree import Parameter, ParameterTree
 from pymodaq_spectro.utils.utils_classes import PandasModel
+from pymodaq_spectro.utils import units
+from pymodaq_spectro.utils import filters
 
 from pymodaq.daq_utils.h5modules import browse_data
 import pyqtgraph.parametertree.parameterTypes as pTypes
 import pymodaq.daq_utils.custom_parameter_tree as custom_tree
 from pyqtgraph import TextItem, ArrowItem
-from pymodaq.daq_utils.daq_utils import Enm2cmrel, Ecmrel2Enm, nm2eV, eV2nm, eV2radfs, l2w, set_logger, get_module_name
+from pymodaq.daq_utils.daq_utils import set_logger, get_module_name
 from pathlib import Path
 from scipy.signal import find_peaks
 
@@ -53,11 +55,20 @@ class Calibration(QtWidgets.QWidget):
 
     params = [{'title': 'Laser wavelength (nm):', 'name': 'laser_wl', 'type': 'float', 'value': 515.},
               {'title': 'Fit options:', 'name': 'fit_options', 'type': 'group', 'children': [
-                  {'title': 'Fit in?:', 'name': 'fit_units', 'type': 'list', 'value': 'nm', 'limits': ['nm', 'cm-1', 'eV']},
+                  {'title': 'Fit in?:', 'name': 'fit_units', 'type': 'list', 'value': 'nm', 'limits': list(units.units.keys())},
                   {'title': 'Polynomial Fit order:', 'name': 'fit_order', 'type': 'int', 'value': 1, 'min': 1, 'max':3},
                   {'title': 'Do calib:', 'name': 'do_calib', 'type': 'bool', 'value': False},
 
               ]},
+              {'title': 'Peak finding filter:', 'name': 'peak_filter', 'type': 'group', 'children': [
+                  {'title': 'Method:', 'name': 'filter_method', 'type': 'list', 'value': 'None',
+                   'limits': filters.methods},
+                  {'title': 'Window (pxls):', 'name': 'filter_window', 'type': 'int', 'value': 11, 'min': 1},
+                  {'title': 'Order:', 'name': 'filter_order', 'type': 'int', 'value': 2, 'min': 0, 'max': 10},
+                  {'title': 'Derivative:', 'name': 'derivative', 'type': 'list', 'value': 0, 'limits': [0, 2],
+                   'tooltip': 'With 2, peaks are searched on the opposite of the second derivative (resolves '
+                              'overlapping peaks)'},
+              ]},
               {'title': 'Peaks', 'name': 'peaks_table', 'type': 'table_view'},
               PeakGroup(title='Peak options:', name="peak_options", channels=[]),
               ]
@@ -79,6 +90,7 @@ class Calibration(QtWidgets.QWidget):
         self.table_model = None
         self.calib_plot = None
         self.filenames = []
+        self.peak_filter = filters.SpectralFilter()
 
     def create_toolbar(self):
         self.toolbar.addWidget(QtWidgets.QLabel('Calibration:'))
@@ -183,6 +195,9 @@ class Calibration(QtWidgets.QWidget):
                 if param.name() in custom_tree.iter_children(self.settings.child(('peak_options')), []):
                     self.update_peak_finding()
 
+                elif param.name() in custom_tree.iter_children(self.settings.child(('peak_filter')), []):
+                    self.update_peak_finding()
+
                 elif param.name() == 'fit_units':
                     if self.table_model is not None:
                         self.table_model.setHeaderData(2, Qt.Horizontal, data)
@@ -193,9 +208,35 @@ class Calibration(QtWidgets.QWidget):
             elif change == 'parent':
                 pass
 
+    def filtered_datas(self):
+        """
+        Get the spectra on which the peaks are searched: filtered (all channels in one pass if they have the same
+        size) and, for the second derivative, inverted so that peaks remain maxima
+
+        Returns
+        -------
+        dict: the filtered spectra keyed by channel
+        """
+        settings = self.settings.child(('peak_filter'))
+        self.peak_filter.configure(method=settings.child(('filter_method')).value(),
+                                   window=settings.child(('filter_window')).value(),
+                                   order=settings.child(('filter_order')).value(),
+                                   deriv=settings.child(('derivative')).value())
+        if not self.peak_filter.enabled:
+            return self.raw_datas
+        channels = list(self.raw_datas.keys())
+        datas = [self.raw_datas[channel] for channel in channels]
+        if len(set([np.size(data) for data in datas])) == 1:
+            filtered = self.peak_filter.process(datas)
+        else:
+            filtered = [self.peak_filter.process([data])[0] for data in datas]
+        sign = -1 if self.peak_filter.deriv == 2 else 1
+        return dict([(channel, sign * data) for channel, data in zip(channels, filtered)])
+
     def update_peak_finding(self):
         try:
             if len(self.raw_datas) != 0:
+                datas = self.filtered_datas()
                 peak_options = []
 
                 for channel in self.filenames:
@@ -214,7 +255,7 @@ class Calibration(QtWidgets.QWidget):
                 self.peak_amplitudes = []
                 if len(peak_options) != 0:
                     for option in peak_options:
-                        peak_indexes, properties = find_peaks(self.raw_datas[option['channel']], **option['opts'])
+                        peak_indexes, properties = find_peaks(datas[option['channel']], **option['opts'])
                         self.peak_indexes.extend(list(peak_indexes))
                         self.peak_amplitudes.extend(list(self.raw_datas[option['channel']][peak_indexes]))
 
@@ -268,13 +309,8 @@ class Calibration(QtWidgets.QWidget):
             data = data_to_use[dataframe.columns[2]].to_numpy()
             indexes = data_to_use['Pxl'].to_numpy()
 
-            unit = self.settings.child('fit_options', 'fit_units').value()
-            if unit == 'nm':
-                pass
-            elif unit == 'cm-1':
-                data = Ecmrel2Enm(data, self.settings.child(('laser_wl')).value())
-            elif unit == 'eV':
-                data = eV2nm(data)
+            data = units.to_nm(data.astype(float), self.settings.child('fit_options', 'fit_units').value(),
+                               self.settings.child(('laser_wl')).value())
 
             if data.size != 0:
                 if self.calib_plot is not None:
@@ -0,0 +1,164 @@
+"""
+Local SQLite store of the calibrations: every calibration is kept (full history) and indexed by detector, grating,
+center wavelength, laser wavelength and date so that the most recent one matching the current configuration is found
+with one indexed query.
+"""
+import sqlite3
+import time
+import datetime
+from pathlib import Path
+import pymodaq.daq_utils.custom_parameter_tree as custom_tree
+
+coeff_names = ['third_calib', 'second_calib', 'slope_calib', 'center_calib']
+
+schema = """
+CREATE TABLE IF NOT EXISTS calibrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    detector TEXT NOT NULL,
+    grating TEXT NOT NULL DEFAULT '',
+    center_wl REAL,
+    laser_wl REAL,
+    created REAL NOT NULL,
+    third_calib REAL NOT NULL,
+    second_calib REAL NOT NULL,
+    slope_calib REAL NOT NULL,
+    center_calib REAL NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    settings TEXT
+);
+CREATE INDEX IF NOT EXISTS calibrations_lookup ON calibrations (detector, grating, created);
+CREATE INDEX IF NOT EXISTS calibrations_center ON calibrations (detector, grating, center_wl);
+CREATE TABLE IF NOT EXISTS version (version INTEGER NOT NULL);
+"""
+version = 1
+
+
+class CalibrationStore:
+    """
+    Parameters
+    ----------
+    path: (str or Path) the database file, created if needed
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.executescript(schema)
+            if self.connection.execute('SELECT COUNT(*) FROM version').fetchone()[0] == 0:
+                self.connection.execute('INSERT INTO version VALUES (?)', (version,))
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, detector, coeffs, grating='', center_wl=None, laser_wl=None, comment='', settings=None,
+            created=None):
+        """
+        Add a calibration, previous ones are kept
+
+        Parameters
+        ----------
+        detector: (str) the detector title
+        coeffs: (list of float) third, second, slope and center coefficients
+        grating: (str) the grating (if known)
+        center_wl: (float) the center wavelength (nm) of the spectrometer when calibrated
+        laser_wl: (float) the laser wavelength (nm)
+        comment: (str)
+        settings: (str) xml string of the detector settings when calibrated
+        created: (float) timestamp, default is now
+
+        Returns
+        -------
+        int: the id of the calibration
+        """
+        with self.connection:
+            cursor = self.connection.execute(
+                f'INSERT INTO calibrations (detector, grating, center_wl, laser_wl, created, {", ".join(coeff_names)},'
+                f' comment, settings) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (detector, grating, center_wl, laser_wl, time.time() if created is None else created,
+                 *[float(coeff) for coeff in coeffs], comment, settings))
+        return cursor.lastrowid
+
+    def latest(self, detector, grating='', center_wl=None, center_tolerance=1., laser_wl=None, laser_tolerance=0.1):
+        """
+        Get the most recent calibration matching a configuration
+
+        Parameters
+        ----------
+        detector: (str)
+        grating: (str)
+        center_wl: (float) if not None, only calibrations done within center_tolerance (nm) of it are matched
+        laser_wl: (float) if not None, only calibrations done within laser_tolerance (nm) of it (or without laser
+            information) are matched
+
+        Returns
+        -------
+        dict or None: the calibration (keys are the columns of the table plus coeffs)
+        """
+        query = 'SELECT * FROM calibrations WHERE detector = ? AND grating = ?'
+        args = [detector, grating]
+        if center_wl is not None:
+            query += ' AND center_wl BETWEEN ? AND ?'
+            args.extend([center_wl - center_tolerance, center_wl + center_tolerance])
+        if laser_wl is not None:
+            query += ' AND (laser_wl IS NULL OR laser_wl BETWEEN ? AND ?)'
+            args.extend([laser_wl - laser_tolerance, laser_wl + laser_tolerance])
+        row = self.connection.execute(query + ' ORDER BY created DESC, id DESC LIMIT 1', args).fetchone()
+        return None if row is None else self._to_dict(row)
+
+    def get(self, calib_id):
+        row = self.connection.execute('SELECT * FROM calibrations WHERE id = ?', (calib_id,)).fetchone()
+        return None if row is None else self._to_dict(row)
+
+    def history(self, detector=None, limit=100):
+        """
+        Returns
+        -------
+        list of dict: the calibrations (of a detector or all), most recent first
+        """
+        if detector is None:
+            rows = self.connection.execute('SELECT * FROM calibrations ORDER BY created DESC, id DESC LIMIT ?',
+                                           (limit,))
+        else:
+            rows = self.connection.execute('SELECT * FROM calibrations WHERE detector = ? '
+                                           'ORDER BY created DESC, id DESC LIMIT ?', (detector, limit))
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row):
+        calib = dict(zip(row.keys(), tuple(row)))
+        calib['coeffs'] = [calib[name] for name in coeff_names]
+        return calib
+
+    @staticmethod
+    def describe(calib):
+        txt = f"{calib['id']}: {datetime.datetime.fromtimestamp(calib['created']):%Y-%m-%d %H:%M} {calib['detector']}"
+        if calib['grating']:
+            txt += f" / {calib['grating']}"
+        if calib['center_wl'] is not None:
+            txt += f" @ {calib['center_wl']:.2f} nm"
+        return txt
+
+    def import_xml(self, filename, detector, **kwargs):
+        """
+        Import a calibration saved as xml (by custom_tree.parameter_to_xml_file of the calib_coeffs group)
+
+        Returns
+        -------
+        int: the id of the calibration
+        """
+        children = custom_tree.XML_file_to_parameter(str(filename))
+        values = dict([(child['name'], child['value']) for child in children])
+        kwargs.setdefault('comment', f'imported from {Path(filename).name}')
+        return self.add(detector, [values[name] for name in coeff_names], **kwargs)
+
+    def export_xml(self, calib_id, filename):
+        """
+        Export a calibration in the xml format read by load_calib
+        """
+        from pyqtgraph.parametertree import Parameter
+        calib = self.get(calib_id)
+        param = Parameter.create(title='Calibration coeffs:', name='calib_coeffs', type='group', children=[
+            {'title': name, 'name': name, 'type': 'float', 'value': calib[name]} for name in coeff_names])
+        custom_tree.parameter_to_xml_file(param, str(filename))
@@ -0,0 +1,285 @@
+from collections import OrderedDict
+import itertools
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtGui
+from qtpy.QtCore import Qt, Signal
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq.daq_utils.gui_utils import select_file
+from pymodaq_spectro.utils import units
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+modes = ['Overlay', 'Difference to reference', 'Ratio to reference']
+
+
+class Trace:
+    """
+    A spectrum of the comparison workspace, with its own axis
+
+    Parameters
+    ----------
+    name: (str)
+    axis: (ndarray) the axis in axis_units
+    data: (ndarray)
+    axis_units: (str) 'nm' if calibrated (converted to the displayed units), anything else is displayed as is
+    """
+    _ids = itertools.count()
+
+    def __init__(self, name, axis, data, axis_units='nm'):
+        self.id = next(self._ids)
+        self.name = name
+        self.data = np.array(data, dtype=float)
+        axis = np.asarray(axis, dtype=float) if axis is not None else np.arange(self.data.size, dtype=float)
+        order = np.argsort(axis)  # sorted once so that it can be interpolated
+        self.axis = axis[order]
+        self.data = self.data[order]
+        self.axis_units = axis_units
+        self.item = None
+
+
+class Resampler:
+    """
+    Memoized linear interpolation of traces onto other traces axes: a resampled trace is computed once per
+    (trace, target axis) and kept in a bounded LRU cache (traces and their axes are immutable)
+
+    Parameters
+    ----------
+    max_size: (int) maximum number of resampled arrays kept
+    """
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.cache = OrderedDict([])
+        self.hits = 0
+        self.misses = 0
+
+    def resample(self, trace, target):
+        """
+        Returns
+        -------
+        ndarray: the data of trace on the axis of target (nan outside of the range of trace)
+        """
+        if trace is target:
+            return trace.data
+        key = (trace.id, target.id)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+        self.misses += 1
+        if trace.axis_units != target.axis_units:
+            resampled = np.full(target.axis.shape, np.nan)
+        else:
+            resampled = np.interp(target.axis, trace.axis, trace.data, left=np.nan, right=np.nan)
+        self.cache[key] = resampled
+        if len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        return resampled
+
+    def forget(self, trace):
+        for key in [key for key in self.cache if trace.id in key]:
+            del self.cache[key]
+
+
+class ComparisonWidget(QtWidgets.QWidget):
+    """
+    Workspace holding many spectra (loaded files or snapshots of the live ones) overlaid on one plot. Each trace is
+    drawn by its own curve item so that adding a trace does not redraw the others, traces are only resampled (and
+    memoized) when compared to the reference one.
+    """
+    snapshot_requested = Signal()
+    file_requested = Signal()
+
+    def __init__(self):
+        super().__init__()
+        self.traces = OrderedDict([])  # Trace objects keyed by their id
+        self.resampler = Resampler()
+        self.reference = None
+        self.unit = 'nm'
+        self.laser_wl = None
+        self._display_axes = dict([])  # trace id: axis converted in the displayed units
+        self.setupUI()
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        settings_layout = QtWidgets.QHBoxLayout()
+        snapshot_pb = QtWidgets.QPushButton('Snapshot')
+        snapshot_pb.setToolTip('Add the last spectra of the selected detector')
+        snapshot_pb.clicked.connect(self.snapshot_requested.emit)
+        settings_layout.addWidget(snapshot_pb)
+        file_pb = QtWidgets.QPushButton('Add file')
+        file_pb.clicked.connect(self.file_requested.emit)
+        settings_layout.addWidget(file_pb)
+        self.mode_combo = QtWidgets.QComboBox()
+        self.mode_combo.addItems(modes)
+        self.mode_combo.currentTextChanged.connect(lambda: self.update_curves())
+        settings_layout.addWidget(self.mode_combo)
+        reference_pb = QtWidgets.QPushButton('Set reference')
+        reference_pb.setToolTip('Use the selected trace as the reference')
+        reference_pb.clicked.connect(self.set_reference_from_selection)
+        settings_layout.addWidget(reference_pb)
+        average_pb = QtWidgets.QPushButton('Average')
+        average_pb.setToolTip('Add the average of the selected traces, resampled on the first one')
+        average_pb.clicked.connect(self.average_selected)
+        settings_layout.addWidget(average_pb)
+        export_pb = QtWidgets.QPushButton('Export')
+        export_pb.setToolTip('Save the visible traces, resampled on the reference (or first) trace axis, as ascii')
+        export_pb.clicked.connect(lambda: self.export())
+        settings_layout.addWidget(export_pb)
+        remove_pb = QtWidgets.QPushButton('Remove')
+        remove_pb.clicked.connect(self.remove_selected)
+        settings_layout.addWidget(remove_pb)
+        clear_pb = QtWidgets.QPushButton('Clear')
+        clear_pb.clicked.connect(self.clear)
+        settings_layout.addWidget(clear_pb)
+        layout.addLayout(settings_layout)
+
+        splitter = QtWidgets.QSplitter(Qt.Horizontal)
+        self.list_widget = QtWidgets.QListWidget()
+        self.list_widget.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.list_widget.itemChanged.connect(self.item_changed)
+        splitter.addWidget(self.list_widget)
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setClipToView(True)
+        self.plot_widget.setDownsampling(auto=True, mode='peak')
+        splitter.addWidget(self.plot_widget)
+        splitter.setSizes([150, 500])
+        layout.addWidget(splitter)
+
+    def add_trace(self, name, axis, data, axis_units='nm'):
+        """
+        Add a trace to the workspace, only its own curve is drawn
+
+        Returns
+        -------
+        Trace
+        """
+        trace = Trace(name, axis, data, axis_units)
+        self.traces[trace.id] = trace
+        color = pg.intColor(len(self.traces) - 1, hues=12, values=2)
+        trace.item = self.plot_widget.plot(pen=color)
+        self.update_curve(trace)
+
+        item = QtWidgets.QListWidgetItem(name)
+        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+        item.setCheckState(Qt.Checked)
+        item.setData(Qt.UserRole, trace.id)
+        item.setForeground(QtGui.QBrush(color))
+        self.list_widget.blockSignals(True)
+        self.list_widget.addItem(item)
+        self.list_widget.blockSignals(False)
+        return trace
+
+    def add_spectra(self, name, axis, datas, axis_units='nm'):
+        """
+        Add all the channels of a spectrum (a snapshot of a detector or a loaded file)
+        """
+        for ind, data in enumerate(datas):
+            self.add_trace(name if len(datas) == 1 else f'{name} CH{ind:02d}', axis, data, axis_units)
+
+    def set_units(self, unit, laser_wl=None):
+        """
+        Set the displayed units of the calibrated (nm) traces
+        """
+        if unit == self.unit and laser_wl == self.laser_wl:
+            return
+        self.unit = unit
+        self.laser_wl = laser_wl
+        self._display_axes = dict([])
+        self.update_curves()
+
+    def display_axis(self, trace):
+        if trace.id not in self._display_axes:
+            if trace.axis_units == 'nm':
+                try:
+                    self._display_axes[trace.id] = units.from_nm(trace.axis, self.unit, self.laser_wl)
+                except ValueError:  # relative units without laser
+                    self._display_axes[trace.id] = trace.axis
+            else:
+                self._display_axes[trace.id] = trace.axis
+        return self._display_axes[trace.id]
+
+    def trace_values(self, trace):
+        """
+        Get the values displayed for a trace depending on the comparison mode
+        """
+        mode = self.mode_combo.currentText()
+        if mode == 'Overlay' or self.reference is None or self.reference not in self.traces:
+            return self.display_axis(trace), trace.data
+        reference = self.traces[self.reference]
+        resampled = self.resampler.resample(trace, reference)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = resampled - reference.data if mode == 'Difference to reference' else resampled / reference.data
+        return self.display_axis(reference), values
+
+    def update_curve(self, trace):
+        trace.item.setData(*self.trace_values(trace), connect='finite')
+
+    def update_curves(self):
+        for trace in self.traces.values():
+            self.update_curve(trace)
+
+    def selected_traces(self):
+        return [self.traces[item.data(Qt.UserRole)] for item in self.list_widget.selectedItems()]
+
+    def item_changed(self, item):
+        trace = self.traces[item.data(Qt.UserRole)]
+        trace.item.setVisible(item.checkState() == Qt.Checked)
+        trace.name = item.text()
+
+    def set_reference_from_selection(self):
+        selected = self.selected_traces()
+        self.reference = selected[0].id if len(selected) != 0 else None
+        for ind in range(self.list_widget.count()):
+            item = self.list_widget.item(ind)
+            font = item.font()
+            font.setBold(item.data(Qt.UserRole) == self.reference)
+            item.setFont(font)
+        if self.mode_combo.currentText() != 'Overlay':
+            self.update_curves()
+
+    def average_selected(self):
+        selected = self.selected_traces()
+        if len(selected) < 2:
+            return
+        target = selected[0]
+        average = np.nanmean([self.resampler.resample(trace, target) for trace in selected], axis=0)
+        self.add_trace(f'Average of {len(selected)}', target.axis, average, target.axis_units)
+
+    def remove_selected(self):
+        for item in self.list_widget.selectedItems():
+            trace = self.traces.pop(item.data(Qt.UserRole))
+            self.plot_widget.removeItem(trace.item)
+            self.resampler.forget(trace)
+            self._display_axes.pop(trace.id, None)
+            self.list_widget.takeItem(self.list_widget.row(item))
+            if trace.id == self.reference:
+                self.reference = None
+                self.update_curves()
+
+    def clear(self):
+        for trace in self.traces.values():
+            self.plot_widget.removeItem(trace.item)
+        self.traces = OrderedDict([])
+        self.resampler.cache.clear()
+        self._display_axes = dict([])
+        self.reference = None
+        self.list_widget.clear()
+
+    def export(self, path=None):
+        """
+        Save the visible traces resampled on the axis of the reference trace (or of the first visible one)
+        """
+        visible = [trace for trace in self.traces.values() if trace.item.isVisible()]
+        if len(visible) == 0:
+            return
+        if path is None:
+            path = select_file(save=True, ext='dat')
+        if not path:
+            return
+        target = self.traces.get(self.reference, visible[0])
+        data_to_save = [target.axis] + [self.resampler.resample(trace, target) for trace in visible]
+        np.savetxt(str(path), np.array(data_to_save).T, delimiter='\t',
+                   header='\t'.join([target.axis_units] + [trace.name for trace in visible]))
@@ -0,0 +1,107 @@
+"""
+Level of detail for the display of large spectra: the data is reduced to its min/max envelope in n_bins bins (two
+points per bin) so that what is drawn is visually identical to the full resolution data at the screen resolution.
+"""
+import numpy as np
+
+
+def _bins(n_points, n_bins):
+    """
+    Returns
+    -------
+    int: number of points per bin
+    int: number of full bins, the remaining points make one more (partial) bin
+    """
+    bin_size = int(np.ceil(n_points / n_bins))
+    return bin_size, n_points // bin_size
+
+
+def decimate_axis(x, n_bins):
+    """
+    Axis matching the output of decimate_minmax: first and last value of each bin
+
+    Parameters
+    ----------
+    x: (ndarray) the full resolution axis
+    n_bins: (int)
+
+    Returns
+    -------
+    ndarray: the decimated axis (2 points per bin)
+    """
+    x = np.asarray(x)
+    bin_size, n_full = _bins(x.size, n_bins)
+    x_bins = x[:n_full * bin_size].reshape((n_full, bin_size))
+    first = x_bins[:, 0]
+    last = x_bins[:, -1]
+    if n_full * bin_size < x.size:
+        first = np.append(first, x[n_full * bin_size])
+        last = np.append(last, x[-1])
+    out = np.empty((2 * first.size,), dtype=x.dtype)
+    out[0::2] = first
+    out[1::2] = last
+    return out
+
+
+def decimate_minmax(datas, n_bins):
+    """
+    Min/max envelope of several spectra computed at once (channels of different sizes are decimated one by one)
+
+    Parameters
+    ----------
+    datas: (list of ndarray or 2D ndarray) the spectra of each channel
+    n_bins: (int)
+
+    Returns
+    -------
+    ndarray or list of ndarray: shape (n_channels, 2 * number of bins), min and max of each bin interleaved (a list
+    of the decimated channels if their sizes differ)
+    """
+    if not isinstance(datas, np.ndarray) and len(set([np.size(data) for data in datas])) > 1:
+        return [decimate_minmax(data, n_bins)[0] for data in datas]
+    datas = np.asarray(datas)
+    if datas.ndim == 1:
+        datas = datas[None, :]
+    n_points = datas.shape[1]
+    bin_size, n_full = _bins(n_points, n_bins)
+    bins = datas[:, :n_full * bin_size].reshape((datas.shape[0], n_full, bin_size))
+    mins = bins.min(axis=2)
+    maxs = bins.max(axis=2)
+    if n_full * bin_size < n_points:
+        mins = np.concatenate((mins, datas[:, n_full * bin_size:].min(axis=1, keepdims=True)), axis=1)
+        maxs = np.concatenate((maxs, datas[:, n_full * bin_size:].max(axis=1, keepdims=True)), axis=1)
+    out = np.empty((datas.shape[0], 2 * mins.shape[1]), dtype=datas.dtype)
+    out[:, 0::2] = mins
+    out[:, 1::2] = maxs
+    return out
+
+
+def lod_bins(x, view_range, width_px):
+    """
+    Get the number of bins needed to display data on a plot with one min/max envelope per screen pixel column for
+    the visible part of the data
+
+    Parameters
+    ----------
+    x: (ndarray) the full resolution axis
+    view_range: (tuple) visible (xmin, xmax)
+    width_px: (int) width of the plot in screen pixels
+
+    Returns
+    -------
+    int or None: the number of bins (a power of two so that small zoom changes do not change it), None if the full
+    resolution data should be displayed
+    """
+    n_points = np.size(x)
+    width_px = max(int(width_px), 100)
+    if n_points <= 4 * width_px:
+        return None
+    n_visible = np.count_nonzero((x >= min(view_range)) & (x <= max(view_range)))
+    if n_visible == 0:
+        n_visible = n_points
+    if n_visible <= 2 * width_px:
+        return None  # zoomed in: full resolution
+    n_bins = int(2**np.ceil(np.log2(width_px * n_points / n_visible)))
+    if 2 * n_bins >= n_points:
+        return None
+    return n_bins
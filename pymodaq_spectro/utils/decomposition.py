@@ -0,0 +1,378 @@
+"""
+Streaming component analysis of the series of spectra recorded by the spectrometer (sequences: one frame group per
+acquisition, maps: one cube per channel). The spectra are read sequentially by batches so that recordings larger than
+the memory can be analysed: incremental PCA (rank k SVD updated batch after batch) or mini-batch NMF (online
+multiplicative updates on accumulated sufficient statistics). The component spectra and their time traces (or maps)
+are written back into the file.
+"""
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtCore
+from qtpy.QtCore import QObject, Slot, Signal, QThread
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq.daq_utils.gui_utils import select_file
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+methods = ['PCA', 'NMF']
+eps = 1e-12
+
+
+class IncrementalPCA:
+    """
+    Principal component analysis updated batch by batch: the SVD of the previous components (scaled by their
+    singular values), the new centered batch and a mean correction row is computed at each batch, so that the memory
+    only depends on the batch size and the number of pixels. The spectra are accumulated until there are at least
+    n_components of them for the first SVD.
+
+    Parameters
+    ----------
+    n_components: (int)
+    """
+    def __init__(self, n_components):
+        self.n_components = n_components
+        self.n_samples = 0
+        self.mean = None
+        self.components = None
+        self.singular_values = None
+        self.explained_variance = None
+        self._pending = None  # spectra received before the first SVD
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.shape[0] == 0:
+            return
+        if self.n_samples == 0:
+            if self._pending is not None:
+                X = np.vstack((self._pending, X))
+            if X.shape[0] < self.n_components:
+                self._pending = X
+                return
+            self._pending = None
+        n_new = X.shape[0]
+        batch_mean = X.mean(axis=0)
+        if self.n_samples == 0:
+            stacked = X - batch_mean
+            mean = batch_mean
+        else:
+            n_total = self.n_samples + n_new
+            mean = (self.n_samples * self.mean + n_new * batch_mean) / n_total
+            correction = np.sqrt(self.n_samples * n_new / n_total) * (self.mean - batch_mean)
+            stacked = np.vstack((self.singular_values[:, None] * self.components, X - batch_mean, correction))
+        _, S, Vt = np.linalg.svd(stacked, full_matrices=False)
+        self.n_samples += n_new
+        self.mean = mean
+        self.components = Vt[:self.n_components]
+        self.singular_values = S[:self.n_components]
+        self.explained_variance = self.singular_values ** 2 / max(self.n_samples - 1, 1)
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean) @ self.components.T
+
+
+class MiniBatchNMF:
+    """
+    Non negative matrix factorization X ~ H @ W learned batch by batch: the activations H of a batch are solved
+    with W fixed, then W is updated from the statistics H.T @ H and H.T @ X accumulated over the batches (older
+    batches being forgotten by the factor forget). Negative values of the spectra are clipped to 0.
+
+    Parameters
+    ----------
+    n_components: (int)
+    n_inner: (int) number of multiplicative updates per batch
+    forget: (float) weight of the statistics of the previous batches at each update
+    """
+    def __init__(self, n_components, n_inner=20, forget=0.95, seed=0):
+        self.n_components = n_components
+        self.n_inner = n_inner
+        self.forget = forget
+        self.rng = np.random.default_rng(seed)
+        self.components = None
+        self._A = None
+        self._B = None
+
+    def _init(self, X):
+        scale = np.sqrt(max(X.mean(), eps) / self.n_components)
+        self.components = scale * self.rng.random((self.n_components, X.shape[1])) + eps
+        self._A = np.zeros((self.n_components, self.n_components))
+        self._B = np.zeros((self.n_components, X.shape[1]))
+
+    def _activations(self, X):
+        W = self.components
+        H = np.full((X.shape[0], self.n_components), np.sqrt(max(X.mean(), eps) / self.n_components))
+        XWt = X @ W.T
+        WWt = W @ W.T
+        for ind in range(self.n_inner):
+            H *= XWt / (H @ WWt + eps)
+        return H
+
+    def partial_fit(self, X):
+        X = np.clip(np.asarray(X, dtype=float), 0, None)
+        if X.shape[0] == 0:
+            return
+        if self.components is None:
+            self._init(X)
+        H = self._activations(X)
+        self._A = self.forget * self._A + H.T @ H
+        self._B = self.forget * self._B + H.T @ X
+        for ind in range(self.n_inner):
+            self.components *= self._B / (self._A @ self.components + eps)
+
+    def transform(self, X):
+        return self._activations(np.clip(np.asarray(X, dtype=float), 0, None))
+
+
+class H5SpectraReader:
+    """
+    Sequential access to the spectra of a recording: the frames of a sequence (see Sequencer) or the cube of a map
+    (see Mapper), one channel at a time
+
+    Parameters
+    ----------
+    h5file: (tables.File) opened file
+    channel: (int) the channel analysed
+    """
+    def __init__(self, h5file, channel=0):
+        self.h5file = h5file
+        self.channel = channel
+        self.x_axis = None
+        if 'map' in h5file.root:
+            self.kind = 'map'
+            self.cube = h5file.get_node('/map', f'CH{channel:02d}')
+            self.traces_shape = self.cube.shape[:2]
+            self.n_spectra = self.cube.shape[0] * self.cube.shape[1]
+            if 'x_axis' in h5file.root.map:
+                self.x_axis = h5file.root.map.x_axis.read()
+        else:
+            self.kind = 'sequence'
+            groups = [group for group in h5file.list_nodes('/', classname='Group')
+                      if group._v_name.startswith('frame_')]
+            # by index, not name: 'frame_%05d' names do not sort above 99999 frames
+            self.frames = [group._v_name for group in sorted(groups, key=self.frame_index)]
+            if len(self.frames) == 0:
+                raise ValueError(f'No spectra found in {h5file.filename}')
+            self.traces_shape = (len(self.frames),)
+            self.n_spectra = len(self.frames)
+            first = h5file.get_node('/', self.frames[0])
+            if 'x_axis' in first:
+                self.x_axis = first.x_axis.read()
+
+    @staticmethod
+    def frame_index(group):
+        """int: the index of a frame group, stored as attribute (or in the name for older files)"""
+        if 'index' in group._v_attrs:
+            return int(group._v_attrs['index'])
+        return int(group._v_name.split('_')[-1])
+
+    def batches(self, batch_size):
+        """
+        Yield the spectra by batches, in the order of the recording (row by row for maps). Spectra never acquired
+        (NaN in a map) are included, see valid
+
+        Yields
+        ------
+        ndarray: shape (n, n_pixels)
+        """
+        if self.kind == 'map':
+            n_x = self.cube.shape[1]
+            rows_per_batch = max(1, batch_size // n_x)
+            for iy in range(0, self.cube.shape[0], rows_per_batch):
+                block = self.cube[iy:iy + rows_per_batch]
+                yield block.reshape((-1, block.shape[-1]))
+        else:
+            for ind in range(0, len(self.frames), batch_size):
+                yield np.array([np.atleast_2d(self.h5file.get_node('/', frame).data.read())[self.channel]
+                                for frame in self.frames[ind:ind + batch_size]])
+
+    @staticmethod
+    def valid(batch):
+        return np.all(np.isfinite(batch), axis=1)
+
+
+def analyse(path, method='PCA', n_components=3, channel=0, batch_size=256, n_epochs=1, progress=None):
+    """
+    Decompose the spectra of a recording and write the results in the /decomposition group of the file (replaced if
+    it exists): components (n_components, n_pixels), traces (the recording shape + (n_components,)), mean and
+    explained_variance (PCA)
+
+    Parameters
+    ----------
+    path: (str or Path) the h5 file
+    method: (str) one of methods
+    n_components: (int)
+    channel: (int)
+    batch_size: (int) number of spectra read at once
+    n_epochs: (int) number of passes over the recording to learn the components
+    progress: (callable) called with the fraction of the work done
+
+    Returns
+    -------
+    dict: components, traces, x_axis and explained_variance (None for NMF)
+    """
+    import tables
+    with tables.open_file(str(path), 'a') as h5file:
+        reader = H5SpectraReader(h5file, channel)
+        model = IncrementalPCA(n_components) if method == 'PCA' else MiniBatchNMF(n_components)
+        n_epochs = 1 if method == 'PCA' else n_epochs  # incremental PCA is exact in one pass
+        n_steps = (n_epochs + 1) * reader.n_spectra
+        done = 0
+        for epoch in range(n_epochs):
+            for batch in reader.batches(batch_size):
+                model.partial_fit(batch[reader.valid(batch)])
+                done += batch.shape[0]
+                if progress is not None:
+                    progress(done / n_steps)
+        if model.components is None:
+            raise ValueError(f'At least {n_components} valid spectra are needed for {n_components} components')
+
+        traces = np.full((reader.n_spectra, n_components), np.nan)
+        start = 0
+        for batch in reader.batches(batch_size):
+            valid = reader.valid(batch)
+            if np.any(valid):
+                traces[start:start + batch.shape[0]][valid] = model.transform(batch[valid])
+            start += batch.shape[0]
+            done += batch.shape[0]
+            if progress is not None:
+                progress(done / n_steps)
+        traces = traces.reshape(reader.traces_shape + (n_components,))
+
+        if 'decomposition' in h5file.root:
+            h5file.remove_node('/', 'decomposition', recursive=True)
+        group = h5file.create_group('/', 'decomposition', title=f'{method} of channel {channel}')
+        group._v_attrs['method'] = method
+        group._v_attrs['channel'] = channel
+        group._v_attrs['n_spectra'] = reader.n_spectra
+        h5file.create_array(group, 'components', model.components)
+        h5file.create_array(group, 'traces', traces)
+        if reader.x_axis is not None:
+            h5file.create_array(group, 'x_axis', reader.x_axis)
+        explained_variance = None
+        if method == 'PCA':
+            h5file.create_array(group, 'mean', model.mean)
+            explained_variance = model.explained_variance
+            h5file.create_array(group, 'explained_variance', explained_variance)
+    return dict(components=model.components, traces=traces, x_axis=reader.x_axis,
+                explained_variance=explained_variance)
+
+
+class DecompositionWorker(QObject):
+    """
+    Run analyse in its own thread
+    """
+    progress_signal = Signal(float)
+    done_signal = Signal(dict)
+    error_signal = Signal(str)
+
+    @Slot(dict)
+    def run(self, options):
+        try:
+            self.done_signal.emit(analyse(progress=self.progress_signal.emit, **options))
+        except Exception as e:
+            logger.exception(str(e))
+            self.error_signal.emit(str(e))
+
+
+class DecompositionWidget(QtWidgets.QWidget):
+    """
+    Select a recording, decompose it in a background thread and plot the component spectra (on the axis saved in
+    the file) and their traces
+    """
+    run_signal = Signal(dict)
+    status_signal = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.setupUI()
+        self.worker = DecompositionWorker()
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.run_signal.connect(self.worker.run)
+        self.worker.progress_signal.connect(lambda value: self.progress_bar.setValue(int(100 * value)))
+        self.worker.done_signal.connect(self.show_results)
+        self.worker.error_signal.connect(self.analysis_failed)
+        self.thread.start()
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        settings_layout = QtWidgets.QHBoxLayout()
+        self.method_combo = QtWidgets.QComboBox()
+        self.method_combo.addItems(methods)
+        settings_layout.addWidget(self.method_combo)
+        settings_layout.addWidget(QtWidgets.QLabel('Components:'))
+        self.components_sb = QtWidgets.QSpinBox()
+        self.components_sb.setRange(1, 50)
+        self.components_sb.setValue(3)
+        settings_layout.addWidget(self.components_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Channel:'))
+        self.channel_sb = QtWidgets.QSpinBox()
+        self.channel_sb.setRange(0, 100)
+        settings_layout.addWidget(self.channel_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Batch:'))
+        self.batch_sb = QtWidgets.QSpinBox()
+        self.batch_sb.setRange(1, 100000)
+        self.batch_sb.setValue(256)
+        self.batch_sb.setToolTip('Number of spectra read at once')
+        settings_layout.addWidget(self.batch_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Epochs:'))
+        self.epochs_sb = QtWidgets.QSpinBox()
+        self.epochs_sb.setRange(1, 100)
+        self.epochs_sb.setValue(3)
+        self.epochs_sb.setToolTip('Number of passes over the recording (NMF only)')
+        settings_layout.addWidget(self.epochs_sb)
+        self.analyse_pb = QtWidgets.QPushButton('Analyse file')
+        self.analyse_pb.clicked.connect(lambda: self.analyse_file())
+        settings_layout.addWidget(self.analyse_pb)
+        self.progress_bar = QtWidgets.QProgressBar()
+        settings_layout.addWidget(self.progress_bar)
+        layout.addLayout(settings_layout)
+
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
+        self.components_plot = pg.PlotWidget()
+        self.components_plot.addLegend()
+        self.components_plot.setLabel('left', 'Components')
+        splitter.addWidget(self.components_plot)
+        self.traces_plot = pg.PlotWidget()
+        self.traces_plot.setLabel('left', 'Weights')
+        self.traces_plot.setLabel('bottom', 'Spectrum index')
+        splitter.addWidget(self.traces_plot)
+        layout.addWidget(splitter)
+
+    def analyse_file(self, path=None):
+        if path is None:
+            path = select_file(save=False, ext='h5')
+        if not path:
+            return
+        self.analyse_pb.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.run_signal.emit(dict(path=str(path), method=self.method_combo.currentText(),
+                                  n_components=self.components_sb.value(), channel=self.channel_sb.value(),
+                                  batch_size=self.batch_sb.value(), n_epochs=self.epochs_sb.value()))
+
+    def analysis_failed(self, txt):
+        self.analyse_pb.setEnabled(True)
+        self.status_signal.emit(f'Decomposition failed: {txt}')
+
+    def show_results(self, results):
+        self.analyse_pb.setEnabled(True)
+        self.components_plot.clear()
+        self.traces_plot.clear()
+        components = results['components']
+        x_axis = results['x_axis']
+        if x_axis is None or np.size(x_axis) != components.shape[1]:
+            x_axis = np.arange(components.shape[1])
+        traces = results['traces'].reshape((-1, components.shape[0]))  # maps are plotted point by point
+        for ind, component in enumerate(components):
+            name = f'#{ind}'
+            if results['explained_variance'] is not None:
+                name += f' ({results["explained_variance"][ind]:.3g})'
+            pen = pg.intColor(ind, hues=max(components.shape[0], 9))
+            self.components_plot.plot(x_axis, component, pen=pen, name=name)
+            self.traces_plot.plot(traces[:, ind], pen=pen, connect='finite')
+        self.status_signal.emit('Decomposition done, results saved in the /decomposition group of the file')
+
+    def stop_thread(self):
+        self.thread.quit()
+        self.thread.wait()
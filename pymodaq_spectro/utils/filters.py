@@ -0,0 +1,134 @@
+"""
+Smoothing and derivative filters of spectra: Savitzky-Golay, Gaussian and moving average (optionally followed by a
+first or second derivative). The kernels are computed once per (method, window, order, derivative) and applied to all
+the channels at once by a single correlation along the pixels (edges are extended with the edge values), channels of
+different sizes being filtered one by one. Derivatives are per pixel. scipy is only imported when a filter is first
+applied.
+"""
+import functools
+from math import factorial
+import numpy as np
+from pymodaq_spectro.utils.baseline import spectra_list
+
+methods = ['None', 'Savitzky-Golay', 'Gaussian', 'Moving average']
+
+
+@functools.lru_cache(maxsize=32)
+def kernel(method, window, order=2, deriv=0):
+    """
+    Correlation kernel of a filter: filtered[i] = sum(kernel[j] * data[i - window // 2 + j])
+
+    Parameters
+    ----------
+    method: (str) one of methods (but None)
+    window: (int) size of the kernel in pixels, made odd (for the Gaussian, the kernel spans +- 3 sigma)
+    order: (int) polynomial order (Savitzky-Golay only)
+    deriv: (int) 0 (smoothing), 1 or 2: derivative order
+
+    Returns
+    -------
+    ndarray: the kernel (read only)
+    """
+    half = int(window) // 2
+    x = np.arange(-half, half + 1, dtype=float)
+    if method == 'Savitzky-Golay':
+        if order >= x.size:
+            raise ValueError(f'The Savitzky-Golay order ({order}) should be lower than the window ({x.size})')
+        if deriv > order:
+            raise ValueError(f'The derivative ({deriv}) should not be higher than the Savitzky-Golay order ({order})')
+        coeffs = np.linalg.pinv(np.polynomial.polynomial.polyvander(x, order))[deriv] * factorial(deriv)
+    elif method == 'Gaussian':
+        sigma = max(x.size / 6, 0.5)
+        gaussian = np.exp(-x ** 2 / (2 * sigma ** 2))
+        gaussian /= gaussian.sum()
+        if deriv == 0:
+            coeffs = gaussian
+        elif deriv == 1:
+            coeffs = x * gaussian
+            coeffs /= np.sum(x * coeffs)  # unit response to a slope
+        else:
+            coeffs = (x ** 2 / sigma ** 2 - 1) * gaussian
+            coeffs -= coeffs.mean()  # no response to a constant despite the truncation
+            coeffs /= np.sum(x ** 2 / 2 * coeffs)  # unit response to a parabola
+    elif method == 'Moving average':
+        coeffs = np.full(x.shape, 1 / x.size)
+        for ind in range(deriv):
+            coeffs = np.convolve(coeffs, [-0.5, 0, 0.5])  # central differences
+    else:
+        raise ValueError(f'{method} is not a valid filter, expected one of {methods[1:]}')
+    coeffs.flags.writeable = False
+    return coeffs
+
+
+def apply_kernel(datas, coeffs):
+    """
+    Filter several spectra (2D ndarray, one spectrum per row) at once
+
+    Returns
+    -------
+    ndarray: the filtered spectra, same shape as datas
+    """
+    from scipy import ndimage
+    return ndimage.correlate1d(np.atleast_2d(np.asarray(datas, dtype=float)), coeffs, axis=-1, mode='nearest')
+
+
+class SpectralFilter:
+    """
+    Parameters
+    ----------
+    method: (str) one of methods
+    window: (int) size of the kernel in pixels
+    order: (int) polynomial order (Savitzky-Golay)
+    deriv: (int) derivative order: 0, 1 or 2
+    """
+    def __init__(self, method='None', window=11, order=2, deriv=0):
+        self.configure(method, window, order, deriv)
+
+    def configure(self, method=None, window=None, order=None, deriv=None):
+        if method is not None:
+            if method not in methods:
+                raise ValueError(f'{method} is not a valid filter, expected one of {methods}')
+            self.method = method
+        if window is not None:
+            self.window = window
+        if order is not None:
+            self.order = order
+        if deriv is not None:
+            self.deriv = deriv
+
+    @property
+    def enabled(self):
+        return self.method != 'None'
+
+    @property
+    def kernel(self):
+        return kernel(self.method, self.window, self.order, self.deriv)
+
+    def process(self, spectra):
+        """
+        Parameters
+        ----------
+        spectra: (list of ndarray or 2D ndarray) the spectra of all channels (or a batch of spectra), possibly of
+            different sizes
+
+        Returns
+        -------
+        list of ndarray: the filtered spectra (the spectra themselves if the filter is disabled)
+        """
+        if not self.enabled:
+            return list(spectra)
+        datas = spectra_list(spectra)
+        if len(set([data.size for data in datas])) > 1:
+            return [apply_kernel(data, self.kernel)[0] for data in datas]
+        return list(apply_kernel(datas, self.kernel))
+
+
+def filter_spectra(spectra, method='Savitzky-Golay', window=11, order=2, deriv=0):
+    """
+    Batch filtering of a set of spectra (2D ndarray, one spectrum per row), see SpectralFilter
+
+    Returns
+    -------
+    ndarray: the filtered spectra
+    """
+    return np.array(SpectralFilter(method, window, order, deriv).process(spectra))
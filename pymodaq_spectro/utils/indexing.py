@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def range_to_indexes(axis, bounds):
+    """
+    Get the pixel index range of the part of a (monotonic, increasing or decreasing) axis within bounds
+
+    Parameters
+    ----------
+    axis: (ndarray) the axis values for each pixel
+    bounds: (tuple) two values in the axis units, in any order
+
+    Returns
+    -------
+    tuple of int: (first, last) pixel indexes (included), None if the range does not intersect the axis
+    """
+    inside = np.flatnonzero((axis >= min(bounds)) & (axis <= max(bounds)))
+    if inside.size == 0:
+        return None
+    return int(inside[0]), int(inside[-1])
+
+
+def pixel_to_axis(pixels, axis):
+    """
+    Convert (fractional) pixel indexes into axis values by linear interpolation
+    """
+    return np.interp(pixels, np.arange(np.size(axis)), axis)
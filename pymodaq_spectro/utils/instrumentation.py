@@ -0,0 +1,213 @@
+import csv
+import json
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+from qtpy import QtWidgets, QtCore
+from pymodaq.daq_utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+stages = OrderedDict([('interval', 'time between two frames of a detector'),
+                      ('signal_hop', "from the plugin emission to the Spectrometer, only measured if the plugin "
+                                     "adds a 'timestamp' (time.perf_counter) to its data, as the simulated "
+                                     "detector does (n/a for the other plugins)"),
+                      ('ingestion', 'extraction of the spectra and axis from the data'),
+                      ('baseline', 'baseline removal'),
+                      ('filter', 'smoothing/derivative filter'),
+                      ('update_axis', 'unit conversion of the axis (cached)'),
+                      ('lod', 'min/max decimation of the spectra for display'),
+                      ('viewer', 'Viewer1D.show_data'),
+                      ('peaks', 'fit of the tracked peaks'),
+                      ('rois', 'integration of the spectral ROIs'),
+                      ('total', 'from the reception of the frame to the end of its processing'),
+                      ])
+
+
+class StageTimer:
+    """
+    Rolling buffer of the durations of one stage of the frame processing
+    """
+    def __init__(self, size=1000):
+        self.values = np.zeros((size,))
+        self.count = 0
+
+    def add(self, duration):
+        self.values[self.count % self.values.size] = duration
+        self.count += 1
+
+    def samples(self):
+        if self.count < self.values.size:
+            return self.values[:self.count]
+        return np.roll(self.values, -(self.count % self.values.size))
+
+    def reset(self):
+        self.count = 0
+
+    def stats(self):
+        """
+        Returns
+        -------
+        OrderedDict: count, mean, p50, p95, p99 and max (in ms) over the last frames
+        """
+        samples = self.samples() * 1000
+        if samples.size == 0:
+            return OrderedDict(count=0, mean=np.nan, p50=np.nan, p95=np.nan, p99=np.nan, max=np.nan)
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return OrderedDict(count=self.count, mean=np.mean(samples), p50=p50, p95=p95, p99=p99, max=np.max(samples))
+
+
+class FrameInstrumentation:
+    """
+    Per frame timing of the Spectrometer hot path, each stage is recorded in a rolling buffer (times in s from
+    time.perf_counter)
+
+    Dropped frames are counted from the gaps in the 'frame_index' key of the data (if the plugin provides it) and from
+    the frames not displayed because a newer one arrived before the display (merged display). Likewise, the signal hop
+    is only measured from the 'timestamp' key of the data: the DAQ_Viewer plugins do not provide it (only the
+    simulated detector does) and a time taken at the grab_done_signal emission would not include the hop from the
+    plugin thread, so the stage stays empty for them.
+    """
+    def __init__(self, size=1000):
+        self.enabled = True
+        self.size = size
+        self.timers = OrderedDict([(stage, StageTimer(size)) for stage in stages])
+        self.frames = 0
+        self.dropped = 0
+        self._last_time = dict([])
+        self._last_index = dict([])
+
+    def reset(self):
+        for timer in self.timers.values():
+            timer.reset()
+        self.frames = 0
+        self.dropped = 0
+        self._last_time = dict([])
+        self._last_index = dict([])
+
+    def add(self, stage, duration):
+        if self.enabled:
+            self.timers[stage].add(duration)
+
+    def new_frame(self, source, data, t0):
+        """
+        Register the reception of a frame
+
+        Parameters
+        ----------
+        source: (str) the detector title
+        data: (OrderedDict) the data emitted by the detector
+        t0: (float) time.perf_counter() at reception
+        """
+        if not self.enabled:
+            return
+        self.frames += 1
+        if source in self._last_time:
+            self.timers['interval'].add(t0 - self._last_time[source])
+        self._last_time[source] = t0
+        if 'timestamp' in data:
+            self.timers['signal_hop'].add(t0 - data['timestamp'])
+        if 'frame_index' in data:
+            if source in self._last_index and data['frame_index'] > self._last_index[source] + 1:
+                self.dropped += data['frame_index'] - self._last_index[source] - 1
+            self._last_index[source] = data['frame_index']
+
+    def frame_dropped(self):
+        if self.enabled:
+            self.dropped += 1
+
+    def summary(self):
+        """
+        Returns
+        -------
+        OrderedDict: the stats of each stage (see StageTimer.stats)
+        """
+        return OrderedDict([(stage, timer.stats()) for stage, timer in self.timers.items()])
+
+    def dump(self, path):
+        """
+        Save the statistics and all the recorded samples, as json or csv depending on the file extension. The csv file
+        has one column per stage and one row per sample (oldest first), the stages with fewer samples being left blank
+        """
+        path = Path(path)
+        if path.suffix == '.csv':
+            samples = OrderedDict([(stage, timer.samples()) for stage, timer in self.timers.items()])
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(samples.keys()), restval='')
+                writer.writeheader()
+                for ind in range(max([values.size for values in samples.values()])):
+                    writer.writerow(dict([(stage, f'{values[ind]:.9f}') for stage, values in samples.items()
+                                          if ind < values.size]))
+        else:
+            summary = self.summary()
+            content = dict(frames=self.frames, dropped=self.dropped, units='s',
+                           stats=dict([(stage, dict([(key, float(val) / (1 if key == 'count' else 1000))
+                                                     for key, val in stats.items()]))
+                                       for stage, stats in summary.items()]),
+                           samples=dict([(stage, timer.samples().tolist()) for stage, timer in self.timers.items()]))
+            with open(path, 'w') as f:
+                json.dump(content, f, indent=1)
+
+
+class DiagnosticsWidget(QtWidgets.QWidget):
+    """
+    Display the statistics of a FrameInstrumentation object, refreshed periodically
+    """
+    columns = ['count', 'mean', 'p50', 'p95', 'p99', 'max']
+
+    def __init__(self, instrumentation, refresh_ms=1000):
+        super().__init__()
+        self.instrumentation = instrumentation
+        self.setupUI()
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        buttons = QtWidgets.QHBoxLayout()
+        self.enable_cb = QtWidgets.QCheckBox('Enabled')
+        self.enable_cb.setChecked(self.instrumentation.enabled)
+        self.enable_cb.toggled.connect(lambda state: setattr(self.instrumentation, 'enabled', state))
+        reset_pb = QtWidgets.QPushButton('Reset')
+        reset_pb.clicked.connect(self.instrumentation.reset)
+        dump_pb = QtWidgets.QPushButton('Dump')
+        dump_pb.setToolTip('Save the statistics and samples as .json or .csv')
+        dump_pb.clicked.connect(self.dump)
+        buttons.addWidget(self.enable_cb)
+        buttons.addWidget(reset_pb)
+        buttons.addWidget(dump_pb)
+        layout.addLayout(buttons)
+
+        self.frames_label = QtWidgets.QLabel('')
+        layout.addWidget(self.frames_label)
+
+        self.table = QtWidgets.QTableWidget(len(stages), len(self.columns))
+        self.table.setHorizontalHeaderLabels([col if col == 'count' else f'{col} (ms)' for col in self.columns])
+        self.table.setVerticalHeaderLabels(list(stages.keys()))
+        for ind, description in enumerate(stages.values()):
+            self.table.verticalHeaderItem(ind).setToolTip(description)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        self.frames_label.setText(f'Frames: {self.instrumentation.frames}, dropped: {self.instrumentation.dropped}')
+        for ind_stage, stats in enumerate(self.instrumentation.summary().values()):
+            for ind_col, col in enumerate(self.columns):
+                if stats['count'] == 0:
+                    text = 'n/a'  # not measured (or not reported by the plugin, see stages)
+                else:
+                    text = f'{stats[col]:d}' if col == 'count' else f'{stats[col]:.3f}'
+                self.table.setItem(ind_stage, ind_col, QtWidgets.QTableWidgetItem(text))
+
+    def dump(self):
+        try:
+            path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Dump diagnostics', '', 'JSON (*.json);;CSV (*.csv)')
+            if not (not(path)):
+                self.instrumentation.dump(path)
+        except Exception as e:
+            logger.exception(str(e))
@@ -0,0 +1,156 @@
+import time
+import datetime
+import logging
+import logging.handlers
+import queue
+from collections import deque
+from qtpy import QtWidgets, QtCore
+from qtpy.QtCore import Qt
+
+
+class LogWriter:
+    """
+    Write log lines to a rotating file from a background thread, so that logging never waits for the disk
+
+    Parameters
+    ----------
+    path: (str) the log file
+    max_bytes: (int) size above which the file is rotated
+    backups: (int) number of rotated files kept
+    """
+    def __init__(self, path, max_bytes=1000000, backups=3):
+        self.path = str(path)
+        self.queue = queue.SimpleQueue()
+        handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups,
+                                                       encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.listener = logging.handlers.QueueListener(self.queue, handler)
+        self.listener.start()
+
+    def write(self, line):
+        self.queue.put(logging.makeLogRecord(dict(msg=line, levelno=logging.INFO, levelname='INFO')))
+
+    def stop(self):
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+
+
+class LogModel(QtCore.QAbstractListModel):
+    """
+    Bounded list model of log messages. Messages are queued by add and appended to the model in batches by a timer,
+    the oldest ones being dropped above max_size. A message identical to the previous one is coalesced into it
+    (displayed as repeated N times).
+
+    Parameters
+    ----------
+    max_size: (int) maximum number of messages kept
+    flush_ms: (int) interval of the batched appends
+    """
+    def __init__(self, max_size=10000, flush_ms=200):
+        super().__init__()
+        self.entries = deque(maxlen=max_size)  # list of [time of the last occurrence, message, count]
+        self.pending = []
+        self.writer = None
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(flush_ms)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.entries):
+            return None
+        if role == Qt.DisplayRole or role == Qt.ToolTipRole:
+            return self.format(self.entries[index.row()])
+        return None
+
+    @staticmethod
+    def format(entry):
+        timestamp, txt, count = entry
+        line = f'{datetime.datetime.fromtimestamp(timestamp)}: {txt}'
+        if count > 1:
+            line += f' (repeated {count} times)'
+        return line
+
+    def add(self, txt):
+        """
+        Queue a message, it is displayed at the next flush
+        """
+        self.pending.append((time.time(), txt))
+
+    def set_max_size(self, max_size):
+        self.beginResetModel()
+        self.entries = deque(self.entries, maxlen=max_size)
+        self.endResetModel()
+
+    def set_writer(self, path=None, max_bytes=1000000, backups=3):
+        """
+        Persist the messages to a rotating file (None to stop)
+        """
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        if path:
+            self.writer = LogWriter(path, max_bytes, backups)
+
+    def flush(self):
+        if len(self.pending) == 0:
+            return
+        pending, self.pending = self.pending, []
+        new_entries = []
+        last = self.entries[-1] if len(self.entries) != 0 else None
+        for timestamp, txt in pending:
+            if self.writer is not None:
+                self.writer.write(f'{datetime.datetime.fromtimestamp(timestamp)}: {txt}')
+            if len(new_entries) != 0 and new_entries[-1][1] == txt:
+                new_entries[-1][0] = timestamp
+                new_entries[-1][2] += 1
+            elif len(new_entries) == 0 and last is not None and last[1] == txt:
+                last[0] = timestamp
+                last[2] += 1
+            else:
+                new_entries.append([timestamp, txt, 1])
+
+        if last is not None and last[1] == pending[0][1]:
+            index = self.index(len(self.entries) - 1)
+            self.dataChanged.emit(index, index)
+        new_entries = new_entries[-self.entries.maxlen:]
+        n_removed = max(0, len(self.entries) + len(new_entries) - self.entries.maxlen)
+        if n_removed != 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, n_removed - 1)
+            for ind in range(n_removed):
+                self.entries.popleft()
+            self.endRemoveRows()
+        if len(new_entries) != 0:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.entries), len(self.entries) + len(new_entries) - 1)
+            self.entries.extend(new_entries)
+            self.endInsertRows()
+
+    def close(self):
+        self.timer.stop()
+        self.flush()
+        self.set_writer(None)
+
+
+class LogView(QtWidgets.QListView):
+    """
+    List view of a LogModel following the last message as long as it is scrolled to the bottom
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.setModel(model)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self._at_bottom = True
+        model.rowsAboutToBeInserted.connect(self.check_bottom)
+        model.rowsInserted.connect(self.follow)
+
+    def check_bottom(self):
+        scroll_bar = self.verticalScrollBar()
+        self._at_bottom = scroll_bar.value() >= scroll_bar.maximum() - 2
+
+    def follow(self):
+        if self._at_bottom:
+            self.scrollToBottom()
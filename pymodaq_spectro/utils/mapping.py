@@ -0,0 +1,434 @@
+"""
+Hyperspectral mapping: spectra acquired on a 2D grid of positions (set by one or two actuators or predefined, for
+instance a sample scanned by an external stage) are written as they arrive in a preallocated chunked HDF5 cube
+(ny, nx, n_pixels) per channel, while a live map of the signal integrated over a spectral band is updated from each
+new spectrum only (the file is never read back).
+"""
+from collections import deque
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtCore
+from qtpy.QtCore import QObject, Slot, Signal, QThread, QRectF
+from pyqtgraph.parametertree import Parameter, ParameterTree
+import pymodaq.daq_utils.custom_parameter_tree as custom_tree  # registers the bool_push parameter type
+from pymodaq.daq_utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+def grid_positions(x_values, y_values, snake=True):
+    """
+    Build the list of the positions of a grid scan, line by line along x
+
+    Parameters
+    ----------
+    x_values: (ndarray) positions along x
+    y_values: (ndarray) positions along y
+    snake: (bool) if True, every other line is scanned backward so that the x actuator never goes back to the start
+
+    Returns
+    -------
+    list of dict: dict(iy=..., ix=..., y=..., x=...) for each point
+    """
+    positions = []
+    for iy, y in enumerate(y_values):
+        ixs = range(len(x_values))
+        if snake and iy % 2 == 1:
+            ixs = reversed(ixs)
+        positions.extend([dict(iy=iy, ix=ix, y=y, x=x_values[ix]) for ix in ixs])
+    return positions
+
+
+class MapBuffer:
+    """
+    Live map of the spectra integrated over a band of pixels, one value computed per new spectrum
+
+    Parameters
+    ----------
+    x_values: (ndarray) positions of the grid along x
+    y_values: (ndarray) positions of the grid along y
+    band: (tuple) (first, last) pixel indexes (included) of the integrated band, None for the whole spectrum
+    """
+    def __init__(self, x_values=np.zeros((1,)), y_values=np.zeros((1,)), band=None):
+        self.reset(x_values, y_values, band)
+
+    def reset(self, x_values, y_values, band=None):
+        self.x_values = np.asarray(x_values, dtype=float)
+        self.y_values = np.asarray(y_values, dtype=float)
+        self.data = np.full((self.y_values.size, self.x_values.size), np.nan)
+        self.band = band
+        self.count = 0
+        self.vmin = np.inf
+        self.vmax = -np.inf
+
+    def add(self, iy, ix, spectrum):
+        if self.band is None:
+            value = np.sum(spectrum)
+        else:
+            value = np.sum(spectrum[self.band[0]:self.band[1] + 1])
+        self.data[iy, ix] = value
+        self.vmin = min(self.vmin, value)
+        self.vmax = max(self.vmax, value)
+        self.count += 1
+
+
+class MapSaver(QObject):
+    """
+    Write the spectra of a map in a HDF5 file, living in its own thread. The cubes are allocated when the first
+    spectrum is received (its size is then known), chunked by spectrum so that writing one position only touches
+    its own chunk. Positions never acquired (aborted map) are left as NaN.
+
+    Parameters
+    ----------
+    path: (str or Path) the h5 file
+    x_values: (ndarray) the positions of the grid along x
+    y_values: (ndarray) the positions of the grid along y
+    """
+    saved_signal = Signal(int)
+    closed_signal = Signal()
+
+    def __init__(self, path, x_values, y_values):
+        super().__init__()
+        self.path = str(path)
+        self.x_values = np.asarray(x_values, dtype=float)
+        self.y_values = np.asarray(y_values, dtype=float)
+        self.h5file = None
+        self.cubes = []
+        self.positions = None
+
+    def create_file(self, frame):
+        import tables
+        shape = (self.y_values.size, self.x_values.size)
+        n_pixels = frame['data'].shape[-1]
+        filters = tables.Filters(complevel=1, complib='blosc')
+        self.h5file = tables.open_file(self.path, 'w', title='Spectrometer map')
+        group = self.h5file.create_group('/', 'map')
+        self.h5file.create_array(group, 'x_values', self.x_values)
+        self.h5file.create_array(group, 'y_values', self.y_values)
+        if frame['x_axis'] is not None:
+            self.h5file.create_array(group, 'x_axis', frame['x_axis'])
+        self.cubes = [self.h5file.create_carray(group, f'CH{ind:02d}', tables.Float64Atom(dflt=np.nan),
+                                                shape + (n_pixels,), chunkshape=(1, 1, n_pixels), filters=filters)
+                      for ind in range(frame['data'].shape[0])]
+        # positions reached by the actuators (or the grid ones if there is no actuator)
+        self.positions = self.h5file.create_carray(group, 'positions', tables.Float64Atom(dflt=np.nan),
+                                                   shape + (2,))
+        for key, value in frame['state'].items():
+            if value is not None:
+                group._v_attrs[key] = value
+
+    @Slot(dict)
+    def save(self, frame):
+        try:
+            if self.h5file is None:
+                self.create_file(frame)
+            for cube, spectrum in zip(self.cubes, frame['data']):
+                cube[frame['iy'], frame['ix'], :] = spectrum
+            self.positions[frame['iy'], frame['ix'], :] = frame['position']
+        except Exception as e:
+            logger.exception(str(e))
+        self.saved_signal.emit(frame['index'])
+
+    @Slot()
+    def close_file(self):
+        try:
+            if self.h5file is not None:
+                self.h5file.close()
+                self.h5file = None
+        except Exception as e:
+            logger.exception(str(e))
+        self.closed_signal.emit()
+
+
+class Mapper(QObject):
+    """
+    Acquire a spectrum at each position of a grid. At each point, the actuators (if any) are moved and the
+    acquisition is started once they all have reported their move done, the next point is started as soon as the
+    spectrum is received while it is saved in a separate thread (see Sequencer).
+
+    The Spectrometer object has to forward the data of the detectors to data_received, the move_done signals of the
+    actuators are connected during the map.
+    """
+    status_signal = Signal(str)
+    start_requested = Signal()
+    finished_signal = Signal()
+    save_signal = Signal(dict)
+    close_signal = Signal()
+
+    params = [{'title': 'X actuator:', 'name': 'x_actuator', 'type': 'list', 'value': 'None', 'limits': ['None']},
+              {'title': 'X start:', 'name': 'x_start', 'type': 'float', 'value': 0.},
+              {'title': 'X stop:', 'name': 'x_stop', 'type': 'float', 'value': 10.},
+              {'title': 'X points:', 'name': 'nx', 'type': 'int', 'value': 11, 'min': 1},
+              {'title': 'Y actuator:', 'name': 'y_actuator', 'type': 'list', 'value': 'None', 'limits': ['None']},
+              {'title': 'Y start:', 'name': 'y_start', 'type': 'float', 'value': 0.},
+              {'title': 'Y stop:', 'name': 'y_stop', 'type': 'float', 'value': 10.},
+              {'title': 'Y points:', 'name': 'ny', 'type': 'int', 'value': 11, 'min': 1},
+              {'title': 'Snake scan?:', 'name': 'snake', 'type': 'bool', 'value': True},
+              {'title': 'Band min:', 'name': 'band_min', 'type': 'float', 'value': 0., 'tooltip':
+                  'Band integrated in the live map (displayed units), the whole spectrum if min and max are equal'},
+              {'title': 'Band max:', 'name': 'band_max', 'type': 'float', 'value': 0.},
+              {'title': 'Map channel:', 'name': 'channel', 'type': 'int', 'value': 0, 'min': 0},
+              {'title': 'Timeout (ms):', 'name': 'timeout_ms', 'type': 'int', 'value': 10000, 'min': 1},
+              {'title': 'Max pending saves:', 'name': 'max_pending', 'type': 'int', 'value': 4, 'min': 1},
+              {'title': 'Start', 'name': 'start', 'type': 'bool_push', 'value': False},
+              {'title': 'Stop', 'name': 'stop', 'type': 'bool_push', 'value': False},
+              {'title': 'Progress:', 'name': 'progress', 'type': 'str', 'value': '', 'readonly': True},
+              ]
+
+    def __init__(self):
+        super().__init__()
+        self.settings = Parameter.create(name='mapper_settings', type='group', children=self.params)
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+
+        self.det = None
+        self.actuators = dict([])  # DAQ_Move modules keyed by axis (x or y)
+        self.buffer = MapBuffer()
+        self.state = dict([])
+        self._points = deque([])
+        self._n_points = 0
+        self._point = None
+        self._position = None
+        self._moving = set([])  # titles of the actuators whose move is awaited
+        self._waiting_data = False
+        self._index = 0
+        self._pending_saves = set([])
+        self._paused = False
+        self._stopping = False
+
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.step_timeout)
+
+        self.saver = None
+        self.saver_thread = None
+
+    def parameter_tree_changed(self, param, changes):
+        for param, change, data in changes:
+            if change == 'value':
+                if param.name() == 'start':
+                    self.start_requested.emit()
+                elif param.name() == 'stop':
+                    self.stop()
+
+    @property
+    def running(self):
+        return self.det is not None
+
+    def set_actuators(self, titles):
+        """
+        Set the actuators that can be selected for the x and y axes
+        """
+        for axis in ['x', 'y']:
+            self.settings.child(f'{axis}_actuator').setLimits(['None'] + list(titles))
+
+    def grid_values(self):
+        """
+        Returns
+        -------
+        ndarray: x positions
+        ndarray: y positions
+        """
+        return (np.linspace(self.settings.child('x_start').value(), self.settings.child('x_stop').value(),
+                            self.settings.child('nx').value()),
+                np.linspace(self.settings.child('y_start').value(), self.settings.child('y_stop').value(),
+                            self.settings.child('ny').value()))
+
+    def start(self, det, move_modules, path, band=None, attributes=None):
+        """
+        Start a map with the grid defined in the settings
+
+        Parameters
+        ----------
+        det: (SpectroDetector) the detector to acquire with
+        move_modules: (dict) the DAQ_Move modules that can be used as actuators, keyed by their title
+        path: (str or Path) the HDF5 file where to save the map
+        band: (tuple) (first, last) pixel indexes of the band integrated in the live map, None for the whole spectrum
+        attributes: (dict) constant attributes saved with the map (for instance the processing of the spectra of
+            the live map)
+        """
+        if self.running or det.module is None:
+            return
+        x_values, y_values = self.grid_values()
+        self.actuators = dict([])
+        for axis in ['x', 'y']:
+            title = self.settings.child(f'{axis}_actuator').value()
+            if title in move_modules:
+                self.actuators[axis] = move_modules[title]
+                move_modules[title].move_done_signal.connect(self.move_done)
+
+        self.det = det
+        self.state = dict([] if attributes is None else attributes)
+        self.state.update(exposure_ms=det.exposure_ms, spectro_wl=det.spectro_wl,
+                          x_actuator=self.settings.child('x_actuator').value(),
+                          y_actuator=self.settings.child('y_actuator').value())
+        self._points = deque(grid_positions(x_values, y_values, self.settings.child('snake').value()))
+        self._n_points = len(self._points)
+        self._point = None
+        self._position = dict([])
+        self._moving = set([])
+        self._waiting_data = False
+        self._index = 0
+        self._pending_saves = set([])
+        self._paused = False
+        self._stopping = False
+        self.buffer.reset(x_values, y_values, band)
+
+        if self.saver_thread is not None:
+            self.saver_thread.wait()  # the previous saver may still be writing its last spectra
+        self.saver = MapSaver(path, x_values, y_values)
+        self.saver_thread = QThread()
+        self.saver.moveToThread(self.saver_thread)
+        self.save_signal.connect(self.saver.save)
+        self.close_signal.connect(self.saver.close_file)
+        self.saver.saved_signal.connect(self.spectrum_saved)
+        # quit from the saver thread itself so that waiting for it in the main thread cannot deadlock
+        self.saver.closed_signal.connect(self.saver_thread.quit, QtCore.Qt.DirectConnection)
+        self.saver_thread.start()
+
+        self.status_signal.emit(f'Map started: {y_values.size} x {x_values.size} points')
+        self.next_point()
+
+    def stop(self):
+        if self.running:
+            self._points.clear()
+            self.finish()
+
+    def next_point(self):
+        if not self.running or self._stopping:
+            return
+        if len(self._pending_saves) >= self.settings.child('max_pending').value():
+            self._paused = True  # resumed when a spectrum has been saved
+            return
+        if len(self._points) == 0:
+            self.finish()
+            return
+
+        self._point = self._points.popleft()
+        self.settings.child('progress').setValue(f'{self._n_points - len(self._points)}/{self._n_points}')
+        self._timer.start(self.settings.child('timeout_ms').value())
+        for axis, module in self.actuators.items():
+            if self._position.get(axis, None) != self._point[axis]:
+                self._moving.add(module.title)
+                module.move_Abs(self._point[axis])
+        if len(self._moving) == 0:
+            self.snap()
+
+    def snap(self):
+        self._waiting_data = True
+        self.det.module.ui.single_pb.click()
+
+    @Slot(str, float)
+    def move_done(self, title, position):
+        if not self.running or title not in self._moving:
+            return
+        for axis, module in self.actuators.items():
+            if module.title == title:
+                self._position[axis] = position
+        self._moving.discard(title)
+        if len(self._moving) == 0:
+            self.snap()
+
+    def data_received(self, det):
+        """
+        To be called once the data of a detector has been processed: the live map is updated (from the processed
+        spectra) and the raw spectra sent to the saver thread, the next point being started right away
+        """
+        if det is not self.det or not self._waiting_data:
+            return
+        self._timer.stop()
+        self._waiting_data = False
+        point = self._point
+        channel = self.settings.child('channel').value()
+        if channel < len(det.processed_data):
+            self.buffer.add(point['iy'], point['ix'], det.processed_data[channel])
+        x_axis = det.viewer_freq_axis['data']
+        frame = dict(index=self._index, iy=point['iy'], ix=point['ix'], data=np.array(det.raw_data),
+                     x_axis=None if x_axis is None else np.array(x_axis), state=dict(self.state),
+                     position=[self._position.get('x', point['x']), self._position.get('y', point['y'])])
+        self._pending_saves.add(self._index)
+        self._index += 1
+        self.save_signal.emit(frame)
+        self.next_point()
+
+    @Slot(int)
+    def spectrum_saved(self, index):
+        self._pending_saves.discard(index)
+        if self._paused:
+            self._paused = False
+            self.next_point()
+
+    def step_timeout(self):
+        waiting = 'data' if self._waiting_data else ', '.join(self._moving)
+        self.status_signal.emit(f'Map: no answer for {waiting}, map aborted')
+        self.stop()
+
+    def finish(self):
+        self._timer.stop()
+        self._waiting_data = False
+        self._moving = set([])
+        self._stopping = True
+        for module in self.actuators.values():
+            try:
+                module.move_done_signal.disconnect(self.move_done)
+            except (TypeError, RuntimeError):
+                pass
+        self.close_signal.emit()  # queued after the pending spectra in the saver thread
+        self.save_signal.disconnect(self.saver.save)
+        self.close_signal.disconnect(self.saver.close_file)
+        self.status_signal.emit(f'Map finished: {self._index} spectra acquired')
+        self.det = None
+        self.finished_signal.emit()
+
+
+class MapWidget(QtWidgets.QWidget):
+    """
+    Settings of a Mapper and image of its live map, rendering is throttled to the refresh timer and only done if
+    new points have been acquired
+    """
+    def __init__(self, mapper, refresh_ms=100):
+        super().__init__()
+        self.mapper = mapper
+        self._rendered_count = 0
+        self.setupUI()
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def setupUI(self):
+        layout = QtWidgets.QHBoxLayout()
+        self.setLayout(layout)
+        splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
+        self.settings_tree = ParameterTree()
+        self.settings_tree.setParameters(self.mapper.settings, showTop=False)
+        splitter.addWidget(self.settings_tree)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setAspectLocked(True)
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.plot_widget.addItem(self.image_item)
+        self.histogram = pg.HistogramLUTWidget(image=self.image_item)
+        map_widget = QtWidgets.QWidget()
+        map_layout = QtWidgets.QHBoxLayout()
+        map_layout.setContentsMargins(0, 0, 0, 0)
+        map_widget.setLayout(map_layout)
+        map_layout.addWidget(self.plot_widget)
+        map_layout.addWidget(self.histogram)
+        splitter.addWidget(map_widget)
+        splitter.setSizes([250, 500])
+        layout.addWidget(splitter)
+
+    def refresh(self):
+        buffer = self.mapper.buffer
+        if not self.isVisible() or buffer.count == self._rendered_count:
+            return
+        if buffer.vmax > buffer.vmin:
+            self.image_item.setImage(buffer.data, autoLevels=False, levels=(buffer.vmin, buffer.vmax))
+        else:
+            self.image_item.setImage(buffer.data, autoLevels=False)
+        x_values, y_values = buffer.x_values, buffer.y_values
+        dx = (x_values[-1] - x_values[0]) / (x_values.size - 1) if x_values.size > 1 else 1.
+        dy = (y_values[-1] - y_values[0]) / (y_values.size - 1) if y_values.size > 1 else 1.
+        self.image_item.setRect(QRectF(x_values[0] - dx / 2, y_values[0] - dy / 2, dx * x_values.size,
+                                       dy * y_values.size))
+        self._rendered_count = buffer.count
@@ -0,0 +1,344 @@
+import time
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtCore
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq_spectro.utils.indexing import range_to_indexes, pixel_to_axis
+from pymodaq_spectro.utils import units
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+quantities = ['center', 'height', 'fwhm', 'area']
+fwhm_factor = 2 * np.sqrt(2 * np.log(2))
+
+
+def gaussian_init(windows, mask):
+    """
+    Initial parameters (amplitude, center, sigma, offset) of gaussians from the data windows (in pixels)
+    """
+    masked = np.where(mask, windows, np.nan)
+    offset = np.nanmin(masked, axis=1)
+    amplitude = np.nanmax(masked, axis=1) - offset
+    center = np.nanargmax(masked, axis=1).astype(float)
+    sigma = np.sum(mask, axis=1) / 6
+    return np.stack((amplitude, center, sigma, offset), axis=1)
+
+
+def gaussian_fit(windows, mask, params, n_iter=3, damping=1e-3):
+    """
+    Batched Levenberg-Marquardt fit of gaussians plus offset on several data windows at once
+
+    Parameters
+    ----------
+    windows: (ndarray) shape (n_peaks, width), the data of each peak, padded
+    mask: (ndarray of bool) shape (n_peaks, width), False for the padding
+    params: (ndarray) shape (n_peaks, 4), the starting (amplitude, center, sigma, offset), center and sigma in
+        pixels relative to the window start, typically the result of the previous frame (warm start)
+    n_iter: (int) number of iterations
+
+    Returns
+    -------
+    ndarray: the fitted parameters
+    """
+    x = np.arange(windows.shape[1])[None, :]
+    weights = mask.astype(float)
+    params = params.copy()
+    for ind in range(n_iter):
+        amplitude, center, sigma, offset = [params[:, ind_par, None] for ind_par in range(4)]
+        dx = x - center
+        gauss = np.exp(-dx**2 / (2 * sigma**2))
+        residuals = (windows - amplitude * gauss - offset) * weights
+        jacobian = np.stack((gauss, amplitude * gauss * dx / sigma**2, amplitude * gauss * dx**2 / sigma**3,
+                             np.ones_like(gauss)), axis=2) * weights[:, :, None]
+        jtj = np.einsum('nwi,nwj->nij', jacobian, jacobian)
+        jtj += damping * np.eye(4)[None, :, :] * (np.einsum('nii->ni', jtj)[:, :, None] + 1e-12)
+        jtr = np.einsum('nwi,nw->ni', jacobian, residuals)
+        try:
+            params += np.linalg.solve(jtj, jtr[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            break
+        params[:, 2] = np.clip(np.abs(params[:, 2]), 0.3, windows.shape[1])
+        params[:, 1] = np.clip(params[:, 1], 0, windows.shape[1] - 1)
+    return params
+
+
+class PeakTracker:
+    """
+    Track the center, height, FWHM and area of several peaks frame by frame. Each peak is defined by a range of the
+    displayed axis, converted once into pixel windows, and fitted by a gaussian warm started from the previous frame.
+    The number of iterations is adapted to stay under a per frame time budget.
+
+    Parameters
+    ----------
+    history: (int) number of frames kept in the time series
+    """
+    def __init__(self, history=1000):
+        self.ranges = []
+        self.history = history
+        self.params = None
+        self.n_iter = 3
+        self.max_iter = 5
+        self.budget_s = 0.002
+        self._axis = None
+        self._indexes = None
+        self._mask = None
+        self._starts = None
+        self._valid = None
+        self.reset()
+
+    def reset(self):
+        self.series = np.full((len(self.ranges), len(quantities), self.history), np.nan)
+        self.times = np.full((self.history,), np.nan)
+        self.count = 0
+        self.params = None
+
+    def set_ranges(self, ranges):
+        """
+        Parameters
+        ----------
+        ranges: (list of tuple) the (min, max) bounds of each peak in the displayed axis units
+        """
+        self.ranges = [tuple(bounds) for bounds in ranges]
+        self._axis = None
+        self.reset()
+
+    def update_windows(self, axis):
+        """
+        Convert the ranges into pixel windows if the axis changed
+
+        Parameters
+        ----------
+        axis: (ndarray) the cached displayed axis, the windows are not recomputed while it is the same object
+        """
+        if axis is self._axis:
+            return
+        self._axis = axis
+        starts, stops = [], []
+        for bounds in self.ranges:
+            indexes = range_to_indexes(axis, bounds)
+            if indexes is None or indexes[1] - indexes[0] < 3:  # off the axis or too narrow to be fitted
+                indexes = (0, -1)
+            starts.append(indexes[0])
+            stops.append(indexes[1])
+        starts, stops = np.array(starts, dtype=int), np.array(stops, dtype=int)
+        self._valid = stops >= starts
+        self._starts, stops = starts[self._valid], stops[self._valid]
+        width = max(1, int(np.max(stops - self._starts + 1))) if self._starts.size != 0 else 1
+        self._indexes = self._starts[:, None] + np.arange(width)[None, :]
+        self._mask = self._indexes <= stops[:, None]
+        self._indexes = np.minimum(self._indexes, axis.size - 1)
+        self.params = None
+
+    def process(self, spectrum, axis):
+        """
+        Fit the peaks on a new spectrum
+
+        Parameters
+        ----------
+        spectrum: (ndarray) the spectrum
+        axis: (ndarray) its axis in the displayed units
+
+        Returns
+        -------
+        ndarray or None: shape (n_peaks, 4), center, height, fwhm and area of each peak (nan for the peaks whose range
+            is off the axis or narrower than 4 pixels)
+        """
+        if len(self.ranges) == 0 or np.size(spectrum) != np.size(axis):
+            return None
+        t0 = time.perf_counter()
+        self.update_windows(axis)
+        results = np.full((len(self.ranges), len(quantities)), np.nan)  # nan for the peaks off the axis
+        if self._starts.size != 0:
+            windows = np.asarray(spectrum)[self._indexes]
+            if self.params is None:
+                self.params = gaussian_init(windows, self._mask)
+            self.params = gaussian_fit(windows, self._mask, self.params, self.n_iter)
+
+            amplitude, center, sigma, offset = self.params.T
+            center_pxl = center + self._starts
+            fwhm = np.abs(pixel_to_axis(center_pxl + sigma * fwhm_factor / 2, axis) -
+                          pixel_to_axis(center_pxl - sigma * fwhm_factor / 2, axis))
+            results[self._valid] = np.stack((pixel_to_axis(center_pxl, axis), amplitude, fwhm,
+                                             amplitude * fwhm * np.sqrt(np.pi / (4 * np.log(2)))), axis=1)
+
+        self.series[:, :, self.count % self.history] = results
+        self.times[self.count % self.history] = t0
+        self.count += 1
+
+        elapsed = time.perf_counter() - t0  # adapt the number of iterations to the time budget
+        if elapsed > self.budget_s and self.n_iter > 1:
+            self.n_iter -= 1
+        elif elapsed < self.budget_s / 2 and self.n_iter < self.max_iter:
+            self.n_iter += 1
+        return results
+
+    def get_series(self, quantity):
+        """
+        Returns
+        -------
+        ndarray: the time (s, relative to the last frame) of the kept frames
+        ndarray: shape (n_peaks, n_frames) the values of the quantity
+        """
+        n_frames = min(self.count, self.history)
+        order = (np.arange(self.count - n_frames, self.count)) % self.history
+        times = self.times[order]
+        return times - (times[-1] if n_frames != 0 else 0), self.series[:, quantities.index(quantity), order]
+
+
+class PeakTrackerWidget(QtWidgets.QWidget):
+    """
+    Peaks are selected as regions on the live spectrum viewer, their fitted parameters are displayed in a table and
+    the time series of the selected quantity in a plot. When the displayed units change, the regions are converted
+    so that they stay on the same peaks.
+    """
+    def __init__(self, refresh_ms=100):
+        super().__init__()
+        self.tracker = PeakTracker()
+        self.unit = 'nm'
+        self.laser_wl = None
+        self.plot_item = None
+        self.regions = []
+        self.last_results = None
+        self.setupUI()
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        settings_layout = QtWidgets.QHBoxLayout()
+        self.enable_cb = QtWidgets.QCheckBox('Track')
+        settings_layout.addWidget(self.enable_cb)
+        add_pb = QtWidgets.QPushButton('Add peak')
+        add_pb.setToolTip('Add a region around a peak in the spectrum viewer')
+        add_pb.clicked.connect(self.add_peak)
+        settings_layout.addWidget(add_pb)
+        remove_pb = QtWidgets.QPushButton('Remove all')
+        remove_pb.clicked.connect(self.remove_peaks)
+        settings_layout.addWidget(remove_pb)
+        settings_layout.addWidget(QtWidgets.QLabel('Channel:'))
+        self.channel_sb = QtWidgets.QSpinBox()
+        self.channel_sb.setRange(0, 100)
+        settings_layout.addWidget(self.channel_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Budget (ms):'))
+        self.budget_sb = QtWidgets.QDoubleSpinBox()
+        self.budget_sb.setRange(0.1, 1000)
+        self.budget_sb.setValue(self.tracker.budget_s * 1000)
+        self.budget_sb.valueChanged.connect(lambda value: setattr(self.tracker, 'budget_s', value / 1000))
+        settings_layout.addWidget(self.budget_sb)
+        self.quantity_combo = QtWidgets.QComboBox()
+        self.quantity_combo.addItems(quantities)
+        settings_layout.addWidget(self.quantity_combo)
+        layout.addLayout(settings_layout)
+
+        self.table = QtWidgets.QTableWidget(0, len(quantities))
+        self.table.setHorizontalHeaderLabels(quantities)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setMaximumHeight(150)
+        layout.addWidget(self.table)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setLabel('bottom', 'Time', units='s')
+        self.plot_widget.addLegend()
+        self.curves = []
+        layout.addWidget(self.plot_widget)
+
+    def set_plot_item(self, plot_item):
+        """
+        Set the plot (of the spectrum viewer) where the peak regions are displayed
+        """
+        if plot_item is self.plot_item:
+            return
+        for region in self.regions:
+            if self.plot_item is not None:
+                try:
+                    self.plot_item.removeItem(region)
+                except RuntimeError:  # the plot of a removed detector has been deleted
+                    pass
+            plot_item.addItem(region)
+        self.plot_item = plot_item
+
+    def set_units(self, unit, laser_wl=None):
+        """
+        Set the displayed units, the regions are converted from the previous ones (unchanged if the conversion needs
+        a laser wavelength that is not set)
+        """
+        if unit == self.unit and (laser_wl == self.laser_wl or units.units[unit][1] is False):
+            self.laser_wl = laser_wl
+            return
+        try:
+            ranges = [sorted(units.from_nm(units.to_nm(np.array(region.getRegion()), self.unit, self.laser_wl),
+                                           unit, laser_wl)) for region in self.regions]
+        except ValueError as e:
+            logger.warning(f'The peak regions cannot be converted into {unit}: {str(e)}')
+            ranges = [region.getRegion() for region in self.regions]
+        self.unit = unit
+        self.laser_wl = laser_wl
+        for region, bounds in zip(self.regions, ranges):
+            region.blockSignals(True)
+            region.setRegion(bounds)
+            region.blockSignals(False)
+        self.update_ranges()
+
+    def add_peak(self, bounds=None):
+        if self.plot_item is None:
+            return
+        if not bounds:
+            xmin, xmax = self.plot_item.vb.viewRange()[0]
+            bounds = (xmin + 0.45 * (xmax - xmin), xmin + 0.55 * (xmax - xmin))
+        region = pg.LinearRegionItem(values=bounds)
+        region.sigRegionChangeFinished.connect(self.update_ranges)
+        self.plot_item.addItem(region)
+        self.regions.append(region)
+        pen = pg.intColor(len(self.regions) - 1)
+        self.curves.append(self.plot_widget.plot(pen=pen, name=f'Peak {len(self.regions) - 1:02d}'))
+        self.table.setRowCount(len(self.regions))
+        self.update_ranges()
+
+    def remove_peaks(self):
+        for region in self.regions:
+            self.plot_item.removeItem(region)
+        for curve in self.curves:
+            self.plot_widget.removeItem(curve)
+        self.regions = []
+        self.curves = []
+        self.table.setRowCount(0)
+        self.update_ranges()
+
+    def update_ranges(self):
+        self.tracker.set_ranges([region.getRegion() for region in self.regions])
+
+    def process(self, spectra, axis):
+        """
+        Fit the peaks on the selected channel of a new frame
+
+        Parameters
+        ----------
+        spectra: (list of ndarray) the spectra of all channels
+        axis: (ndarray) the axis in the displayed units
+
+        Returns
+        -------
+        ndarray or None: see PeakTracker.process
+        """
+        if not self.enable_cb.isChecked() or self.channel_sb.value() >= len(spectra):
+            return None
+        try:
+            self.last_results = self.tracker.process(spectra[self.channel_sb.value()], axis)
+        except Exception as e:
+            self.last_results = None
+            logger.exception(str(e))
+        return self.last_results
+
+    def refresh(self):
+        if not self.isVisible() or self.last_results is None or len(self.curves) != len(self.last_results):
+            return
+        for ind_peak, results in enumerate(self.last_results):
+            for ind, value in enumerate(results):
+                self.table.setItem(ind_peak, ind, QtWidgets.QTableWidgetItem(f'{value:.4g}'))
+        times, series = self.tracker.get_series(self.quantity_combo.currentText())
+        for curve, values in zip(self.curves, series):
+            curve.setData(times, values)
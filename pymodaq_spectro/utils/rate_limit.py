@@ -0,0 +1,47 @@
+import time
+from qtpy import QtCore
+from qtpy.QtCore import QObject
+
+
+class RateLimiter(QObject):
+    """
+    Limit the rate of calls to a (hardware bound) function: a call is executed right away if the previous one is older
+    than min_interval_ms, otherwise it is deferred to the end of the interval and replaced by any later call, so that
+    only the last requested value is sent when a setting is changed faster than the hardware can follow.
+
+    Parameters
+    ----------
+    func: (callable) the function to be called
+    min_interval_ms: (int) minimum time between two calls
+    """
+    def __init__(self, func, min_interval_ms=200):
+        super().__init__()
+        self.func = func
+        self.min_interval_ms = min_interval_ms
+        self._last_call = -float('inf')
+        self._pending = None
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._call_pending)
+
+    def __call__(self, *args):
+        elapsed_ms = (time.perf_counter() - self._last_call) * 1000
+        if elapsed_ms >= self.min_interval_ms and not self._timer.isActive():
+            self._call(args)
+        else:
+            self._pending = args
+            if not self._timer.isActive():
+                self._timer.start(max(0, int(self.min_interval_ms - elapsed_ms)))
+
+    def _call(self, args):
+        self._last_call = time.perf_counter()
+        self.func(*args)
+
+    def _call_pending(self):
+        if self._pending is not None:
+            args, self._pending = self._pending, None
+            self._call(args)
+
+    def cancel(self):
+        self._timer.stop()
+        self._pending = None
@@ -0,0 +1,160 @@
+"""
+Reduction of the images of 2D (imaging) detectors into 1D spectra: full vertical binning or several tracks of rows
+(multi-fiber spectroscopy), with an optional curvature (smile) correction of each track. The rows of a track are
+shifted horizontally by smile * ((row - track center) / half height)**2 pixels (linear interpolation) before being
+summed. The shift maps only depend on the image shape and the settings so they are computed once. A frame is then
+reduced with one sum per track, or with smile one 2 rows matrix product per group of rows sharing the same integer
+shift (written into a buffer kept from frame to frame). The products are summed per shift by a small matrix product
+written into a buffer padded with the edge values, and the shifted sums are added in a single reduction over a diagonal
+view of this buffer (no per frame index arrays).
+"""
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+modes = ['FVB', 'Tracks']
+
+
+def parse_tracks(txt):
+    """
+    Parse tracks written as first-last row ranges (inclusive) separated by semicolons, for instance: '0-127; 128-255'
+
+    Returns
+    -------
+    list of tuple: (first, last) rows of each track
+    """
+    tracks = []
+    for track in txt.replace(',', ';').split(';'):
+        if track.strip() == '':
+            continue
+        first, last = [int(row) for row in track.split('-')]
+        if first > last:
+            first, last = last, first
+        tracks.append((first, last))
+    if len(tracks) == 0:
+        raise ValueError(f'No track found in {txt}')
+    return tracks
+
+
+def tracks_to_str(tracks):
+    return '; '.join([f'{first}-{last}' for first, last in tracks])
+
+
+def _accumulator_dtype(dtype):
+    """Sum small unsigned integers in 32 bits (exact up to 65537 rows), other types with the numpy default"""
+    return np.uint32 if dtype in (np.uint8, np.uint16) else None
+
+
+class ImageReducer:
+    """
+    Parameters
+    ----------
+    mode: (str) one of modes
+    tracks: (list of tuple) (first, last) rows (inclusive) of each track, used in Tracks mode
+    smile: (float) horizontal shift (pxls) of the rows at the edges of a track relative to its center row
+    """
+    def __init__(self, mode='FVB', tracks=None, smile=0.):
+        self.mode = mode
+        self.tracks = [(0, 0)] if tracks is None else list(tracks)
+        self.smile = smile
+        self._shape = None
+        self._maps = []
+
+    def configure(self, mode=None, tracks=None, smile=None):
+        if mode is not None:
+            if mode not in modes:
+                raise ValueError(f'{mode} is not a valid reduction mode, expected one of {modes}')
+            self.mode = mode
+        if tracks is not None:
+            self.tracks = list(tracks)
+        if smile is not None:
+            self.smile = smile
+        self._shape = None
+
+    @property
+    def state(self):
+        return dict(mode=self.mode, tracks=[list(track) for track in self.tracks], smile=self.smile)
+
+    def names(self):
+        if self.mode == 'FVB':
+            return ['FVB']
+        return [f'Track {first}-{last}' for first, last in self.tracks]
+
+    def _active_tracks(self, n_rows):
+        if self.mode == 'FVB':
+            return [(0, n_rows - 1)]
+        return [(max(0, first), min(n_rows - 1, last)) for first, last in self.tracks]  # out of the image: empty
+
+    def prepare(self, shape):
+        """
+        Compute the shift maps of each track for images of a given shape, called by reduce if the shape changed
+
+        A track is stored as (first, last + 1, segments, combine, products, padded, shifted): the rows are grouped into
+        segments of contiguous rows sharing the same integer shift k, stored as (start, end, weights) where weights
+        (2, n_rows) are the interpolation weights on the columns shifted by k and k + 1. combine (n_shifts, 2 *
+        n_segments) sums the products (the buffer of the 2 * n_segments weighted rows) per shift into the center columns
+        of padded, its left and right columns holding the edge values (clipped indexes). The integer shifts being
+        consecutive, shifted is a view of padded whose row i starts i + 1 elements further than the previous one:
+        shifted[i, c] = padded[i, center + c + shift_i] and the spectrum is shifted.sum(axis=0). A track without smile
+        is (first, last + 1) only (plain sum).
+        """
+        n_rows, n_cols = shape
+        self._maps = []
+        for first, last in self._active_tracks(n_rows):
+            if self.smile == 0 or first > last:
+                self._maps.append((first, last + 1))
+                continue
+            rows = np.arange(first, last + 1)
+            half_height = max((last - first) / 2, 1.)
+            shifts = self.smile * ((rows - (first + last) / 2) / half_height) ** 2
+            integer_shifts = np.floor(shifts).astype(int)
+            fractions = shifts - integer_shifts
+            values = np.arange(integer_shifts.min(), integer_shifts.max() + 2)
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(integer_shifts)) + 1))
+            ends = np.concatenate((starts[1:], [rows.size]))
+            segments = []
+            combine = np.zeros((values.size, 2 * starts.size))
+            for ind, (start, end) in enumerate(zip(starts, ends)):
+                segments.append((first + start, first + end,
+                                 np.ascontiguousarray(np.stack((1 - fractions[start:end], fractions[start:end])))))
+                slot = integer_shifts[start] - values[0]
+                combine[slot, 2 * ind] = 1
+                combine[slot + 1, 2 * ind + 1] = 1
+            left, right = max(0, -values[0]), max(0, values[-1])
+            padded = np.zeros((values.size, left + n_cols + right))
+            shifted = as_strided(padded.ravel()[left + values[0]:], shape=(values.size, n_cols),
+                                 strides=((padded.shape[1] + 1) * padded.itemsize, padded.itemsize), writeable=False)
+            self._maps.append((first, last + 1, segments, combine, np.empty((2 * starts.size, n_cols)),
+                               (padded, left), shifted))
+        self._shape = shape
+
+    def reduce(self, image):
+        """
+        Parameters
+        ----------
+        image: (2D ndarray) shape (n_rows, n_columns)
+
+        Returns
+        -------
+        list of ndarray: the spectrum of each track
+        """
+        image = np.asarray(image)
+        if image.ndim == 1:
+            return [image]
+        if image.shape != self._shape:
+            self.prepare(image.shape)
+        dtype = _accumulator_dtype(image.dtype)
+        spectra = []
+        for track in self._maps:
+            if len(track) == 2:
+                spectra.append(image[track[0]:track[1]].sum(axis=0, dtype=dtype))
+                continue
+            first, end, segments, combine, products, (padded, left), shifted = track
+            for ind, (start, stop, weights) in enumerate(segments):
+                np.matmul(weights, image[start:stop], out=products[2 * ind:2 * ind + 2])
+            center = padded[:, left:left + image.shape[1]]
+            np.matmul(combine, products, out=center)  # weighted rows summed per integer shift
+            padded[:, :left] = center[:, :1]
+            padded[:, left + image.shape[1]:] = center[:, -1:]
+            spectra.append(shifted.sum(axis=0))
+        return spectra
+
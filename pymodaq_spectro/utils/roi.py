@@ -0,0 +1,320 @@
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtCore
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq_spectro.utils.indexing import range_to_indexes
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+class SpectralRoi:
+    """
+    Named spectral range defined in given units
+
+    Parameters
+    ----------
+    name: (str)
+    bounds: (tuple) (min, max) in units
+    unit: (str) one of the Spectrometer units (nm, cm-1, eV)
+    """
+    def __init__(self, name, bounds, unit):
+        self.name = name
+        self.bounds = (min(bounds), max(bounds))
+        self.unit = unit
+        self.indexes = None
+
+
+class RoiIntegrator:
+    """
+    Integrate spectral ROIs on each frame. The ROI bounds are converted once into pixel ranges (each time the
+    calibrated axis changes), then all ROIs of all channels are integrated with a single cumulative sum of the
+    spectra and two lookups per ROI.
+
+    Parameters
+    ----------
+    history: (int) number of frames kept in the time series
+    """
+    def __init__(self, history=1000):
+        self.rois = []
+        self.history = history
+        self._source = None
+        self._starts = None
+        self._stops = None
+        self._valid = None
+        self.reset()
+
+    def reset(self):
+        self.series = np.full((self.history, len(self.rois)), np.nan)
+        self.count = 0
+
+    @property
+    def names(self):
+        return [roi.name for roi in self.rois]
+
+    def set_rois(self, rois):
+        """
+        Parameters
+        ----------
+        rois: (list of SpectralRoi)
+        """
+        self.rois = list(rois)
+        self._source = None
+        self.reset()
+
+    def update_indexes(self, source, axis_in):
+        """
+        Convert the ROI bounds into pixel ranges if the axis changed
+
+        Parameters
+        ----------
+        source: the cached calibrated axis, the pixel ranges are not recomputed while it is the same object
+        axis_in: (callable) axis_in(unit) returns the axis in the given units
+        """
+        if source is self._source:
+            return
+        self._source = source
+        axes = dict([])
+        for roi in self.rois:
+            if roi.unit not in axes:
+                axes[roi.unit] = axis_in(roi.unit)
+            roi.indexes = None if axes[roi.unit] is None else range_to_indexes(axes[roi.unit], roi.bounds)
+        self._valid = np.array([roi.indexes is not None for roi in self.rois], dtype=bool)
+        self._starts = np.array([roi.indexes[0] if roi.indexes is not None else 0 for roi in self.rois], dtype=int)
+        self._stops = np.array([roi.indexes[1] + 1 if roi.indexes is not None else 0 for roi in self.rois],
+                               dtype=int)
+
+    def integrate(self, spectra):
+        """
+        Parameters
+        ----------
+        spectra: (list of ndarray or 2D ndarray) the spectra of all channels
+
+        Returns
+        -------
+        ndarray: shape (n_channels, n_rois), the sum of the counts within each ROI (nan if out of the axis)
+        """
+        spectra = np.asarray(spectra, dtype=float)
+        if spectra.ndim == 1:
+            spectra = spectra[None, :]
+        cumsum = np.zeros((spectra.shape[0], spectra.shape[1] + 1))
+        np.cumsum(spectra, axis=1, out=cumsum[:, 1:])
+        values = cumsum[:, self._stops] - cumsum[:, self._starts]
+        values[:, ~self._valid] = np.nan
+        return values
+
+    def process(self, spectra, source, axis_in, channel=0):
+        """
+        Integrate the ROIs on a new frame and add the values of one channel to the time series
+
+        Returns
+        -------
+        ndarray or None: see integrate
+        """
+        if len(self.rois) == 0:
+            return None
+        self.update_indexes(source, axis_in)
+        values = self.integrate(spectra)
+        if channel < values.shape[0]:
+            self.series[self.count % self.history] = values[channel]
+            self.count += 1
+        return values
+
+    def get_series(self):
+        """
+        Returns
+        -------
+        ndarray: shape (n_frames, n_rois) the values of the kept frames, oldest first
+        """
+        n_frames = min(self.count, self.history)
+        return self.series[np.arange(self.count - n_frames, self.count) % self.history]
+
+
+class RoiWidget(QtWidgets.QWidget):
+    """
+    Table of the named ROIs, displayed as regions on the spectrum viewer, and plot of their integrals versus frame
+    """
+    columns = ['name', 'min', 'max', 'unit']
+
+    def __init__(self, refresh_ms=100):
+        super().__init__()
+        self.integrator = RoiIntegrator()
+        self.plot_item = None
+        self.regions = []
+        self.curves = []
+        self.unit = 'nm'
+        self.display_axis = None
+        self.last_values = None
+        self._rendered_count = 0
+        self.setupUI()
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        settings_layout = QtWidgets.QHBoxLayout()
+        self.enable_cb = QtWidgets.QCheckBox('Integrate')
+        self.enable_cb.setChecked(True)
+        settings_layout.addWidget(self.enable_cb)
+        add_pb = QtWidgets.QPushButton('Add ROI')
+        add_pb.setToolTip('Add a ROI in the current units, edit its name and bounds in the table or on the viewer')
+        add_pb.clicked.connect(lambda: self.add_roi())
+        settings_layout.addWidget(add_pb)
+        remove_pb = QtWidgets.QPushButton('Remove')
+        remove_pb.setToolTip('Remove the selected ROIs')
+        remove_pb.clicked.connect(self.remove_selected)
+        settings_layout.addWidget(remove_pb)
+        settings_layout.addWidget(QtWidgets.QLabel('Channel:'))
+        self.channel_sb = QtWidgets.QSpinBox()
+        self.channel_sb.setRange(0, 100)
+        self.channel_sb.valueChanged.connect(lambda: self.integrator.reset())
+        settings_layout.addWidget(self.channel_sb)
+        layout.addLayout(settings_layout)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setMaximumHeight(150)
+        self.table.itemChanged.connect(self.table_changed)
+        layout.addWidget(self.table)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setLabel('bottom', 'Frame index')
+        self.plot_widget.addLegend()
+        layout.addWidget(self.plot_widget)
+
+    def set_plot_item(self, plot_item):
+        """
+        Set the plot (of the spectrum viewer) where the ROI regions are displayed
+        """
+        if plot_item is self.plot_item:
+            return
+        for region in self.regions:
+            if self.plot_item is not None:
+                try:
+                    self.plot_item.removeItem(region)
+                except RuntimeError:  # the plot of a removed detector has been deleted
+                    pass
+            plot_item.addItem(region)
+        self.plot_item = plot_item
+
+    def set_display_axis(self, axis, unit):
+        """
+        Set the axis currently displayed on the viewer, the regions of ROIs defined in other units are placed at
+        their pixel ranges
+        """
+        self.unit = unit
+        self.display_axis = axis
+        self.update_regions()
+
+    def add_roi(self, name=None, bounds=None):
+        if bounds is None:
+            if self.plot_item is None:
+                return
+            xmin, xmax = self.plot_item.vb.viewRange()[0]
+            bounds = (xmin + 0.45 * (xmax - xmin), xmin + 0.55 * (xmax - xmin))
+        if name is None:
+            name = f'ROI{len(self.integrator.rois):02d}'
+        rois = self.integrator.rois + [SpectralRoi(name, bounds, self.unit)]
+        region = pg.LinearRegionItem(values=bounds, brush=pg.mkBrush(*pg.intColor(len(self.regions)).getRgb()[:3], 40))
+        region.sigRegionChangeFinished.connect(lambda region=region: self.region_changed(region))
+        if self.plot_item is not None:
+            self.plot_item.addItem(region)
+        self.regions.append(region)
+        self.curves.append(self.plot_widget.plot(pen=pg.intColor(len(self.regions) - 1), name=name))
+        self.set_rois(rois)
+
+    def remove_selected(self):
+        rows = sorted(set([index.row() for index in self.table.selectedIndexes()]), reverse=True)
+        rois = list(self.integrator.rois)
+        for row in rows:
+            if self.plot_item is not None:
+                self.plot_item.removeItem(self.regions[row])
+            self.plot_widget.removeItem(self.curves[row])
+            self.plot_widget.plotItem.legend.removeItem(rois[row].name)
+            self.regions.pop(row)
+            self.curves.pop(row)
+            rois.pop(row)
+        self.set_rois(rois)
+
+    def set_rois(self, rois):
+        self.integrator.set_rois(rois)
+        self.last_values = None
+        self.update_table()
+        self.update_regions()
+
+    def update_table(self):
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.integrator.rois))
+        for row, roi in enumerate(self.integrator.rois):
+            for col, value in enumerate([roi.name, f'{roi.bounds[0]:.6g}', f'{roi.bounds[1]:.6g}', roi.unit]):
+                item = QtWidgets.QTableWidgetItem(value)
+                if col == 3:
+                    item.setFlags(item.flags() & ~QtCore.Qt.ItemIsEditable)
+                self.table.setItem(row, col, item)
+        self.table.blockSignals(False)
+
+    def update_regions(self):
+        for region, roi in zip(self.regions, self.integrator.rois):
+            region.blockSignals(True)
+            if roi.unit == self.unit:
+                region.setRegion(roi.bounds)
+            elif roi.indexes is not None and self.display_axis is not None and \
+                    roi.indexes[1] < np.size(self.display_axis):
+                region.setRegion((self.display_axis[roi.indexes[0]], self.display_axis[roi.indexes[1]]))
+            region.blockSignals(False)
+
+    def region_changed(self, region):
+        roi = self.integrator.rois[self.regions.index(region)]
+        roi.bounds = tuple(sorted(region.getRegion()))
+        roi.unit = self.unit
+        self.set_rois(self.integrator.rois)
+
+    def table_changed(self, item):
+        roi = self.integrator.rois[item.row()]
+        try:
+            if item.column() == 0:
+                self.plot_widget.plotItem.legend.removeItem(roi.name)
+                roi.name = item.text()
+                self.plot_widget.plotItem.legend.addItem(self.curves[item.row()], roi.name)
+            else:
+                bounds = list(roi.bounds)
+                bounds[item.column() - 1] = float(item.text())
+                roi.bounds = (min(bounds), max(bounds))
+        except ValueError:
+            pass
+        self.set_rois(self.integrator.rois)
+
+    def process(self, spectra, source, axis_in):
+        """
+        Integrate the ROIs on a new frame
+
+        Parameters
+        ----------
+        spectra: (list of ndarray) the spectra of all channels
+        source: the cached calibrated axis, see RoiIntegrator.update_indexes
+        axis_in: (callable) axis_in(unit) returns the axis in the given units
+
+        Returns
+        -------
+        ndarray or None: shape (n_channels, n_rois)
+        """
+        if not self.enable_cb.isChecked():
+            return None
+        try:
+            self.last_values = self.integrator.process(spectra, source, axis_in, self.channel_sb.value())
+        except Exception as e:
+            self.last_values = None
+            logger.exception(str(e))
+        return self.last_values
+
+    def refresh(self):
+        if not self.isVisible() or self.integrator.count == self._rendered_count:
+            return
+        series = self.integrator.get_series()
+        frames = np.arange(self.integrator.count - series.shape[0], self.integrator.count)
+        for curve, values in zip(self.curves, series.T):
+            curve.setData(frames, values)
+        self._rendered_count = self.integrator.count
@@ -0,0 +1,281 @@
+from collections import OrderedDict, deque
+import numpy as np
+from qtpy import QtCore
+from qtpy.QtCore import QObject, Slot, Signal, QThread
+from pyqtgraph.parametertree import Parameter
+import pymodaq.daq_utils.custom_parameter_tree as custom_tree  # registers the bool_push parameter type
+from pymodaq.daq_utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+# command sent to the detector plugin and the command the plugin sends back (through custom_sig) when done
+ack_commands = dict(set_exposure_ms='exposure_ms', set_spectro_wl='spectro_wl', set_laser_wl='laser_wl')
+
+sequence_types = OrderedDict([('Exposure ladder', 'set_exposure_ms'),
+                              ('Center wavelength scan', 'set_spectro_wl'),
+                              ('Laser switch', 'set_laser_wl')])
+
+
+def sequence_steps(command, values, n_snaps=1):
+    """
+    Build the list of steps of a sequence: for each value, a parameter change followed by n_snaps acquisitions
+
+    Parameters
+    ----------
+    command: (str) one of the keys of ack_commands
+    values: (iterable of float)
+    n_snaps: (int) number of acquisitions per value
+
+    Returns
+    -------
+    list of dict: the steps, dict(command=..., value=...) or dict(command='snap')
+    """
+    steps = []
+    for value in values:
+        steps.append(dict(command=command, value=value))
+        steps.extend([dict(command='snap') for ind in range(n_snaps)])
+    return steps
+
+
+class SequenceSaver(QObject):
+    """
+    Save the frames of a sequence in a HDF5 file, living in its own thread so that the sequencer can move to the
+    next step while a frame is being written
+    """
+    saved_signal = Signal(int)
+    closed_signal = Signal()
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = str(path)
+        self.h5file = None
+
+    @Slot(dict)
+    def save(self, frame):
+        try:
+            if self.h5file is None:
+                import tables
+                self.h5file = tables.open_file(self.path, 'w', title='Spectrometer sequence')
+            group = self.h5file.create_group('/', f"frame_{frame['index']:05d}")
+            group._v_attrs['index'] = frame['index']
+            self.h5file.create_array(group, 'data', frame['data'])
+            if frame['x_axis'] is not None:
+                self.h5file.create_array(group, 'x_axis', frame['x_axis'])
+            for key, value in frame['extra'].items():
+                if value is not None:
+                    self.h5file.create_array(group, key, value)
+            for key, value in frame['state'].items():
+                if value is not None:
+                    group._v_attrs[key] = value
+        except Exception as e:
+            logger.exception(str(e))
+        self.saved_signal.emit(frame['index'])
+
+    @Slot()
+    def close_file(self):
+        try:
+            if self.h5file is not None:
+                self.h5file.close()
+                self.h5file = None
+        except Exception as e:
+            logger.exception(str(e))
+        self.closed_signal.emit()
+
+
+class Sequencer(QObject):
+    """
+    Run queued parameter changes and acquisitions on a detector. Each step waits for the acknowledgment of the
+    detector plugin (command sent back through custom_sig or data through grab_done_signal) instead of a fixed
+    delay. Acquired frames are saved in a separate thread while the next step is already running.
+
+    The Spectrometer object has to forward the commands and data of the detectors to the ack and data_received
+    methods.
+    """
+    status_signal = Signal(str)
+    start_requested = Signal()
+    finished_signal = Signal()
+    save_signal = Signal(dict)
+    close_signal = Signal()
+
+    params = [{'title': 'Sequence type:', 'name': 'sequence_type', 'type': 'list',
+               'limits': list(sequence_types.keys())},
+              {'title': 'Values:', 'name': 'values', 'type': 'str', 'value': '', 'tooltip':
+                  'Comma separated values: exposures (ms), center wavelengths (nm) or laser wavelengths (nm)'},
+              {'title': 'Snaps per step:', 'name': 'n_snaps', 'type': 'int', 'value': 1, 'min': 1},
+              {'title': 'Timeout (ms):', 'name': 'timeout_ms', 'type': 'int', 'value': 10000, 'min': 1},
+              {'title': 'Abort on timeout?:', 'name': 'abort_on_timeout', 'type': 'bool', 'value': True},
+              {'title': 'Max pending saves:', 'name': 'max_pending', 'type': 'int', 'value': 4, 'min': 1, 'tooltip':
+                  'Number of frames that can be waiting to be saved before the sequence pauses'},
+              {'title': 'Start', 'name': 'start', 'type': 'bool_push', 'value': False},
+              {'title': 'Stop', 'name': 'stop', 'type': 'bool_push', 'value': False},
+              {'title': 'Progress:', 'name': 'progress', 'type': 'str', 'value': '', 'readonly': True},
+              ]
+
+    def __init__(self):
+        super().__init__()
+        self.settings = Parameter.create(name='sequencer_settings', type='group', children=self.params)
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+
+        self.det = None
+        self.state = dict([])
+        self._steps = deque([])
+        self._n_steps = 0
+        self._waiting = None  # the command (or 'data') the current step is waiting for
+        self._index = 0
+        self._pending_saves = set([])
+        self._paused = False
+        self._stopping = False
+
+        self._timer = QtCore.QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.step_timeout)
+
+        self.saver = None
+        self.saver_thread = None
+
+    def parameter_tree_changed(self, param, changes):
+        for param, change, data in changes:
+            if change == 'value':
+                if param.name() == 'start':
+                    self.start_requested.emit()
+                elif param.name() == 'stop':
+                    self.stop()
+
+    @property
+    def running(self):
+        return self.det is not None
+
+    def get_steps(self):
+        """
+        Build the steps from the settings
+        """
+        values = [float(val) for val in self.settings.child(('values')).value().split(',') if val.strip() != '']
+        return sequence_steps(sequence_types[self.settings.child(('sequence_type')).value()], values,
+                              self.settings.child(('n_snaps')).value())
+
+    def start(self, det, steps, path, attributes=None):
+        """
+        Start a sequence
+
+        Parameters
+        ----------
+        det: (SpectroDetector) the detector to drive
+        steps: (list of dict) see sequence_steps
+        path: (str or Path) the HDF5 file where to save the acquired frames
+        attributes: (dict) constant attributes saved with each frame (for instance the processing of the spectra
+            the saved results are computed from)
+        """
+        if self.running or det.module is None:
+            return
+        self.det = det
+        self.state = dict([] if attributes is None else attributes)
+        self.state.update(exposure_ms=det.exposure_ms, spectro_wl=det.spectro_wl, laser_wl=None)
+        self._steps = deque(steps)
+        self._n_steps = len(steps)
+        self._index = 0
+        self._pending_saves = set([])
+        self._paused = False
+        self._stopping = False
+
+        if self.saver_thread is not None:
+            self.saver_thread.wait()  # the previous saver may still be writing its last frames
+        self.saver = SequenceSaver(path)
+        self.saver_thread = QThread()
+        self.saver.moveToThread(self.saver_thread)
+        self.save_signal.connect(self.saver.save)
+        self.close_signal.connect(self.saver.close_file)
+        self.saver.saved_signal.connect(self.frame_saved)
+        # quit from the saver thread itself so that waiting for it in the main thread cannot deadlock
+        self.saver.closed_signal.connect(self.saver_thread.quit, QtCore.Qt.DirectConnection)
+        self.saver_thread.start()
+
+        self.status_signal.emit(f'Sequence started: {self._n_steps} steps')
+        self.next_step()
+
+    def stop(self):
+        if self.running:
+            self._steps.clear()
+            self.finish()
+
+    def next_step(self):
+        if not self.running or self._stopping:
+            return
+        if len(self._pending_saves) >= self.settings.child(('max_pending')).value():
+            self._paused = True  # resumed when a frame has been saved
+            return
+        if len(self._steps) == 0:
+            self.finish()
+            return
+
+        step = self._steps.popleft()
+        self.settings.child(('progress')).setValue(f'{self._n_steps - len(self._steps)}/{self._n_steps}')
+        if step['command'] == 'snap':
+            self._waiting = 'data'
+            self._timer.start(self.settings.child(('timeout_ms')).value())
+            self.det.module.ui.single_pb.click()
+        else:
+            self._waiting = ack_commands[step['command']]
+            self._timer.start(self.settings.child(('timeout_ms')).value())
+            self.det.send_command(step['command'], [step['value']])
+
+    def ack(self, status, det):
+        """
+        To be called with the commands sent back by the detectors
+        """
+        if det is not self.det:
+            return
+        if status.command in self.state:
+            self.state[status.command] = status.attributes[0]
+        if self._waiting is not None and self._waiting == status.command:
+            self._timer.stop()
+            self._waiting = None
+            self.next_step()
+
+    def data_received(self, det, extra=None):
+        """
+        To be called once the data of a detector has been processed. The frame is sent to the saver thread and the
+        next step is started right away
+
+        Parameters
+        ----------
+        det: (SpectroDetector)
+        extra: (dict) results computed from this frame (name: ndarray), saved along with the data
+        """
+        if det is not self.det or self._waiting != 'data':
+            return
+        self._timer.stop()
+        self._waiting = None
+        x_axis = det.viewer_freq_axis['data']
+        frame = dict(index=self._index, data=np.array(det.raw_data),
+                     x_axis=None if x_axis is None else np.array(x_axis), state=dict(self.state),
+                     extra=dict() if extra is None else dict(extra))
+        self._pending_saves.add(self._index)
+        self._index += 1
+        self.save_signal.emit(frame)
+        self.next_step()
+
+    @Slot(int)
+    def frame_saved(self, index):
+        self._pending_saves.discard(index)
+        if self._paused:
+            self._paused = False
+            self.next_step()
+
+    def step_timeout(self):
+        self.status_signal.emit(f'Sequence: no answer from the detector for {self._waiting}')
+        self._waiting = None
+        if self.settings.child(('abort_on_timeout')).value():
+            self.stop()
+        else:
+            self.next_step()
+
+    def finish(self):
+        self._timer.stop()
+        self._waiting = None
+        self._stopping = True
+        self.close_signal.emit()  # queued after the pending frames in the saver thread
+        self.save_signal.disconnect(self.saver.save)
+        self.close_signal.disconnect(self.saver.close_file)
+        self.status_signal.emit(f'Sequence finished: {self._index} frames acquired')
+        self.det = None
+        self.finished_signal.emit()
@@ -0,0 +1,250 @@
+"""
+Local TCP server publishing the raw spectra of the Spectrometer detectors and accepting remote commands.
+
+Every message, in both directions, is: a '<II' struct (header length, payload length), a json header and an
+optional binary payload.
+
+Messages sent by the server (header 'type' key):
+    'axis': the axis of a detector (sent once, then only when it changes), payload: float32 array
+    'frame': the spectra of a detector (n_channels, n_pixels), payload: float32 array (C order)
+    'ack': answer to a command with keys command, ok and message
+
+Commands sent by the clients (header keys):
+    command: one of 'set_exposure_ms', 'set_spectro_wl', 'snap', 'grab'
+    value: the value to set (bool for grab)
+    source: (optional) the title of the detector, default is the selected one
+
+A client announcing a header longer than max_header_length or a payload longer than max_payload_length (commands have
+none) is answered with a failed ack and disconnected, instead of its message being buffered.
+"""
+import json
+import socket
+import struct
+import numpy as np
+from qtpy.QtCore import QObject, Signal
+from qtpy.QtNetwork import QTcpServer, QHostAddress
+from pymodaq.daq_utils import daq_utils as utils
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+header_struct = struct.Struct('<II')
+commands = ['set_exposure_ms', 'set_spectro_wl', 'snap', 'grab']
+max_header_length = 2**16
+max_payload_length = 2**16
+
+
+def pack_message(header, payload=b''):
+    header = json.dumps(header).encode()
+    return header_struct.pack(len(header), len(payload)) + header + payload
+
+
+class ClientConnection:
+    """
+    One subscriber: its socket, the axes already sent to it and the count of frames dropped because its socket
+    buffer was full (backpressure)
+    """
+    def __init__(self, socket, max_buffer):
+        self.socket = socket
+        self.max_buffer = max_buffer
+        self.axes_sent = dict([])
+        self.dropped = 0
+        self.buffer = b''
+
+    def send(self, message):
+        self.socket.write(message)
+
+    def is_congested(self):
+        return self.socket.bytesToWrite() > self.max_buffer
+
+
+class SpectrumServer(QObject):
+    """
+    Publish spectra to several TCP subscribers on the local machine (runs in the Qt event loop, no thread). A client
+    that does not read fast enough gets its frames dropped instead of slowing down the acquisition or the other
+    clients.
+    """
+    command_signal = Signal(dict)  # the header of a command sent by a client, plus the key 'client'
+
+    def __init__(self):
+        super().__init__()
+        self.server = None
+        self.clients = []
+        self.axes = dict([])  # the current axis (and units) of each source
+        self.frame_index = 0
+        self.max_buffer = 4 * 2**20
+
+    @property
+    def running(self):
+        return self.server is not None and self.server.isListening()
+
+    def start(self, port, max_buffer=4 * 2**20, host=QHostAddress.LocalHost):
+        self.stop()
+        self.max_buffer = max_buffer
+        self.server = QTcpServer()
+        self.server.newConnection.connect(self.new_connection)
+        if not self.server.listen(host, port):
+            logger.warning(f'Cannot start the spectrum server on port {port}: {self.server.errorString()}')
+            self.server = None
+            return False
+        return True
+
+    def stop(self):
+        for client in self.clients:
+            client.socket.disconnectFromHost()
+        self.clients = []
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def new_connection(self):
+        while self.server.hasPendingConnections():
+            client = ClientConnection(self.server.nextPendingConnection(), self.max_buffer)
+            client.socket.readyRead.connect(lambda client=client: self.read_client(client))
+            client.socket.disconnected.connect(lambda client=client: self.remove_client(client))
+            self.clients.append(client)
+            for source in self.axes:
+                self.send_axis(client, source)
+
+    def remove_client(self, client):
+        if client in self.clients:
+            self.clients.remove(client)
+        client.socket.deleteLater()
+
+    def read_client(self, client):
+        if client not in self.clients:  # disconnected for an oversized message, the remaining data is ignored
+            return
+        client.buffer += bytes(client.socket.readAll())
+        while len(client.buffer) >= header_struct.size:
+            header_length, payload_length = header_struct.unpack(client.buffer[:header_struct.size])
+            if header_length > max_header_length or payload_length > max_payload_length:
+                self.reject_client(client, f'message too large (header: {header_length} bytes, payload: '
+                                           f'{payload_length} bytes, max: {max_header_length}, {max_payload_length})')
+                break
+            length = header_struct.size + header_length + payload_length
+            if len(client.buffer) < length:
+                break
+            try:
+                header = json.loads(client.buffer[header_struct.size:header_struct.size + header_length].decode())
+                if not isinstance(header, dict):
+                    raise TypeError(f'The header should be a json object, not {type(header).__name__}')
+                if header.get('command') not in commands:
+                    self.acknowledge(client, header.get('command'), False, 'unknown command')
+                else:
+                    header['client'] = client
+                    self.command_signal.emit(header)
+            except (ValueError, TypeError, KeyError) as e:
+                self.acknowledge(client, None, False, str(e))
+            client.buffer = client.buffer[length:]
+
+    def reject_client(self, client, message):
+        """
+        Answer a failed ack to a misbehaving client then disconnect it (once the ack is written)
+        """
+        logger.warning(f'Client disconnected: {message}')
+        self.acknowledge(client, None, False, message)
+        client.buffer = b''
+        self.clients.remove(client)
+        client.socket.disconnectFromHost()
+
+    def acknowledge(self, client, command, ok=True, message=''):
+        """
+        Answer a command of a client, nothing is sent if the client has disconnected in the meantime
+        """
+        if client not in self.clients:
+            return
+        try:
+            client.send(pack_message(dict(type='ack', command=command, ok=ok, message=message)))
+        except RuntimeError as e:  # the socket has already been deleted
+            logger.warning(f'Cannot acknowledge {command}: {str(e)}')
+
+    def send_axis(self, client, source):
+        axis, units = self.axes[source]
+        client.send(pack_message(dict(type='axis', source=source, units=units, size=axis.size), axis.tobytes()))
+        client.axes_sent[source] = True
+
+    def publish(self, source, spectra, axis=None, units=''):
+        """
+        Send the spectra of a detector to all the clients, the axis is only sent if it changed
+
+        Parameters
+        ----------
+        source: (str) the detector title
+        spectra: (list of ndarray) the spectra of each channel
+        axis: (ndarray) the (calibrated) axis
+        units: (str) the axis units
+        """
+        if len(self.clients) == 0:
+            return
+        if axis is not None:
+            axis = np.asarray(axis, dtype=np.float32)  # compared as sent, a float64 axis never equals its float32 copy
+            if source not in self.axes or units != self.axes[source][1] or \
+                    not np.array_equal(axis, self.axes[source][0]):
+                self.axes[source] = (axis, units)
+                for client in self.clients:
+                    client.axes_sent[source] = False
+
+        data = np.ascontiguousarray(spectra, dtype=np.float32)
+        message = pack_message(dict(type='frame', source=source, index=self.frame_index, shape=data.shape),
+                               data.tobytes())
+        self.frame_index += 1
+        for client in self.clients:
+            if client.is_congested():
+                client.dropped += 1
+                continue
+            if source in self.axes and not client.axes_sent.get(source, False):
+                self.send_axis(client, source)
+            client.send(message)
+
+
+class SpectrumClient:
+    """
+    Blocking client of a SpectrumServer, to be used from another process (for instance a lab control system or a
+    test)
+
+    Examples
+    --------
+    >>> client = SpectrumClient(port=6341)
+    >>> client.send_command('set_exposure_ms', 50)
+    >>> header, data = client.receive()
+    """
+    def __init__(self, host='127.0.0.1', port=6341, timeout=5.):
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.axes = dict([])
+
+    def close(self):
+        self.socket.close()
+
+    def send_command(self, command, value=None, source=None):
+        header = dict(command=command, value=value)
+        if source is not None:
+            header['source'] = source
+        self.socket.sendall(pack_message(header))
+
+    def _read(self, length):
+        data = b''
+        while len(data) < length:
+            chunk = self.socket.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError('Connection closed by the server')
+            data += chunk
+        return data
+
+    def receive(self):
+        """
+        Receive the next message, axis messages are stored in the axes attribute (keyed by source)
+
+        Returns
+        -------
+        dict: the header
+        ndarray or None: the payload (reshaped for frames)
+        """
+        header_length, payload_length = header_struct.unpack(self._read(header_struct.size))
+        header = json.loads(self._read(header_length).decode())
+        data = None
+        if payload_length != 0:
+            data = np.frombuffer(self._read(payload_length), dtype=np.float32)
+        if header['type'] == 'axis':
+            self.axes[header['source']] = (data, header['units'])
+        elif header['type'] == 'frame':
+            data = data.reshape(header['shape'])
+        return header, data
@@ -0,0 +1,115 @@
+"""
+Session snapshots of the spectrometer application: a JSON file (dock layout, settings, detectors state and
+calibrations, source of the detectors) and a NPZ file with the last spectra of each detector (one array per channel,
+the channels of a detector may have different sizes). Both are written to
+temporary files then renamed so that a crash during a save never leaves a corrupted session.
+"""
+import json
+import os
+from pathlib import Path
+import numpy as np
+
+version = 1
+skipped_settings = ['selected_det', 'curr_det', 'calib_history', 'save_calib', 'load_calib', 'store_calib',
+                    'export_calib', 'do_calib', 'spectro_center_freq_txt']
+
+
+def _to_builtin(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f'{type(obj)} is not JSON serializable')
+
+
+def filter_settings(state):
+    """
+    Remove from a Parameter state (saveState(filter='user')) the settings that should not be restored: actions and
+    values depending on the loaded detectors
+    """
+    if 'children' in state:
+        state['children'] = dict([(name, filter_settings(child)) for name, child in state['children'].items()
+                                  if name not in skipped_settings])
+    return state
+
+
+def dock_state_to_json(state):
+    """
+    The dock area state (tuples nested in dicts) with the floating docks removed, tuples being stored as lists
+    """
+    state = dict(state)
+    if 'float' in state:
+        state['float'] = []
+    return json.loads(json.dumps(state, default=_to_builtin))
+
+
+def _replace(path, write):
+    tmp_path = path.with_name(path.name + '.tmp')
+    write(tmp_path)
+    os.replace(str(tmp_path), str(path))
+
+
+def save_session(folder, state, spectra=None):
+    """
+    Parameters
+    ----------
+    folder: (str or Path) the session folder
+    state: (dict) JSON serializable state
+    spectra: (dict) for each detector title, a tuple (axis or None, list of spectra)
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    arrays = dict([])
+    state = dict(state, version=version, spectra=[])
+    if spectra is not None:
+        for ind, (title, (axis, datas)) in enumerate(spectra.items()):
+            if len(datas) == 0:
+                continue
+            for channel, data in enumerate(datas):
+                arrays[f'data_{ind}_{channel}'] = np.asarray(data)
+            if axis is not None:
+                arrays[f'axis_{ind}'] = np.asarray(axis)
+            state['spectra'].append(dict(title=title, index=ind, n_channels=len(datas)))
+
+    def write_npz(path):
+        with open(path, 'wb') as f:  # np.savez adds .npz to a str path
+            np.savez(f, **arrays)
+
+    def write_json(path):
+        with open(path, 'w') as f:
+            json.dump(state, f, default=_to_builtin, indent=1)
+
+    _replace(folder.joinpath('session.npz'), write_npz)
+    _replace(folder.joinpath('session.json'), write_json)
+
+
+def load_session(folder):
+    """
+    Returns
+    -------
+    dict or None: the state saved by save_session (None if there is no valid session)
+    dict: for each detector title, a tuple (axis or None, list of ndarray: the spectrum of each channel)
+    """
+    folder = Path(folder)
+    try:
+        with open(folder.joinpath('session.json'), 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None, dict([])
+    if state.get('version', None) != version:
+        return None, dict([])
+    spectra = dict([])
+    try:
+        with np.load(str(folder.joinpath('session.npz'))) as arrays:
+            for spectrum in state.get('spectra', []):
+                ind = spectrum['index']
+                if 'n_channels' in spectrum:
+                    datas = [arrays[f'data_{ind}_{channel}'] for channel in range(spectrum['n_channels'])]
+                else:  # saved as a single 2D array
+                    datas = list(arrays[f'data_{ind}'])
+                spectra[spectrum['title']] = (arrays[f'axis_{ind}'] if f'axis_{ind}' in arrays else None, datas)
+    except (OSError, ValueError, KeyError):
+        pass
+    return state, spectra
@@ -0,0 +1,235 @@
+"""
+Shared memory ring buffer of spectra, for zero-copy handoff of the frames to analysis processes on the same machine.
+
+Memory layout (all in one multiprocessing.shared_memory segment):
+    header: int64 array, see header_fields
+    slots_seq: int64 array (n_slots), sequence number of the frame in each slot, -1 while being written
+    axis: float64 array (n_pixels)
+    data: array (n_slots, n_channels, n_pixels) of the chosen dtype
+
+Frames are numbered by an increasing sequence number and written in the slot seq % n_slots. A reader gets numpy views
+onto the slots and checks with the sequence numbers that a frame has not been overwritten (overrun) while it was used.
+
+Example of a reader in another process:
+    >>> reader = SharedSpectraReader('pymodaq_spectro_Simulated00')
+    >>> seq, frame = reader.latest()
+    >>> result = frame.mean(axis=1)
+    >>> reader.is_valid(seq)  # False if the writer overwrote the frame during the computation
+"""
+from multiprocessing import shared_memory
+import re
+import numpy as np
+
+header_fields = ['magic', 'closed', 'n_slots', 'n_channels', 'n_pixels', 'dtype', 'write_seq', 'axis_seq']
+magic = 0x5350454354524f  # 'SPECTRO'
+dtypes = [np.dtype(np.float32), np.dtype(np.float64), np.dtype(np.uint16), np.dtype(np.uint32), np.dtype(np.int32)]
+
+
+def segment_name(prefix, title):
+    return re.sub(r'[^0-9a-zA-Z_]', '_', f'{prefix}_{title}')
+
+
+def _layout(n_slots, n_channels, n_pixels, dtype):
+    header_size = len(header_fields) * 8
+    slots_size = n_slots * 8
+    axis_size = n_pixels * 8
+    data_size = n_slots * n_channels * n_pixels * np.dtype(dtype).itemsize
+    return header_size, header_size + slots_size, header_size + slots_size + axis_size, \
+        header_size + slots_size + axis_size + data_size
+
+
+class _SharedSpectra:
+    def _map(self, n_slots, n_channels, n_pixels, dtype):
+        axis_offset, data_offset, end = _layout(n_slots, n_channels, n_pixels, dtype)[1:]
+        buf = self.shm.buf
+        self.header = np.ndarray((len(header_fields),), dtype=np.int64, buffer=buf)
+        self.slots_seq = np.ndarray((n_slots,), dtype=np.int64, buffer=buf, offset=len(header_fields) * 8)
+        self.axis = np.ndarray((n_pixels,), dtype=np.float64, buffer=buf, offset=axis_offset)
+        self.data = np.ndarray((n_slots, n_channels, n_pixels), dtype=dtype, buffer=buf, offset=data_offset)
+
+    def field(self, name):
+        return int(self.header[header_fields.index(name)])
+
+    def set_field(self, name, value):
+        self.header[header_fields.index(name)] = value
+
+    @property
+    def shape(self):
+        return self.data.shape[1:]
+
+
+class SharedSpectraWriter(_SharedSpectra):
+    """
+    Create the shared memory segment and write the frames into it
+
+    Parameters
+    ----------
+    name: (str) name of the segment
+    n_slots: (int) number of frames kept in the ring buffer
+    n_channels: (int)
+    n_pixels: (int)
+    dtype: one of dtypes
+    """
+    def __init__(self, name, n_slots, n_channels, n_pixels, dtype=np.float64):
+        dtype = np.dtype(dtype)
+        if dtype not in dtypes:
+            dtype = np.dtype(np.float64)
+        self.name = name
+        try:  # remove a segment left over by a crashed session
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+        self.shm = shared_memory.SharedMemory(name=name, create=True,
+                                              size=_layout(n_slots, n_channels, n_pixels, dtype)[-1])
+        self._map(n_slots, n_channels, n_pixels, dtype)
+        self.header[:] = 0
+        self.slots_seq[:] = -1
+        for field, value in zip(['n_slots', 'n_channels', 'n_pixels', 'dtype'],
+                                [n_slots, n_channels, n_pixels, dtypes.index(dtype)]):
+            self.set_field(field, value)
+        self.set_field('magic', magic)
+        self.seq = 0
+
+    def write(self, spectra, axis=None):
+        """
+        Copy a frame into the next slot
+
+        Parameters
+        ----------
+        spectra: (list of ndarray or ndarray) shape (n_channels, n_pixels)
+        axis: (ndarray) written only if it differs from the current one
+
+        Returns
+        -------
+        int: the sequence number of the frame
+        """
+        if axis is not None and not np.array_equal(axis, self.axis):
+            self.axis[:] = axis
+            self.set_field('axis_seq', self.field('axis_seq') + 1)
+        slot = self.seq % self.slots_seq.size
+        self.slots_seq[slot] = -1
+        for ind, spectrum in enumerate(spectra):
+            self.data[slot, ind] = spectrum
+        self.slots_seq[slot] = self.seq
+        self.seq += 1
+        self.set_field('write_seq', self.seq)
+        return self.seq - 1
+
+    def close(self):
+        self.set_field('closed', 1)
+        self.header = self.slots_seq = self.axis = self.data = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedSpectraReader(_SharedSpectra):
+    """
+    Attach to a segment created by a SharedSpectraWriter (in any process) and give numpy views onto its frames
+    """
+    def __init__(self, name):
+        self.name = name
+        self.attach()
+
+    def attach(self):
+        try:
+            self.shm = shared_memory.SharedMemory(name=self.name, track=False)
+        except TypeError:  # python < 3.13: the resource tracker would unlink the segment when this process exits
+            self.shm = shared_memory.SharedMemory(name=self.name)
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, 'shared_memory')
+            except Exception:
+                pass
+        header = np.ndarray((len(header_fields),), dtype=np.int64, buffer=self.shm.buf)
+        if header[header_fields.index('magic')] != magic:
+            raise ValueError(f'{self.name} is not a spectra shared memory segment')
+        self._map(*[int(header[header_fields.index(field)]) for field in ['n_slots', 'n_channels', 'n_pixels']],
+                  dtypes[int(header[header_fields.index('dtype')])])
+        self.last_seq = self.write_seq - 1
+
+    def close(self):
+        self.header = self.slots_seq = self.axis = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:  # views returned by get/latest are still referenced, the mapping is released with them
+            pass
+
+    def reattach_if_closed(self):
+        """
+        The writer recreates its segment when the frame shape changes: attach to the new one
+
+        Returns
+        -------
+        bool: True if attached to a new segment
+        """
+        if self.field('closed'):
+            self.close()
+            self.attach()
+            return True
+        return False
+
+    @property
+    def write_seq(self):
+        """int: the sequence number of the next frame to be written"""
+        return self.field('write_seq')
+
+    @property
+    def axis_seq(self):
+        """int: incremented each time the axis changes"""
+        return self.field('axis_seq')
+
+    def is_valid(self, seq):
+        """
+        Returns
+        -------
+        bool: True if the frame seq is still in its slot (not overwritten nor being written)
+        """
+        return seq >= 0 and int(self.slots_seq[seq % self.slots_seq.size]) == seq
+
+    def get(self, seq):
+        """
+        Returns
+        -------
+        ndarray or None: a view onto the frame seq, None if it has been overwritten (overrun)
+        """
+        if not self.is_valid(seq):
+            return None
+        return self.data[seq % self.slots_seq.size]
+
+    def latest(self):
+        """
+        Returns
+        -------
+        int: sequence number of the last complete frame (-1 if none)
+        ndarray or None: view onto this frame
+        """
+        seq = self.write_seq - 1
+        view = self.get(seq)
+        if view is None:
+            return -1, None
+        self.last_seq = seq
+        return seq, view
+
+    def new_frames(self):
+        """
+        Get the frames written since the last call
+
+        Returns
+        -------
+        list of tuple: (seq, view) of the frames still available
+        int: number of frames missed because they were overwritten before being read (overrun)
+        """
+        write_seq = self.write_seq
+        first = max(self.last_seq + 1, write_seq - self.slots_seq.size)
+        missed = first - (self.last_seq + 1)
+        frames = []
+        for seq in range(first, write_seq):
+            view = self.get(seq)
+            if view is None:
+                missed += 1
+            else:
+                frames.append((seq, view))
+        self.last_seq = write_seq - 1
+        return frames, missed
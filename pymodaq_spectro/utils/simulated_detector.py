@@ -0,0 +1,276 @@
+import time
+from types import SimpleNamespace
+from collections import OrderedDict
+import numpy as np
+from qtpy import QtWidgets, QtCore
+from qtpy.QtCore import QObject, Slot, Signal, QThread
+from pyqtgraph.parametertree import Parameter
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq.daq_utils.daq_utils import ThreadCommand
+from pymodaq_spectro.utils import units
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+def simulated_spectra(axis, laser_wl, shifts, heights, widths, exposure_ms=100., n_channels=1, noise=0.01,
+                      cosmic_rate=0., rng=None):
+    """
+    Compute Raman like spectra: lorentzian peaks at given shifts from the laser line, plus gaussian noise and cosmic
+    rays (single pixel spikes)
+
+    Parameters
+    ----------
+    axis: (ndarray) wavelength axis in nm
+    laser_wl: (float) laser wavelength in nm
+    shifts: (ndarray) peaks positions in relative cm-1
+    heights: (ndarray) peaks heights (counts per 100ms)
+    widths: (ndarray) peaks FWHM in nm
+    exposure_ms: (float) the signal scales linearly with the exposure
+    n_channels: (int)
+    noise: (float) standard deviation of the noise relative to the highest peak
+    cosmic_rate: (float) mean number of cosmic rays per spectrum
+    rng: (np.random.Generator)
+
+    Returns
+    -------
+    ndarray: spectra of shape (n_channels, axis.size)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    centers = units.to_nm(np.asarray(shifts, dtype=float), 'cm-1', laser_wl)
+    spectrum = np.sum(np.asarray(heights)[:, None] /
+                      (1 + (2 * (axis[None, :] - centers[:, None]) / np.asarray(widths)[:, None])**2), axis=0)
+    spectra = np.repeat(spectrum[None, :] * exposure_ms / 100, n_channels, axis=0)
+    spectra += noise * np.max(heights) * rng.standard_normal(spectra.shape)
+    n_cosmics = rng.poisson(cosmic_rate * n_channels)
+    if n_cosmics != 0:
+        spectra[rng.integers(0, n_channels, n_cosmics), rng.integers(0, axis.size, n_cosmics)] += \
+            rng.uniform(5, 50, n_cosmics) * np.max(heights)
+    return spectra
+
+
+class SimulatedWorker(QObject):
+    """
+    Generate the frames of the simulated spectrometer in its own thread. The worker only uses the snapshot of the
+    simulation parameters sent by the main thread (see SimulatedSpectrometer.configuration), never the settings or
+    the axis cache of the spectrometer.
+    """
+    data_signal = Signal(OrderedDict)
+
+    def __init__(self):
+        super().__init__()
+        self.config = None
+        self.frame_index = 0
+        self.frames_consumed = 0  # set by the main thread when a frame has been processed
+        self.timer = None
+        self.rng = np.random.default_rng()
+
+    @Slot(dict)
+    def configure(self, config):
+        self.config = config
+
+    @Slot()
+    def init_timer(self):
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.emit_frame)
+
+    @Slot(float)
+    def start(self, rate_hz):
+        self.timer.start(0 if rate_hz <= 0 else int(1000 / rate_hz))
+
+    @Slot()
+    def stop(self):
+        self.timer.stop()
+
+    @Slot()
+    def emit_frame(self):
+        config = self.config
+        if config is None:
+            return
+        index = self.frame_index
+        self.frame_index += 1
+        if self.frame_index - self.frames_consumed > config['max_pending']:
+            return  # the consumer does not keep up: the frame is dropped, seen as a gap in frame_index
+        spectra = simulated_spectra(config['axis']['data'], config['laser_wl'], config['shifts'], config['heights'],
+                                    config['widths'], config['exposure_ms'], config['n_channels'], config['noise'],
+                                    config['cosmic_rate'], self.rng)
+        self.data_signal.emit(OrderedDict(
+            name=config['title'], frame_index=index, timestamp=time.perf_counter(),
+            data1D=OrderedDict([(f'CH{ind:03d}', dict(data=spectrum, x_axis=config['axis']))
+                                for ind, spectrum in enumerate(spectra)])))
+
+
+class SimulatedSpectrometer(QObject):
+    """
+    Synthetic spectrometer behaving as a DAQ_Viewer module for the Spectrometer object: it emits the same
+    grab_done_signal OrderedDict and answers through custom_sig the get_spectro_wl, get_axis, get_laser_wl,
+    get_exposure_ms commands (and their set counterparts) sent through command_detector.
+
+    Frames are generated in a separate thread at a configurable rate (0 for as fast as possible), frames are dropped
+    if more than max_pending frames are waiting to be processed.
+    """
+    custom_sig = Signal(ThreadCommand)
+    grab_done_signal = Signal(OrderedDict)
+    command_detector = Signal(ThreadCommand)
+    start_signal = Signal(float)
+    stop_signal = Signal()
+    single_signal = Signal()
+    config_signal = Signal(dict)
+
+    params = [{'title': 'Main settings:', 'name': 'main_settings', 'type': 'group', 'children': [
+                  {'title': 'DAQ type:', 'name': 'DAQ_type', 'type': 'str', 'value': 'DAQ1D', 'readonly': True},
+                  {'title': 'Detector type:', 'name': 'detector_type', 'type': 'str', 'value': 'Simulated',
+                   'readonly': True},
+              ]},
+              {'title': 'Simulation:', 'name': 'simulation', 'type': 'group', 'children': [
+                  {'title': 'Pixels:', 'name': 'n_pixels', 'type': 'int', 'value': 1024, 'min': 2},
+                  {'title': 'Channels:', 'name': 'n_channels', 'type': 'int', 'value': 1, 'min': 1},
+                  {'title': 'Frame rate (Hz):', 'name': 'rate_hz', 'type': 'float', 'value': 10., 'min': 0.,
+                   'tooltip': '0 for as fast as possible'},
+                  {'title': 'Max pending frames:', 'name': 'max_pending', 'type': 'int', 'value': 10, 'min': 1},
+                  {'title': 'Dispersion (nm/pxl):', 'name': 'dispersion', 'type': 'float', 'value': 0.05},
+                  {'title': 'Peaks shifts (cm-1):', 'name': 'shifts', 'type': 'str', 'value': '520, 1000, 1600, 2900'},
+                  {'title': 'Peaks heights:', 'name': 'heights', 'type': 'str', 'value': '1000, 300, 600, 200'},
+                  {'title': 'Peaks widths (nm):', 'name': 'widths', 'type': 'str', 'value': '0.3, 0.5, 1, 2'},
+                  {'title': 'Noise:', 'name': 'noise', 'type': 'float', 'value': 0.01, 'min': 0.},
+                  {'title': 'Cosmic rays/frame:', 'name': 'cosmic_rate', 'type': 'float', 'value': 0.05, 'min': 0.},
+                  {'title': 'Lasers (nm):', 'name': 'lasers', 'type': 'str', 'value': '532, 633, 785'},
+                  {'title': 'Grating move (ms):', 'name': 'move_time_ms', 'type': 'int', 'value': 200, 'min': 0},
+              ]},
+              ]
+
+    def __init__(self, title='Simulated'):
+        super().__init__()
+        self.title = title
+        self.settings = Parameter.create(name='settings', type='group', children=self.params)
+        self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
+
+        self.lasers = []
+        self.laser_wl = 532.
+        self.spectro_wl = 600.
+        self.exposure_ms = 100.
+        self.shifts = self.heights = self.widths = None
+        self._axis = None
+        self.update_peaks()
+
+        self.ui = SimpleNamespace()  # mimics the buttons of the DAQ_Viewer user interface
+        self.ui.grab_pb = QtWidgets.QPushButton('Grab')
+        self.ui.grab_pb.setCheckable(True)
+        self.ui.grab_pb.toggled.connect(self.grab)
+        self.ui.single_pb = QtWidgets.QPushButton('Snap')
+        self.ui.single_pb.clicked.connect(self.single_signal.emit)
+        self.ui.viewers = [None]
+
+        self.worker = SimulatedWorker()
+        self.thread = QThread()
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.init_timer)
+        self.config_signal.connect(self.worker.configure)
+        self.start_signal.connect(self.worker.start)
+        self.stop_signal.connect(self.worker.stop)
+        self.single_signal.connect(self.worker.emit_frame)
+        self.worker.data_signal.connect(self.data_received)
+        self.command_detector.connect(self.process_command)
+        self.thread.start()
+        self.update_config()
+
+    def parameter_tree_changed(self, param, changes):
+        for param, change, data in changes:
+            if change == 'value':
+                if param.name() in ['shifts', 'heights', 'widths', 'lasers']:
+                    self.update_peaks()
+                elif param.name() in ['n_pixels', 'dispersion']:
+                    self._axis = None
+                elif param.name() == 'rate_hz' and self.ui.grab_pb.isChecked():
+                    self.start_signal.emit(data)
+        self.update_config()
+
+    def configuration(self):
+        """
+        Returns
+        -------
+        dict: snapshot of the parameters used to generate the frames (plain values, the axis being rebuilt rather than
+            modified when it changes)
+        """
+        return dict(title=self.title, axis=self.get_axis(), laser_wl=self.laser_wl, exposure_ms=self.exposure_ms,
+                    shifts=self.shifts, heights=self.heights, widths=self.widths,
+                    **dict([(name, self.settings.child('simulation', name).value())
+                            for name in ['n_channels', 'noise', 'cosmic_rate', 'max_pending']]))
+
+    def update_config(self):
+        """
+        Send the current parameters to the worker (queued into its thread)
+        """
+        self.config_signal.emit(self.configuration())
+
+    def update_peaks(self):
+        try:
+            shifts, heights, widths = [np.array([float(val) for val in self.settings.child('simulation', name).value()
+                                                .split(',') if val.strip() != ''])
+                                       for name in ['shifts', 'heights', 'widths']]
+            n_peaks = min(shifts.size, heights.size, widths.size)
+            self.shifts, self.heights, self.widths = shifts[:n_peaks], heights[:n_peaks], widths[:n_peaks]
+            self.lasers = [float(val) for val in self.settings.child('simulation', 'lasers').value().split(',')
+                           if val.strip() != '']
+            if len(self.lasers) != 0 and self.laser_wl not in self.lasers:
+                self.laser_wl = self.lasers[0]
+        except ValueError as e:
+            logger.warning(str(e))
+
+    def get_axis(self):
+        """
+        Returns
+        -------
+        utils.Axis: the wavelength axis (nm) of the current grating position
+        """
+        axis = self._axis
+        if axis is None:
+            n_pixels = self.settings.child('simulation', 'n_pixels').value()
+            axis = utils.Axis(data=self.spectro_wl + self.settings.child('simulation', 'dispersion').value() *
+                              (np.linspace(0, n_pixels - 1, n_pixels) - (n_pixels - 1) / 2),
+                              label='Wavelength', units='nm')
+            self._axis = axis
+        return axis
+
+    @Slot(OrderedDict)
+    def data_received(self, data):
+        self.worker.frames_consumed = data['frame_index'] + 1
+        self.grab_done_signal.emit(data)
+
+    def grab(self, state):
+        if state:
+            self.start_signal.emit(self.settings.child('simulation', 'rate_hz').value())
+        else:
+            self.stop_signal.emit()
+
+    @Slot(ThreadCommand)
+    def process_command(self, command):
+        if command.command == 'get_spectro_wl':
+            self.custom_sig.emit(ThreadCommand('spectro_wl', [self.spectro_wl]))
+        elif command.command == 'set_spectro_wl':
+            QtCore.QTimer.singleShot(self.settings.child('simulation', 'move_time_ms').value(),
+                                     lambda: self.grating_moved(command.attributes[0]))
+        elif command.command == 'get_axis':
+            self.custom_sig.emit(ThreadCommand('x_axis', [self.get_axis()]))
+        elif command.command in ['get_laser_wl', 'set_laser_wl']:
+            if command.command == 'set_laser_wl' and command.attributes[0] in self.lasers:
+                self.laser_wl = command.attributes[0]
+                self.update_config()
+            self.custom_sig.emit(ThreadCommand('laser_wl', [self.laser_wl]))
+        elif command.command in ['get_exposure_ms', 'set_exposure_ms']:
+            if command.command == 'set_exposure_ms':
+                self.exposure_ms = command.attributes[0]
+                self.update_config()
+            self.custom_sig.emit(ThreadCommand('exposure_ms', [self.exposure_ms]))
+
+    def grating_moved(self, spectro_wl):
+        self.spectro_wl = spectro_wl
+        self._axis = None
+        self.update_config()
+        self.custom_sig.emit(ThreadCommand('spectro_wl', [self.spectro_wl]))
+        self.custom_sig.emit(ThreadCommand('x_axis', [self.get_axis()]))
+
+    def quit_fun(self):
+        self.stop_signal.emit()
+        self.thread.quit()
+        self.thread.wait()
@@ -0,0 +1,223 @@
+from collections import OrderedDict
+import numpy as np
+from pymodaq.daq_utils import daq_utils as utils
+from pymodaq.daq_utils.daq_utils import ThreadCommand
+from pymodaq_spectro.utils.reduction import ImageReducer
+from pymodaq_spectro.utils.baseline import BaselineRemover
+
+logger = utils.set_logger(utils.get_module_name(__file__))
+
+
+class SpectroDetector:
+    """
+    State of one detector handled by the Spectrometer object: the DAQ_Viewer module, its spectrometer
+    capabilities, its own frequency axis, calibration and last received spectra.
+
+    Several instances can live concurrently, each one connected to its own DAQ_Viewer and grabbing independently.
+
+    Parameters
+    ----------
+    module: (DAQ_Viewer) the detector module or None for offline (loaded) data
+    current_det: (dict) capabilities of the detector:
+        laser: if False, laser cannot be changed by the program
+        laser_list: list of selectable lasers
+        movable: tells if the dispersion can be set (for instance by moving a grating)
+        calib: True if there is a builtin calibration of the frequency axis
+    title: (str) name used if module is None
+    """
+
+    def __init__(self, module=None, current_det=None, title='Offline'):
+        self.module = module
+        self.title = module.title if module is not None else title
+        if current_det is None:
+            current_det = dict(laser=False, laser_list=[''], movable=False, calib=False)
+        self.current_det = current_det
+
+        self.viewer = None  # the Viewer1D displaying this detector's data
+        self.dock = None  # the dock containing the viewer if created for this detector only
+        self.settings_dock = None  # the dock containing the settings of a detector not handled by the dashboard
+
+        self.viewer_freq_axis = utils.Axis(data=None, label='Photon energy', units='')
+        self.display_cache = dict([])  # the axis converted for display and derived quantities, see Spectrometer
+        self.displayed_axis = None  # the axis object last sent to the viewer
+        self.raw_data = []  # the spectra as received (or reduced from images), saved and published
+        self.processed_data = []  # the spectra after baseline removal, displayed and analysed
+        self.data_dict = None
+        self.reducer = ImageReducer()  # reduction of the images of 2D detectors into spectra
+        self.baseline = BaselineRemover()  # keeps the ALS/airPLS factorizations of this detector channels
+
+        self.spectro_wl = 550  # center wavelength of the spectrum
+        self.laser_wl = None  # laser wavelength reported by (or selected for) a detector controlling its laser
+        self.exposure_ms = None
+        self.use_calib = False
+        self.calib_coeffs = [0., 0., 1., 515.]  # third, second, slope, center as used by np.polyval
+
+        self.pending_replies = set([])  # replies of the plugin still awaited after the initialization queries
+        self.required_replies = set([])  # replies needed before starting acquisitions
+
+    @property
+    def info(self):
+        if self.module is None:
+            return self.title
+        return f"{self.module.settings.child('main_settings', 'DAQ_type').value()} / " \
+               f"{self.module.settings.child('main_settings', 'detector_type').value()} / {self.title}"
+
+    @property
+    def grating(self):
+        """str: the value of the plugin setting named grating if there is one, else an empty string"""
+        if self.module is None:
+            return ''
+        params = list(self.module.settings.children())
+        while len(params) != 0:
+            param = params.pop(0)
+            if param.name() == 'grating' and param.type() != 'group':
+                return str(param.value())
+            params.extend(param.children())
+        return ''
+
+    @property
+    def ready(self):
+        """bool: True if the minimum required state has been received from the plugin"""
+        return len(self.required_replies & self.pending_replies) == 0
+
+    def init_queries(self):
+        """
+        Get the queries to send to the plugin to know its current state and set the awaited replies accordingly
+
+        Returns
+        -------
+        list of str: the commands to send
+        """
+        queries = OrderedDict([('get_exposure_ms', 'exposure_ms')])
+        self.required_replies = set([])
+        if self.current_det['calib']:
+            queries['get_spectro_wl'] = 'spectro_wl'
+            queries['get_axis'] = 'x_axis'
+            self.required_replies.add('spectro_wl')
+        if self.current_det['laser']:
+            queries['get_laser_wl'] = 'laser_wl'
+            self.required_replies.add('laser_wl')  # part of the key of the stored calibrations
+        self.pending_replies = set(queries.values())
+        return list(queries.keys())
+
+    def reply_received(self, command):
+        """
+        Register a reply from the plugin
+
+        Returns
+        -------
+        bool: True if this reply makes the detector ready
+        """
+        if command not in self.pending_replies:
+            return False
+        was_ready = self.ready
+        self.pending_replies.discard(command)
+        return not was_ready and self.ready
+
+    def send_command(self, command, attributes=[]):
+        """
+        Emit a ThreadCommand to the detector plugin, if any
+        """
+        if self.module is not None:
+            self.module.command_detector.emit(ThreadCommand(command, attributes))
+
+    def update_data(self, data):
+        """
+        Extract the 1D spectra (and possibly the axis) from the data emitted by the detector, the images of 2D
+        detectors are reduced into spectra (one per channel and track) by the reducer
+
+        Parameters
+        ----------
+        data: (OrderedDict) OrderedDict(name=..., data0D=None, data1D=None, data2D=None) as emitted by DAQ_Viewer
+
+        Returns
+        -------
+        bool: True if some 1D data has been found (or reduced from 2D data)
+        """
+        self.data_dict = data
+        if data.get('data1D', None):
+            dim = 'data1D'
+        elif data.get('data2D', None):
+            dim = 'data2D'
+        else:
+            return False
+        self.raw_data = []
+        for key in data[dim]:
+            if dim == 'data1D':
+                self.raw_data.append(data[dim][key]['data'])
+            else:
+                self.raw_data.extend(self.reducer.reduce(data[dim][key]['data']))
+            if 'x_axis' in data[dim][key]:
+                x_axis = data[dim][key]['x_axis']
+            else:
+                x_axis = utils.Axis(
+                    data=np.linspace(0, len(self.raw_data[-1])-1, len(self.raw_data[-1])),
+                    units='pxls',
+                    label='')
+            if self.viewer_freq_axis['data'] is None:
+                self.viewer_freq_axis.update(x_axis)
+            elif self.current_det['calib'] and np.any(x_axis['data'] != self.viewer_freq_axis['data']):
+                self.viewer_freq_axis.update(x_axis)
+        self.processed_data = self.raw_data
+        return True
+
+    def update_axis_from_det(self, x_axis):
+        """
+        Update the frequency axis from the one sent by the plugin (only if the plugin is calibrated)
+
+        Returns
+        -------
+        bool: True if the axis has been changed
+        """
+        if self.current_det['calib'] and np.any(x_axis['data'] != self.viewer_freq_axis['data']):
+            self.viewer_freq_axis.update(x_axis)
+            return True
+        return False
+
+    def apply_calibration(self):
+        """
+        Compute the frequency axis (in nm) from the calibration coefficients and the number of pixels
+
+        Returns
+        -------
+        bool: False if no data has been received yet so the number of pixels is unknown
+        """
+        if len(self.raw_data) == 0:
+            return False
+        x_axis_pxls = np.linspace(0, self.raw_data[0].size-1, self.raw_data[0].size)
+        self.viewer_freq_axis['data'] = np.polyval(self.calib_coeffs, x_axis_pxls-np.max(x_axis_pxls)/2)
+        return True
+
+
+def merge_spectra(detectors):
+    """
+    Resample the spectra of several detectors onto one common (sorted) axis, outside of each detector range values
+    are set to NaN
+
+    Parameters
+    ----------
+    detectors: (list of SpectroDetector)
+
+    Returns
+    -------
+    ndarray: the common axis
+    list of ndarray: the resampled spectra
+    list of str: the labels of each spectrum
+    """
+    axes = []
+    spectra = []
+    labels = []
+    for det in detectors:
+        if len(det.processed_data) == 0 or det.viewer_freq_axis['data'] is None:
+            continue
+        axis = np.asarray(det.viewer_freq_axis['data'])
+        order = np.argsort(axis)
+        axes.append(axis[order])
+        for ind, data in enumerate(det.processed_data):
+            spectra.append((axis[order], np.asarray(data)[order]))
+            labels.append(f'{det.title} CH{ind:02d}')
+    if len(axes) == 0:
+        return None, [], []
+    common_axis = np.unique(np.concatenate(axes))
+    datas = [np.interp(common_axis, axis, data, left=np.nan, right=np.nan) for axis, data in spectra]
+    return common_axis, datas, labels
@@ -0,0 +1,123 @@
+"""
+Table driven conversions between the wavelength in nm and the other spectral units. All the units are of the form
+y = factor / wavelength_nm + offset so that one vectorized kernel (with an optional out= array for in place
+computation) handles all of them, the relative wavenumber (Raman shift) offset depending on the laser wavelength.
+"""
+from collections import OrderedDict
+import numpy as np
+
+c = 299792458.  # m/s
+h = 6.62607015e-34  # J.s
+e = 1.602176634e-19  # C
+hc_eVnm = h * c / e * 1e9
+
+# name: (factor, laser dependent offset, label)
+units = OrderedDict([
+    ('nm', (None, False, 'Photon wavelength')),
+    ('cm-1', (-1e7, True, 'Raman shift')),
+    ('cm-1 abs', (1e7, False, 'Wavenumber')),
+    ('eV', (hc_eVnm, False, 'Photon energy')),
+    ('THz', (c * 1e-3, False, 'Frequency')),
+    ('rad/fs', (2 * np.pi * c * 1e-6, False, 'Angular frequency')),
+])
+
+
+def _coefficients(unit, laser_wl=None):
+    if unit not in units:
+        raise ValueError(f'Unknown unit {unit}, should be one of {list(units.keys())}')
+    factor, laser_dependent, label = units[unit]
+    offset = 0.
+    if laser_dependent:
+        if not laser_wl:
+            raise ValueError(f'The laser wavelength is needed to convert to {unit}')
+        offset = 1e7 / laser_wl
+    return factor, offset
+
+
+def _kernel(data, factor, offset, out):
+    if np.ndim(data) == 0:
+        return float(factor / data + offset)
+    out = np.divide(factor, data, out=out)
+    if offset != 0.:
+        np.add(out, offset, out=out)
+    return out
+
+
+def from_nm(data_nm, unit, laser_wl=None, out=None):
+    """
+    Convert wavelengths (nm) into unit
+
+    Parameters
+    ----------
+    data_nm: (float or ndarray)
+    unit: (str) one of units
+    laser_wl: (float) the laser wavelength in nm (only used for the relative wavenumber: cm-1)
+    out: (ndarray) array where to write the result (can be data_nm itself)
+
+    Returns
+    -------
+    float or ndarray
+    """
+    factor, offset = _coefficients(unit, laser_wl)
+    if factor is None:
+        if out is None:
+            return data_nm if np.ndim(data_nm) == 0 else np.array(data_nm)
+        out[...] = data_nm
+        return out
+    return _kernel(data_nm, factor, offset, out)
+
+
+def to_nm(data, unit, laser_wl=None, out=None):
+    """
+    Convert values in unit into wavelengths (nm), see from_nm
+    """
+    factor, offset = _coefficients(unit, laser_wl)
+    if factor is None:
+        return from_nm(data, 'nm', out=out)
+    if offset != 0.:
+        if np.ndim(data) == 0:
+            return float(factor / (data - offset))
+        out = np.subtract(data, offset, out=out)
+        return _kernel(out, factor, 0., out)
+    return _kernel(data, factor, 0., out)
+
+
+def convert(data, from_unit, to_unit, laser_wl=None, out=None):
+    """
+    Convert values between any of the units
+    """
+    if from_unit == to_unit:
+        return from_nm(data, 'nm', out=out)
+    return from_nm(to_nm(data, from_unit, laser_wl, out=out), to_unit, laser_wl, out=out)
+
+
+def jacobian(data_nm, unit, out=None):
+    """
+    Jacobian |dλ/dy| of the conversion from nm to unit: a spectral density per nm is converted into a density per
+    unit by multiplying it by this factor (intensity conservation)
+
+    Parameters
+    ----------
+    data_nm: (float or ndarray) the wavelengths in nm
+    unit: (str) one of units
+    out: (ndarray) array where to write the result
+
+    Returns
+    -------
+    float or ndarray
+    """
+    factor = units[unit][0]
+    if factor is None:
+        if out is None:
+            return 1. if np.ndim(data_nm) == 0 else np.ones(np.shape(data_nm))
+        out[...] = 1.
+        return out
+    if np.ndim(data_nm) == 0:
+        return float(data_nm**2 / abs(factor))
+    out = np.multiply(data_nm, data_nm, out=out)
+    np.multiply(out, 1 / abs(factor), out=out)
+    return out
+
+
+def label(unit):
+    return units[unit][2]
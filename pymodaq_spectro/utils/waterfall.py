@@ -0,0 +1,227 @@
+import numpy as np
+import pyqtgraph as pg
+from qtpy import QtWidgets, QtCore
+from qtpy.QtCore import QRectF
+
+
+class WaterfallBuffer:
+    """
+    Preallocated ring buffer of the last n_rows spectra, rows are written in place (no roll) and the row of the
+    newest spectrum is tracked by a cursor. The min and max of each row are kept so that the levels follow the
+    spectra currently in the buffer.
+
+    Parameters
+    ----------
+    n_rows: (int) number of spectra kept
+    """
+    def __init__(self, n_rows=500):
+        self.n_rows = n_rows
+        self.data = None
+        self.count = 0
+        self.row_min = np.full((n_rows,), np.nan)
+        self.row_max = np.full((n_rows,), np.nan)
+
+    def reset(self, n_pixels=None):
+        if n_pixels is None and self.data is not None:
+            n_pixels = self.data.shape[1]
+        self.data = None if n_pixels is None else np.full((self.n_rows, n_pixels), np.nan)
+        self.count = 0
+        self.row_min = np.full((self.n_rows,), np.nan)
+        self.row_max = np.full((self.n_rows,), np.nan)
+
+    def set_rows(self, n_rows):
+        self.n_rows = n_rows
+        self.reset()
+
+    @property
+    def cursor(self):
+        """int: the row where the next spectrum will be written"""
+        return self.count % self.n_rows
+
+    def add(self, spectrum):
+        """
+        Copy a spectrum in the next row, the buffer is reallocated if the number of pixels changes
+        """
+        if self.data is None or self.data.shape[1] != np.size(spectrum):
+            self.reset(np.size(spectrum))
+        row = self.data[self.cursor]
+        row[:] = spectrum
+        if np.all(np.isnan(row)):
+            self.row_min[self.cursor] = self.row_max[self.cursor] = np.nan
+        else:
+            self.row_min[self.cursor] = np.nanmin(row)
+            self.row_max[self.cursor] = np.nanmax(row)
+        self.count += 1
+
+    def levels(self):
+        """
+        Returns
+        -------
+        tuple of float or None: (min, max) of the spectra in the buffer, None if there is no valid data
+        """
+        if np.all(np.isnan(self.row_min)):
+            return None
+        return np.nanmin(self.row_min), np.nanmax(self.row_max)
+
+    def display_step(self, max_rows):
+        """int: the decimation step in time so that at most max_rows rows are displayed"""
+        return max(1, int(np.ceil(self.n_rows / max_rows)))
+
+    def display_rows(self, max_rows):
+        """
+        Get a view of the buffer decimated in time so that it has at most max_rows rows
+
+        Returns
+        -------
+        ndarray: the (possibly strided) view
+        int: the decimation step
+        """
+        step = self.display_step(max_rows)
+        return self.data[::step], step
+
+    def new_rows(self, since_count):
+        """
+        Rows written since the buffer count was since_count
+
+        Returns
+        -------
+        ndarray: the indexes of the rows (all the rows if more than n_rows spectra have been added since)
+        """
+        if since_count < 0 or self.count - since_count >= self.n_rows or since_count > self.count:
+            return np.arange(self.n_rows)
+        return np.arange(since_count, self.count) % self.n_rows
+
+
+class WaterfallWidget(QtWidgets.QWidget):
+    """
+    Spectrum vs time image of the last spectra. The image is displayed in sweep mode: rows are overwritten in place,
+    a line showing the newest one, so that no data is moved when a spectrum is added. The displayed image is
+    persistent: at each refresh only the rows added since the previous one are copied into it (decimated in time if
+    needed) before the image item is updated. Rendering is throttled to the refresh timer and only done if new rows
+    have been added. The levels are the min and max of the spectra currently in the buffer.
+
+    The image is mapped linearly between the first and last values of the spectral axis: for an axis that is not
+    linear in pixels (eV or cm-1 from a grating spectrometer) the position of a feature in the waterfall is
+    approximate, the exact axis being the one of the main viewer.
+    """
+    def __init__(self, n_rows=500, refresh_ms=50):
+        super().__init__()
+        self.buffer = WaterfallBuffer(n_rows)
+        self.x_axis = None
+        self._rendered_count = 0
+        self._image = None  # the displayed (decimated) image, updated in place
+        self._image_source = None  # the buffer data and decimation step the image has been built from
+        self.setupUI()
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+
+    def setupUI(self):
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        settings_layout = QtWidgets.QHBoxLayout()
+        self.enable_cb = QtWidgets.QCheckBox('Enabled')
+        self.enable_cb.setChecked(True)
+        settings_layout.addWidget(self.enable_cb)
+        settings_layout.addWidget(QtWidgets.QLabel('Spectra:'))
+        self.rows_sb = QtWidgets.QSpinBox()
+        self.rows_sb.setRange(2, 1000000)
+        self.rows_sb.setValue(self.buffer.n_rows)
+        self.rows_sb.valueChanged.connect(self.buffer.set_rows)
+        settings_layout.addWidget(self.rows_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Channel:'))
+        self.channel_sb = QtWidgets.QSpinBox()
+        self.channel_sb.setRange(0, 100)
+        self.channel_sb.valueChanged.connect(lambda: self.buffer.reset())
+        settings_layout.addWidget(self.channel_sb)
+        settings_layout.addWidget(QtWidgets.QLabel('Max displayed:'))
+        self.max_rows_sb = QtWidgets.QSpinBox()
+        self.max_rows_sb.setRange(2, 100000)
+        self.max_rows_sb.setValue(1000)
+        self.max_rows_sb.setToolTip('Above this number of spectra, the image is decimated in time for display')
+        self.max_rows_sb.valueChanged.connect(self.invalidate)
+        settings_layout.addWidget(self.max_rows_sb)
+        reset_pb = QtWidgets.QPushButton('Reset')
+        reset_pb.clicked.connect(lambda: self.buffer.reset())
+        settings_layout.addWidget(reset_pb)
+        layout.addLayout(settings_layout)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setLabel('left', 'Spectrum index')
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.plot_widget.addItem(self.image_item)
+        self.cursor_line = pg.InfiniteLine(angle=0, pen='r')
+        self.plot_widget.addItem(self.cursor_line)
+        self.histogram = pg.HistogramLUTWidget(image=self.image_item)
+        horlayout = QtWidgets.QHBoxLayout()
+        horlayout.addWidget(self.plot_widget)
+        horlayout.addWidget(self.histogram)
+        layout.addLayout(horlayout)
+
+    def add_spectra(self, spectra):
+        """
+        Add the spectrum of the selected channel
+
+        Parameters
+        ----------
+        spectra: (list of ndarray) the spectra of all channels
+        """
+        if self.enable_cb.isChecked() and self.channel_sb.value() < len(spectra):
+            self.buffer.add(spectra[self.channel_sb.value()])
+
+    def set_axis(self, axis):
+        """
+        Parameters
+        ----------
+        axis: (utils.Axis) the displayed spectral axis, mapped linearly on the image (see the class docstring)
+        """
+        if axis['data'] is not None and (self.x_axis is None or not np.array_equal(axis['data'], self.x_axis)):
+            self.x_axis = np.array(axis['data'])
+            self.plot_widget.setLabel('bottom', axis['label'], units=axis['units'])
+            self.invalidate()
+
+    def invalidate(self):
+        """Rebuild the whole displayed image at the next refresh"""
+        self._rendered_count = -1
+
+    def update_image(self):
+        """
+        Copy the rows added since the last refresh into the displayed image, rebuilt if the buffer has been
+        reallocated or the decimation changed
+
+        Returns
+        -------
+        bool: True if the image has been rebuilt (its shape or rect may have changed)
+        """
+        step = self.buffer.display_step(self.max_rows_sb.value())
+        if self._image_source is None or self._image_source[0] is not self.buffer.data or \
+                self._image_source[1] != step:
+            self._image_source = (self.buffer.data, step)
+            self._image = np.array(self.buffer.data[::step], dtype=np.float32)
+            return True
+        rows = self.buffer.new_rows(self._rendered_count)
+        rows = rows[rows % step == 0]
+        self._image[rows // step] = self.buffer.data[rows]
+        return False
+
+    def refresh(self):
+        if not self.isVisible() or self.buffer.data is None or self.buffer.count == self._rendered_count:
+            return
+        rebuilt = self.update_image()
+        levels = self.buffer.levels()
+        if levels is not None and levels[1] > levels[0]:
+            self.image_item.setLevels(levels, update=False)
+        if rebuilt or self._rendered_count < 0:
+            self.image_item.setImage(self._image, autoLevels=False)
+            n_pixels = self._image.shape[1]
+            if self.x_axis is not None and self.x_axis.size == n_pixels:
+                x0, x1 = self.x_axis[0], self.x_axis[-1]
+            else:
+                x0, x1 = 0, n_pixels - 1
+            self.image_item.setRect(QRectF(x0, 0, x1 - x0, self.buffer.n_rows))
+        else:
+            self.image_item.updateImage()
+        self.cursor_line.setValue(self.buffer.cursor)
+        self._rendered_count = self.buffer.count
@@ -0,0 +1,55 @@
+"""
+Fixtures of the hot path benchmarks: synthetic spectra for all the combinations of pixels and channels (the
+Spectrometer and stub detector fixtures are in the conftest of the tests)
+"""
+import itertools
+from collections import OrderedDict
+import numpy as np
+import pytest
+
+pixels = [512, 2048, 8192, 16384]
+channels = [1, 2, 8]
+
+
+def synthetic_spectra(npixels, nchannels, npeaks=10, noise=0.01, seed=0):
+    """
+    Create synthetic spectra: lorentzian peaks on a slowly varying background plus noise
+
+    Returns
+    -------
+    ndarray: the axis in nm
+    list of ndarray: one spectrum per channel
+    """
+    rng = np.random.default_rng(seed)
+    axis = np.linspace(500, 700, npixels)
+    centers = rng.uniform(axis[0], axis[-1], npeaks)
+    widths = rng.uniform(0.1, 1, npeaks)
+    heights = rng.uniform(0.2, 1, npeaks)
+    spectrum = np.sum(heights[:, None] / (1 + ((axis[None, :] - centers[:, None]) / widths[:, None])**2), axis=0)
+    spectrum += 0.1 * (1 + np.sin(axis / 50))
+    return axis, [spectrum + noise * rng.standard_normal(npixels) for ind in range(nchannels)]
+
+
+@pytest.fixture(params=list(itertools.product(pixels, channels)), ids=lambda size: f'{size[0]}pxls-{size[1]}CH')
+def size(request):
+    """(number of pixels, number of channels)"""
+    return request.param
+
+
+@pytest.fixture(params=pixels, ids=lambda npixels: f'{npixels}pxls')
+def axis(request):
+    return np.linspace(500, 700, request.param)
+
+
+@pytest.fixture
+def spectra(size):
+    return synthetic_spectra(*size)
+
+
+@pytest.fixture
+def frame(spectra):
+    """Synthetic data formatted as the OrderedDict emitted by the grab_done_signal of a DAQ_Viewer"""
+    axis, datas = spectra
+    return OrderedDict(name='Synthetic', data1D=OrderedDict(
+        [(f'CH{ind:03d}', dict(data=data, x_axis=dict(data=axis, units='nm', label='')))
+         for ind, data in enumerate(datas)]))
@@ -0,0 +1,60 @@
+"""
+Peak finding of the Calibration window (Calibration.update_peak_finding) and the calibration of a detector axis
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture
+def calibration(qapp, spectra):
+    pytest.importorskip('pymodaq')
+    from qtpy import QtWidgets
+    from pymodaq.daq_utils.gui_utils import DockArea
+    from pymodaq_spectro.utils.calibration import Calibration
+    axis, datas = spectra
+    win = QtWidgets.QMainWindow()
+    area = DockArea()
+    win.setCentralWidget(area)
+    calibration = Calibration(area)  # keeps a reference to its window
+    for ind, data in enumerate(datas):
+        calibration.filenames.append(f'CH{ind:02d}')
+        calibration.raw_datas[f'CH{ind:02d}'] = data
+    calibration.raw_axis = np.linspace(0, axis.size - 1, axis.size)
+    calibration.settings.sigTreeStateChanged.disconnect(calibration.parameter_tree_changed)  # no search per change
+    options = calibration.settings.child('peak_options')
+    options.clearChildren()  # the peak options group is shared by the Calibration instances
+    for channel in calibration.filenames:
+        options.addNew('Prominence')
+        option = options.children()[-1]
+        calibration.update_peak_source()
+        option.child('channel').setValue(channel)
+        option.child('prominence').setValue(0.1)
+        option.child('use_opts').setValue(True)
+    calibration.settings.sigTreeStateChanged.connect(calibration.parameter_tree_changed)
+    return calibration
+
+
+def test_update_peak_finding(benchmark, calibration):
+    benchmark(calibration.update_peak_finding)
+    assert len(calibration.peak_indexes) != 0
+
+
+def test_update_peak_finding_filtered(benchmark, calibration):
+    calibration.settings.child('peak_filter', 'filter_method').setValue('Savitzky-Golay')
+    calibration.settings.child('peak_filter', 'derivative').setValue(2)
+    benchmark(calibration.update_peak_finding)
+
+
+def test_peaks_table(benchmark, calibration):
+    calibration.update_peak_finding()
+    model = calibration.table_model
+    indexes = [model.index(row, col) for row in range(model.rowCount()) for col in range(model.columnCount())]
+    benchmark(lambda: [model.data(index) for index in indexes])
+
+
+def test_apply_calibration(benchmark, detector, frame):
+    detector.update_data(frame)
+    detector.calib_coeffs = [1e-9, 1e-6, 0.05, 600.]
+    benchmark(detector.apply_calibration)
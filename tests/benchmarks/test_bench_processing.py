@@ -0,0 +1,26 @@
+"""
+Live processing stages: baseline removal (the ALS/airPLS factorizations of the previous frame being reused) and
+smoothing/derivative filters
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('scipy')
+
+from pymodaq_spectro.utils.baseline import BaselineRemover
+from pymodaq_spectro.utils.filters import SpectralFilter
+
+
+@pytest.mark.parametrize('method', ['ALS', 'airPLS', 'Rolling ball', 'Polynomial'])
+def test_baseline(benchmark, spectra, method):
+    axis, datas = spectra
+    remover = BaselineRemover(method)
+    remover.process(datas)  # as for live frames, the previous frame state is kept
+    benchmark(remover.process, datas)
+
+
+@pytest.mark.parametrize('method, window, order, deriv', [('Savitzky-Golay', 21, 3, 0), ('Gaussian', 21, 2, 2),
+                                                          ('Moving average', 11, 2, 1)])
+def test_filter(benchmark, spectra, method, window, order, deriv):
+    axis, datas = spectra
+    benchmark(SpectralFilter(method, window, order, deriv).process, datas)
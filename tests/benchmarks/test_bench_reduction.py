@@ -0,0 +1,22 @@
+"""
+Reduction of the images of 2D detectors into spectra: full vertical binning and tracks with and without smile
+correction (the shift maps being computed once, as for live frames)
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from pymodaq_spectro.utils.reduction import ImageReducer
+
+tracks = [(0, 127), (128, 255), (256, 383), (384, 511)]
+
+
+@pytest.mark.parametrize('dtype', [np.uint16, np.float64], ids=['uint16', 'float64'])
+@pytest.mark.parametrize('mode, smile', [('FVB', 0.), ('Tracks', 0.), ('Tracks', 3.4)],
+                         ids=['FVB', 'tracks', 'tracks-smile'])
+def test_reduce(benchmark, mode, smile, dtype):
+    image = (np.random.default_rng(0).random((512, 2048)) * 1000).astype(dtype)
+    reducer = ImageReducer(mode, tracks, smile)
+    reducer.reduce(image)
+    benchmark(reducer.reduce, image)
@@ -0,0 +1,23 @@
+"""
+Spectrometer.save_data of the last frame of a stub detector, as h5 file and as ascii
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+pytest.importorskip('tables')
+
+
+@pytest.fixture
+def saved_path(spectrometer, detector, frame, tmp_path, monkeypatch):
+    spectrometer.show_data(frame, detector)
+    path = tmp_path.joinpath('saved')
+    monkeypatch.setattr('pymodaq_spectro.spectrometer.select_file', lambda *args, **kwargs: path)
+    return path
+
+
+def test_save_h5(benchmark, spectrometer, saved_path):
+    benchmark(spectrometer.save_data)
+
+
+def test_save_ascii(benchmark, spectrometer, saved_path):
+    benchmark(spectrometer.save_data, export=True)
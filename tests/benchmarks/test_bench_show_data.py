@@ -0,0 +1,43 @@
+"""
+Per frame processing of the Spectrometer: Spectrometer.show_data on the frames of a stub detector, with the display
+options and the live processing stages
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+def show(spectrometer, frame, det, qapp):
+    spectrometer.show_data(frame, det)
+    qapp.processEvents()  # the viewer is repainted
+
+
+def test_update_data(benchmark, detector, frame):
+    benchmark(detector.update_data, frame)
+
+
+def test_show_data(benchmark, qapp, spectrometer, detector, frame):
+    benchmark(show, spectrometer, frame, detector, qapp)
+
+
+def test_show_data_full_resolution(benchmark, qapp, spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'lod', value=False)
+    benchmark(show, spectrometer, frame, detector, qapp)
+
+
+def test_show_data_density(benchmark, qapp, spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'units', value='eV')
+    set_setting('acq_settings', 'jacobian', value=True)
+    benchmark(show, spectrometer, frame, detector, qapp)
+
+
+@pytest.mark.parametrize('method', ['ALS', 'Rolling ball'])
+def test_show_data_baseline(benchmark, qapp, spectrometer, detector, frame, set_setting, method):
+    set_setting('acq_settings', 'baseline', 'baseline_method', value=method)
+    spectrometer.configure_baseline(detector)
+    benchmark(show, spectrometer, frame, detector, qapp)
+
+
+def test_show_data_filter(benchmark, qapp, spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'filter', 'filter_method', value='Savitzky-Golay')
+    benchmark(show, spectrometer, frame, detector, qapp)
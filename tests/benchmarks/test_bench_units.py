@@ -0,0 +1,34 @@
+"""
+Unit conversion kernels of utils.units compared to the pymodaq conversion functions
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from pymodaq_spectro.utils import units
+
+
+def test_pymodaq_cm_1(benchmark, axis):
+    daq_utils = pytest.importorskip('pymodaq.daq_utils.daq_utils')
+    benchmark(daq_utils.Enm2cmrel, axis, 532.)
+
+
+def test_pymodaq_eV(benchmark, axis):
+    daq_utils = pytest.importorskip('pymodaq.daq_utils.daq_utils')
+    benchmark(daq_utils.nm2eV, axis)
+
+
+def test_from_nm(benchmark, axis):
+    benchmark(units.from_nm, axis, 'cm-1', 532.)
+
+
+@pytest.mark.parametrize('unit', ['cm-1', 'eV', 'THz', 'rad/fs'])
+def test_from_nm_out(benchmark, axis, unit):
+    out = np.empty_like(axis)
+    benchmark(units.from_nm, axis, unit, 532., out=out)
+
+
+def test_jacobian_out(benchmark, axis):
+    out = np.empty_like(axis)
+    benchmark(units.jacobian, axis, 'eV', out=out)
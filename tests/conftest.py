@@ -0,0 +1,60 @@
+import os
+import pytest
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """The QApplication of the tests, on the offscreen platform so that they run on headless machines"""
+    pytest.importorskip('qtpy')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from qtpy import QtWidgets
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication([])
+    return app
+
+
+@pytest.fixture(scope='session')
+def spectrometer(qapp):
+    """A Spectrometer in its own window, without its session restore"""
+    pytest.importorskip('pymodaq')
+    from qtpy import QtWidgets
+    from pymodaq.daq_utils.gui_utils import DockArea
+    from pymodaq_spectro.spectrometer import Spectrometer
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(Spectrometer, 'restore_session', lambda self: None)  # leave the user session alone
+        win = QtWidgets.QMainWindow()
+        area = DockArea()
+        win.setCentralWidget(area)
+        prog = Spectrometer(area)
+        yield prog
+    win.close()
+
+
+@pytest.fixture
+def detector(spectrometer):
+    """A calibrated detector without module (its axis comes with the data) displayed in the main viewer"""
+    from pymodaq_spectro.utils.spectro_detector import SpectroDetector
+    det = SpectroDetector(current_det=dict(laser=False, laser_list=[''], movable=False, calib=True), title='Stub')
+    det.viewer = spectrometer.viewer
+    spectrometer.configure_baseline(det)
+    spectrometer.selected = det
+    yield det
+    spectrometer.selected = spectrometer.offline_det
+
+
+@pytest.fixture
+def set_setting(spectrometer):
+    """Change settings of the spectrometer (the coalesced updates are applied at once), restored after the test"""
+    changed = []
+
+    def set_setting(*path, value):
+        param = spectrometer.settings.child(*path)
+        changed.append((param, param.value()))
+        param.setValue(value)
+        spectrometer.run_pending_updates()
+
+    yield set_setting
+    for param, value in reversed(changed):
+        param.setValue(value)
+    spectrometer.run_pending_updates()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+
+from pymodaq_spectro.utils.baseline import BaselineRemover, remove_baseline, smooth_baseline, penalty_band
+
+
+def synthetic(n_pixels=1000, seed=0):
+    """Narrow peaks on a broad fluorescence background"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, n_pixels)
+    background = 5 + 3 * x + 4 * np.exp(-(x - 0.4) ** 2 / 0.1)
+    peaks = sum([height * np.exp(-(x - center) ** 2 / (2 * 0.003 ** 2))
+                 for center, height in [(0.2, 10), (0.5, 6), (0.75, 8)]])
+    return background, peaks, background + peaks + 0.05 * rng.standard_normal(n_pixels)
+
+
+def test_penalty_band():
+    n = 8
+    D = np.diff(np.eye(n), 2, axis=0)
+    dense = 2 * D.T @ D
+    band = penalty_band(n, 2)
+    for offset in range(3):
+        assert np.allclose(band[2 - offset, offset:], np.diag(dense, offset))
+
+
+@pytest.mark.parametrize('method', ['ALS', 'airPLS', 'Rolling ball', 'Polynomial'])
+def test_synthetic_spectrum(method):
+    background, peaks, spectrum = synthetic()
+    options = dict(lam=1e5, p=0.01, radius=40, order=4)
+    corrected, baselines = remove_baseline([spectrum], method, **options)
+    far = peaks < 0.01  # away from the peaks
+    assert np.abs(baselines[0] - background)[far].mean() < 0.3
+    assert corrected[0].max() == pytest.approx(10, abs=1)
+
+
+def test_als_state_reuse():
+    background, peaks, spectrum = synthetic()
+    state = dict([])
+    first = smooth_baseline(spectrum, 'ALS', state=state)
+    factor = state['factor']
+    second = smooth_baseline(spectrum, 'ALS', state=state)  # same frame: solved with the cached factorization
+    assert state['factor'] is factor
+    assert np.allclose(first, second, atol=1e-2)
+
+
+def test_process_keeps_the_input():
+    background, peaks, spectrum = synthetic()
+    spectra = [spectrum.copy(), 2 * spectrum]
+    corrected = BaselineRemover('ALS').process(spectra)
+    assert np.array_equal(spectra[0], spectrum)
+    assert len(corrected) == 2 and corrected[1].shape == spectrum.shape
+
+
+@pytest.mark.parametrize('method', ['ALS', 'Rolling ball', 'Polynomial', 'None'])
+def test_ragged_channels(method):
+    spectra = [synthetic(1000)[2], synthetic(500)[2]]
+    remover = BaselineRemover(method, radius=20)
+    corrected = remover.process(spectra)
+    assert [data.shape for data in corrected] == [(1000,), (500,)]
+    for data, baseline, spectrum in zip(corrected, remover.baselines, spectra):
+        assert np.allclose(data + baseline, spectrum)
+        if method != 'None':
+            assert np.allclose(baseline, remover.baseline([spectrum])[0], atol=1e-2)
+
+
+def test_single_spectrum():
+    spectrum = synthetic()[2]
+    assert np.allclose(BaselineRemover('Rolling ball').process(spectrum)[0],
+                       BaselineRemover('Rolling ball').process([spectrum])[0])
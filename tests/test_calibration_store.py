@@ -0,0 +1,90 @@
+import pytest
+
+pytest.importorskip('pymodaq')
+
+from pymodaq_spectro.utils.calibration_store import CalibrationStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CalibrationStore(tmp_path.joinpath('calibrations.sqlite'))
+    yield store
+    store.close()
+
+
+def test_latest(store):
+    store.add('det', [0, 0, 0.1, 500], center_wl=500, created=1)
+    store.add('det', [0, 0, 0.1, 501], center_wl=500, created=2)
+    store.add('det', [0, 0, 0.1, 600], center_wl=600, created=3)
+    store.add('det', [0, 0, 0.2, 500], grating='1200', center_wl=500, created=4)
+    store.add('other', [0, 0, 0.3, 500], center_wl=500, created=5)
+    assert store.latest('det')['coeffs'] == [0, 0, 0.1, 600]
+    assert store.latest('det', center_wl=500.5)['coeffs'] == [0, 0, 0.1, 501]
+    assert store.latest('det', grating='1200')['slope_calib'] == 0.2
+    assert store.latest('det', center_wl=550) is None
+    assert store.latest('none') is None
+
+
+def test_latest_laser(store):
+    store.add('det', [0, 0, 1, 532], laser_wl=532., created=1)
+    store.add('det', [0, 0, 1, 633], laser_wl=632.8, created=2)
+    assert store.latest('det', laser_wl=532.)['center_calib'] == 532
+    assert store.latest('det', laser_wl=632.8)['center_calib'] == 633
+    assert store.latest('det', laser_wl=785.) is None
+    store.add('det', [0, 0, 1, 0], created=3)  # no laser information: matches any laser
+    assert store.latest('det', laser_wl=785.)['center_calib'] == 0
+
+
+def test_history_is_kept(tmp_path, store):
+    ids = [store.add('det', [0, 0, 1, ind], created=ind) for ind in range(5)]
+    store.close()
+    store = CalibrationStore(tmp_path.joinpath('calibrations.sqlite'))
+    assert [calib['id'] for calib in store.history('det')] == ids[::-1]
+    assert [calib['id'] for calib in store.history(limit=2)] == ids[:-3:-1]
+    assert store.get(ids[2])['center_calib'] == 2
+
+
+def test_xml_round_trip(tmp_path, store):
+    calib_id = store.add('det', [1e-6, 2e-4, 0.1, 532.5], center_wl=530)
+    filename = tmp_path.joinpath('calib.xml')
+    store.export_xml(calib_id, filename)
+    imported = store.get(store.import_xml(filename, 'det2', grating='600'))
+    assert imported['coeffs'] == pytest.approx([1e-6, 2e-4, 0.1, 532.5])
+    assert imported['grating'] == '600' and imported['comment'] == 'imported from calib.xml'
+
+
+@pytest.fixture
+def laser_detector(qapp):
+    """A detector whose plugin controls the laser (stub module answering nothing by itself)"""
+    from qtpy.QtCore import QObject, Signal
+    from pyqtgraph.parametertree import Parameter
+    from pymodaq.daq_utils.daq_utils import ThreadCommand
+    from pymodaq_spectro.utils.spectro_detector import SpectroDetector
+
+    class StubModule(QObject):
+        command_detector = Signal(ThreadCommand)
+
+        def __init__(self):
+            super().__init__()
+            self.title = 'StubLaser'
+            self.settings = Parameter.create(name='settings', type='group', children=[
+                {'name': 'grating', 'type': 'str', 'value': '600'}])
+            self.commands = []
+            self.command_detector.connect(lambda command: self.commands.append(command.command))
+
+    return SpectroDetector(StubModule(), dict(laser=True, laser_list=['532', '633'], movable=False, calib=False))
+
+
+def test_restored_once_the_laser_is_known(spectrometer, store, laser_detector, monkeypatch):
+    from pymodaq.daq_utils.daq_utils import ThreadCommand
+    monkeypatch.setattr(spectrometer, 'calib_store', store)
+    store.add('StubLaser', [0, 0, 1, 532], grating='600', laser_wl=532., created=1)
+    store.add('StubLaser', [0, 0, 1, 633], grating='600', laser_wl=633., created=2)
+    store.add('StubLaser', [0, 0, 1, 0], grating='600', laser_wl=785., created=3)
+    det = laser_detector
+    spectrometer.init_detector(det)
+    assert 'get_laser_wl' in det.module.commands and not det.ready
+    spectrometer.cmd_from_det(ThreadCommand('exposure_ms', [100.]), det)
+    assert not det.use_calib  # the laser is not known yet: nothing restored
+    spectrometer.cmd_from_det(ThreadCommand('laser_wl', [633.]), det)
+    assert det.ready and det.use_calib and det.calib_coeffs == [0, 0, 1, 633]
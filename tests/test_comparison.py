@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.comparison import Resampler, Trace
+
+
+def test_non_overlapping_axes():
+    trace = Trace('trace', np.linspace(500, 550, 51), np.ones(51))
+    target = Trace('target', np.linspace(600, 650, 11), np.zeros(11))
+    resampled = Resampler().resample(trace, target)
+    assert resampled.shape == (11,) and np.all(np.isnan(resampled))  # no extrapolation of the edge values
+
+
+def test_partial_overlap():
+    trace = Trace('trace', np.linspace(500, 550, 51), np.linspace(500, 550, 51))
+    target = Trace('target', np.linspace(540, 560, 21), np.zeros(21))
+    resampled = Resampler().resample(trace, target)
+    assert np.allclose(resampled[:11], target.axis[:11])
+    assert np.all(np.isnan(resampled[11:]))
+
+
+def test_unsorted_axis():
+    trace = Trace('trace', [3., 1., 2.], [30., 10., 20.])  # for instance in cm-1
+    target = Trace('target', [1.5, 2.5], [0., 0.])
+    assert np.allclose(Resampler().resample(trace, target), [15., 25.])
+
+
+def test_other_units():
+    trace = Trace('trace', np.arange(10.), np.ones(10), axis_units='pxls')
+    target = Trace('target', np.arange(10.), np.ones(10))
+    assert np.all(np.isnan(Resampler().resample(trace, target)))
+
+
+def test_cache():
+    traces = [Trace(f'trace{ind}', np.arange(10.), np.full(10, ind)) for ind in range(4)]
+    resampler = Resampler(max_size=2)
+    assert resampler.resample(traces[0], traces[0]) is traces[0].data
+    first = resampler.resample(traces[1], traces[0])
+    assert resampler.resample(traces[1], traces[0]) is first
+    assert (resampler.hits, resampler.misses) == (1, 1)
+    resampler.resample(traces[2], traces[0])
+    resampler.resample(traces[1], traces[0])  # most recently used
+    resampler.resample(traces[3], traces[0])
+    assert list(resampler.cache.keys()) == [(traces[1].id, traces[0].id), (traces[3].id, traces[0].id)]
+    resampler.forget(traces[0])
+    assert len(resampler.cache) == 0
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from pymodaq_spectro.utils.decimation import decimate_axis, decimate_minmax, lod_bins
+
+
+@pytest.mark.parametrize('n_points, n_bins', [(1000, 100), (1001, 100), (16384, 1024), (999, 7), (10, 10)])
+def test_minmax_preserved(n_points, n_bins):
+    rng = np.random.default_rng(0)
+    datas = rng.standard_normal((3, n_points))
+    datas[1, rng.integers(n_points)] = 100  # a single pixel spike is kept
+    decimated = decimate_minmax(datas, n_bins)
+    assert decimated.shape[1] % 2 == 0 and decimated.shape[1] <= 2 * n_bins + 2
+    assert np.array_equal(decimated.min(axis=1), datas.min(axis=1))
+    assert np.array_equal(decimated.max(axis=1), datas.max(axis=1))
+    assert np.all(decimated[:, 0::2] <= decimated[:, 1::2])
+
+
+def test_bins():
+    datas = np.arange(10.)[None, :] * [[1], [-1]]
+    assert np.array_equal(decimate_minmax(datas, 4), [[0, 2, 3, 5, 6, 8, 9, 9], [-2, 0, -5, -3, -8, -6, -9, -9]])
+    assert np.array_equal(decimate_axis(np.arange(10.), 4), [0, 2, 3, 5, 6, 8, 9, 9])
+
+
+@pytest.mark.parametrize('n_points, n_bins', [(1000, 100), (1001, 100), (999, 7)])
+def test_axis_matches_data(n_points, n_bins):
+    x = np.linspace(500, 600, n_points)
+    assert decimate_axis(x, n_bins).shape[0] == decimate_minmax(x, n_bins).shape[1]
+    assert decimate_axis(x, n_bins)[0] == x[0] and decimate_axis(x, n_bins)[-1] == x[-1]
+
+
+def test_single_spectrum():
+    data = np.sin(np.arange(100.))
+    assert np.array_equal(decimate_minmax(data, 10), decimate_minmax([data], 10))
+
+
+def test_ragged_channels():
+    datas = [np.sin(np.arange(1000.)), np.cos(np.arange(600.))]
+    decimated = decimate_minmax(datas, 100)
+    assert len(decimated) == 2
+    for data, channel in zip(datas, decimated):
+        assert np.array_equal(channel, decimate_minmax(data, 100)[0])
+        assert channel.min() == data.min() and channel.max() == data.max()
+
+
+def test_lod_bins():
+    x = np.linspace(0, 1, 16384)
+    assert lod_bins(x[:1000], (0, 1), 500) is None  # small data: full resolution
+    n_bins = lod_bins(x, (0, 1), 500)
+    assert n_bins == 512  # power of two
+    assert lod_bins(x, (0.4, 0.41), 500) is None  # zoomed in
+    assert lod_bins(x, (0.25, 0.75), 500) == 1024
+    assert lod_bins(x, (2, 3), 500) == n_bins  # nothing visible: the whole data
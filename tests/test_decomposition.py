@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.decomposition import IncrementalPCA, analyse
+
+
+def mixtures(n_spectra=200, n_pixels=64, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(-1, 1, n_pixels)
+    sources = np.array([np.exp(-(x - center) ** 2 / 0.02) for center in [-0.5, 0., 0.5]])
+    return rng.random((n_spectra, 3)) @ sources + 0.01 * rng.standard_normal((n_spectra, n_pixels))
+
+
+@pytest.mark.parametrize('batch_sizes', [[200], [1, 1, 198], [2, 50, 148], [3] * 66 + [2]])
+def test_incremental_pca(batch_sizes):
+    X = mixtures()
+    pca = IncrementalPCA(3)
+    start = 0
+    for size in batch_sizes:
+        pca.partial_fit(X[start:start + size])
+        start += size
+    assert pca.n_samples == X.shape[0]
+    _, S, Vt = np.linalg.svd(X - X.mean(axis=0), full_matrices=False)
+    assert np.allclose(pca.mean, X.mean(axis=0))
+    assert np.allclose(pca.singular_values, S[:3])
+    assert np.allclose(np.abs(np.sum(pca.components * Vt[:3], axis=1)), 1)  # same components, up to the sign
+
+
+def test_not_enough_spectra():
+    pca = IncrementalPCA(3)
+    pca.partial_fit(np.ones((2, 8)))
+    assert pca.components is None and pca.n_samples == 0
+
+
+def test_sequence_order(tmp_path):
+    tables = pytest.importorskip('tables')
+    path = tmp_path.joinpath('sequence.h5')
+    X = mixtures(6)
+    indexes = [99998, 99999, 100000, 100001, 0, 1]
+    with tables.open_file(str(path), 'w') as h5file:
+        for index, spectrum in zip(indexes, X):
+            group = h5file.create_group('/', f'frame_{index:05d}')
+            group._v_attrs['index'] = index
+            h5file.create_array(group, 'data', spectrum[None, :])
+    results = analyse(path, n_components=2, batch_size=4)
+    order = np.argsort(indexes)
+    expected = (X[order] - X.mean(axis=0)) @ results['components'].T
+    assert np.allclose(results['traces'], expected)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+
+from scipy.signal import savgol_filter
+from pymodaq_spectro.utils import filters
+
+
+@pytest.mark.parametrize('window, order, deriv', [(5, 2, 0), (11, 2, 0), (11, 3, 1), (21, 4, 2), (7, 3, 2)])
+def test_savitzky_golay_coefficients(window, order, deriv):
+    x = np.zeros(window)
+    x[window // 2] = 1  # impulse: the filter output is the reversed kernel
+    expected = savgol_filter(x, window, order, deriv=deriv, mode='nearest')[::-1]
+    assert np.allclose(filters.kernel('Savitzky-Golay', window, order, deriv), expected)
+
+
+@pytest.mark.parametrize('window, order, deriv', [(11, 2, 0), (15, 3, 1), (21, 4, 2)])
+def test_savitzky_golay_filter(window, order, deriv):
+    rng = np.random.default_rng(0)
+    data = np.cumsum(rng.standard_normal((3, 200)), axis=1)
+    filtered = filters.filter_spectra(data, 'Savitzky-Golay', window, order, deriv)
+    expected = savgol_filter(data, window, order, deriv=deriv, axis=-1, mode='nearest')
+    half = window // 2  # the edges are extended differently
+    assert np.allclose(filtered[:, half:-half], expected[:, half:-half])
+
+
+@pytest.mark.parametrize('method', ['Savitzky-Golay', 'Gaussian', 'Moving average'])
+def test_derivatives(method):
+    x = np.arange(100, dtype=float)
+    for deriv, data, expected in [(0, np.full_like(x, 3.), 3.), (1, 2 * x + 1, 2.), (2, 0.5 * x ** 2, 1.)]:
+        window = 11 if method != 'Savitzky-Golay' or deriv < 2 else 13
+        filtered = filters.filter_spectra([data], method, window, 2, deriv)[0]
+        assert np.allclose(filtered[20:-20], expected, rtol=1e-2 if method == 'Gaussian' else 1e-6)
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        filters.kernel('Savitzky-Golay', 5, 5)
+    with pytest.raises(ValueError):
+        filters.kernel('Savitzky-Golay', 11, 1, 2)
+    with pytest.raises(ValueError):
+        filters.SpectralFilter('Median')
+
+
+def test_ragged_channels():
+    rng = np.random.default_rng(0)
+    spectra = [rng.standard_normal(300), rng.standard_normal(100)]
+    spectral_filter = filters.SpectralFilter('Savitzky-Golay', 11, 2)
+    filtered = spectral_filter.process(spectra)
+    assert [data.shape for data in filtered] == [(300,), (100,)]
+    for data, spectrum in zip(filtered, spectra):
+        assert np.allclose(data, spectral_filter.process([spectrum])[0])
+
+
+def test_disabled():
+    spectra = [np.arange(10.)]
+    assert filters.SpectralFilter().process(spectra)[0] is spectra[0]
+
+
+def test_after_baseline():
+    from pymodaq_spectro.utils.baseline import BaselineRemover
+    x = np.linspace(0, 1, 400)
+    spectra = [5 + 3 * x + np.exp(-(x - 0.5) ** 2 / 1e-3), 2 - x + np.exp(-(x - 0.3) ** 2 / 1e-3)]
+    copies = [spectrum.copy() for spectrum in spectra]
+    spectral_filter = filters.SpectralFilter('Savitzky-Golay', 11, 2, 1)
+    processed = spectral_filter.process(BaselineRemover('Polynomial', order=1).process(spectra))
+    assert all([np.array_equal(spectrum, copy) for spectrum, copy in zip(spectra, copies)])
+    for data, spectrum in zip(processed, spectra):  # the derivative of the peaks only
+        assert np.abs(data[:20]).max() < 0.05 * np.abs(spectral_filter.process([spectrum])[0][:20]).max()
@@ -0,0 +1,31 @@
+"""
+Cold import time of the spectrometer module, measured in a fresh interpreter (see utils.benchmarks.import_time). The
+budget can be changed with the PYMODAQ_SPECTRO_IMPORT_BUDGET_MS environment variable.
+"""
+import os
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.benchmarks import import_time
+
+budget_ms = float(os.environ.get('PYMODAQ_SPECTRO_IMPORT_BUDGET_MS', 2000))
+
+
+def test_spectrometer_import_time():
+    runs = [import_time('pymodaq_spectro.spectrometer') for ind in range(3)]
+    total, timings = min(runs, key=lambda run: run[0])
+    slowest = '\n'.join([f'{timing:10.1f} ms  {name}' for timing, name in timings[:10]])
+    assert total <= budget_ms, f'import took {total:.1f} ms (budget: {budget_ms:.1f} ms), slowest imports:\n{slowest}'
+
+
+def test_heavy_modules_not_imported():
+    total, timings = import_time('pymodaq_spectro.spectrometer')
+    imported = set([name for timing, name in timings])
+    for module in ['pymodaq.dashboard', 'pymodaq_spectro.utils.calibration', 'units_converter.main',
+                   'qtpy.QtNetwork', 'pymodaq_spectro.utils.server', 'pymodaq_spectro.utils.shared_memory',
+                   'pymodaq_spectro.utils.sequencer', 'pymodaq_spectro.utils.mapping',
+                   'pymodaq_spectro.utils.decomposition', 'pymodaq_spectro.utils.comparison',
+                   'pymodaq_spectro.utils.peak_tracking', 'pymodaq_spectro.utils.roi', 'pymodaq_spectro.utils.waterfall']:
+        assert module not in imported, f'{module} is imported with the spectrometer module'
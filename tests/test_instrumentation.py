@@ -0,0 +1,79 @@
+import csv
+import json
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.instrumentation import FrameInstrumentation, StageTimer, stages
+
+
+def test_rolling_buffer():
+    timer = StageTimer(size=4)
+    assert timer.samples().size == 0 and timer.stats()['count'] == 0 and np.isnan(timer.stats()['p50'])
+    for duration in range(6):
+        timer.add(duration)
+    assert np.array_equal(timer.samples(), [2, 3, 4, 5])  # the oldest samples are overwritten, oldest first
+    stats = timer.stats()
+    assert stats['count'] == 6
+    assert stats['max'] == pytest.approx(5000) and stats['p50'] == pytest.approx(3500)  # ms
+    timer.reset()
+    assert timer.samples().size == 0
+
+
+def test_new_frame():
+    instrumentation = FrameInstrumentation(size=10)
+    for index, t0 in zip([0, 1, 4, 5], [1., 1.5, 2.5, 2.6]):
+        instrumentation.new_frame('det', dict(frame_index=index, timestamp=t0 - 0.01), t0)
+    instrumentation.new_frame('other', dict([]), 10.)  # no interval for the first frame of a source
+    instrumentation.frame_dropped()
+    assert instrumentation.frames == 5
+    assert instrumentation.dropped == 3  # frame_index 2 and 3 plus the merged display
+    assert np.allclose(instrumentation.timers['interval'].samples(), [0.5, 1., 0.1])
+    assert np.allclose(instrumentation.timers['signal_hop'].samples(), 0.01)
+    instrumentation.reset()
+    assert instrumentation.frames == 0 and instrumentation.dropped == 0
+    assert all([timer.samples().size == 0 for timer in instrumentation.timers.values()])
+
+
+def test_disabled():
+    instrumentation = FrameInstrumentation()
+    instrumentation.enabled = False
+    instrumentation.new_frame('det', dict(frame_index=0), 0.)
+    instrumentation.add('viewer', 1.)
+    instrumentation.frame_dropped()
+    assert instrumentation.frames == 0 and instrumentation.dropped == 0
+    assert instrumentation.timers['viewer'].samples().size == 0
+
+
+@pytest.fixture
+def instrumentation():
+    instrumentation = FrameInstrumentation(size=4)
+    for duration in [1e-3, 2e-3, 3e-3, 4e-3, 5e-3]:
+        instrumentation.add('viewer', duration)
+    instrumentation.add('baseline', 0.5)
+    return instrumentation
+
+
+def test_dump_csv(instrumentation, tmp_path):
+    path = tmp_path.joinpath('diagnostics.csv')
+    instrumentation.dump(path)
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0].keys()) == list(stages.keys())  # one column per stage, empty ones included
+    assert len(rows) == 4
+    assert [float(row['viewer']) for row in rows] == pytest.approx([2e-3, 3e-3, 4e-3, 5e-3])
+    assert [row['baseline'] for row in rows][1:] == ['', '', ''] and float(rows[0]['baseline']) == 0.5
+    assert all([row['total'] == '' for row in rows])
+
+
+def test_dump_json(instrumentation, tmp_path):
+    path = tmp_path.joinpath('diagnostics.json')
+    instrumentation.dump(path)
+    with open(path) as f:
+        content = json.load(f)
+    assert content['units'] == 's'
+    assert content['samples']['viewer'] == pytest.approx([2e-3, 3e-3, 4e-3, 5e-3])
+    assert content['stats']['viewer']['count'] == 5 and content['stats']['viewer']['max'] == pytest.approx(5e-3)
+    assert content['samples']['total'] == []
@@ -0,0 +1,95 @@
+import time
+import pytest
+
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.log_model import LogModel, LogWriter
+
+
+@pytest.fixture
+def model(qapp):
+    model = LogModel(max_size=5, flush_ms=50)
+    yield model
+    model.close()
+
+
+def texts(model):
+    return [(txt, count) for timestamp, txt, count in model.entries]
+
+
+def test_batched(qapp, model):
+    model.add('a')
+    assert model.rowCount() == 0  # displayed at the next flush only
+    start = time.perf_counter()
+    while model.rowCount() == 0 and time.perf_counter() - start < 5:
+        qapp.processEvents()
+        time.sleep(0.005)
+    assert texts(model) == [('a', 1)]
+    assert time.perf_counter() - start < 1
+
+
+def test_coalesced(model):
+    for txt in ['a', 'a', 'b', 'a', 'a', 'a']:
+        model.add(txt)
+    model.flush()
+    assert texts(model) == [('a', 2), ('b', 1), ('a', 3)]
+    assert model.data(model.index(2)).endswith('a (repeated 3 times)')
+
+
+def test_coalesced_with_the_last_entry(model):
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+    model.add('a')
+    model.flush()
+    model.add('a')
+    model.add('b')
+    model.flush()
+    assert texts(model) == [('a', 2), ('b', 1)]
+    assert changed == [0]  # the repeated entry is updated, not inserted
+
+
+def test_max_size(model):
+    for ind in range(4):
+        model.add(str(ind))
+    model.flush()
+    for ind in range(4, 12):
+        model.add(str(ind))
+    model.flush()
+    assert texts(model) == [(str(ind), 1) for ind in range(7, 12)]  # the oldest messages are dropped
+    model.set_max_size(2)
+    assert texts(model) == [('10', 1), ('11', 1)]
+    assert model.rowCount() == 2
+
+
+def test_writer(model, tmp_path):
+    path = tmp_path.joinpath('spectro.log')
+    model.set_writer(path)
+    for txt in ['a', 'a', 'b']:
+        model.add(txt)
+    model.flush()
+    model.set_writer(None)  # stopping the writer writes the queued lines
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [line.split(': ', 1)[1] for line in lines] == ['a', 'a', 'b']  # written without coalescing
+
+
+def test_writer_rotation(tmp_path):
+    path = tmp_path.joinpath('spectro.log')
+    writer = LogWriter(path, max_bytes=100, backups=2)
+    for ind in range(50):
+        writer.write(f'line {ind:02d}')
+    writer.stop()
+    assert sorted([file.name for file in tmp_path.iterdir()]) == ['spectro.log', 'spectro.log.1', 'spectro.log.2']
+    assert path.read_text(encoding='utf-8').splitlines()[-1] == 'line 49'
+
+
+def test_writer_background(tmp_path):
+    path = tmp_path.joinpath('spectro.log')
+    writer = LogWriter(path)
+    try:
+        writer.write('first')  # returns at once, written by the listener thread
+        start = time.perf_counter()
+        while 'first' not in path.read_text(encoding='utf-8') and time.perf_counter() - start < 5:
+            time.sleep(0.005)
+        assert path.read_text(encoding='utf-8') == 'first\n'  # flushed without waiting for stop
+    finally:
+        writer.stop()
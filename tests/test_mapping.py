@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.mapping import MapBuffer, Mapper, grid_positions
+
+
+def test_grid_positions():
+    x_values, y_values = np.array([0., 1., 2.]), np.array([10., 20.])
+    raster = grid_positions(x_values, y_values, snake=False)
+    assert [(pos['iy'], pos['ix']) for pos in raster] == [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]
+    snake = grid_positions(x_values, y_values)
+    assert [(pos['iy'], pos['ix']) for pos in snake] == [(0, 0), (0, 1), (0, 2), (1, 2), (1, 1), (1, 0)]
+    assert all([pos['x'] == x_values[pos['ix']] and pos['y'] == y_values[pos['iy']] for pos in snake])
+
+
+def test_map_buffer():
+    buffer = MapBuffer(np.arange(3), np.arange(2), band=(2, 4))
+    assert buffer.data.shape == (2, 3) and np.all(np.isnan(buffer.data))
+    buffer.add(1, 2, np.arange(10.))
+    buffer.add(0, 0, np.ones(10))
+    assert buffer.data[1, 2] == 9 and buffer.data[0, 0] == 3
+    assert (buffer.vmin, buffer.vmax, buffer.count) == (3, 9, 2)
+    buffer.reset(np.arange(3), np.arange(2))
+    buffer.add(0, 1, np.ones(10))
+    assert buffer.data[0, 1] == 10 and buffer.count == 1
+
+
+def test_grid_values(qapp):
+    mapper = Mapper()
+    for name, value in dict(x_start=-1., x_stop=1., nx=5, y_start=0., y_stop=2., ny=3).items():
+        mapper.settings.child(name).setValue(value)
+    x_values, y_values = mapper.grid_values()
+    assert np.allclose(x_values, [-1, -0.5, 0, 0.5, 1]) and np.allclose(y_values, [0, 1, 2])
+    mapper.set_actuators(['Xaxis', 'Yaxis'])
+    assert mapper.settings.child('y_actuator').opts['limits'] == ['None', 'Xaxis', 'Yaxis']
+    assert not mapper.running
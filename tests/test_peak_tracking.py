@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils import units
+from pymodaq_spectro.utils.peak_tracking import PeakTracker, PeakTrackerWidget, fwhm_factor
+
+
+def gaussian(axis, center, sigma, height=1., offset=0.):
+    return height * np.exp(-(axis - center) ** 2 / (2 * sigma ** 2)) + offset
+
+
+def test_fit():
+    axis = np.linspace(500, 600, 1001)
+    spectrum = gaussian(axis, 530.3, 1.2, 2., 0.1) + gaussian(axis, 570.6, 0.8, 1.)
+    tracker = PeakTracker()
+    tracker.set_ranges([(525, 535), (565, 576)])
+    tracker.n_iter = tracker.max_iter
+    tracker.budget_s = 10
+    for ind in range(3):  # warm started
+        results = tracker.process(spectrum, axis)
+    assert np.allclose(results[:, 0], [530.3, 570.6], atol=1e-3)
+    assert np.allclose(results[:, 1], [2., 1.], rtol=1e-3)
+    assert np.allclose(results[:, 2], [1.2 * fwhm_factor, 0.8 * fwhm_factor], rtol=1e-3)
+    times, centers = tracker.get_series('center')
+    assert centers.shape == (2, 3) and times[-1] == 0
+
+
+def test_peaks_off_the_axis():
+    axis = np.linspace(500, 600, 1001)
+    spectrum = gaussian(axis, 550.2, 1.)
+    tracker = PeakTracker()
+    tracker.set_ranges([(545, 555), (700, 710), (550, 550.1)])  # off the axis, narrower than the fitted minimum
+    results = tracker.process(spectrum, axis)
+    assert results.shape == (3, 4)
+    assert np.all(np.isfinite(results[0])) and np.all(np.isnan(results[1:]))
+    assert results[0, 0] == pytest.approx(550.2, abs=1e-2)
+    tracker.set_ranges([(700, 710)])
+    assert np.all(np.isnan(tracker.process(spectrum, axis)))
+    assert tracker.get_series('center')[1].shape == (1, 1)
+
+
+def test_windows_follow_the_axis():
+    tracker = PeakTracker()
+    tracker.set_ranges([(10, 20)])
+    axis = np.arange(100.)
+    tracker.update_windows(axis)
+    indexes = tracker._indexes
+    tracker.update_windows(axis)
+    assert tracker._indexes is indexes  # same axis object: not recomputed
+    shifted = axis + 5
+    tracker.update_windows(shifted)
+    assert tracker._starts[0] == 5 and tracker._axis is shifted
+
+
+def test_regions_follow_the_units(qapp):
+    widget = PeakTrackerWidget()
+    widget.timer.stop()
+    widget.set_plot_item(widget.plot_widget.plotItem)
+    widget.add_peak((530., 532.))
+    widget.set_units('cm-1', 515.)
+    expected = sorted(units.from_nm(np.array([530., 532.]), 'cm-1', 515.))
+    assert np.allclose(widget.tracker.ranges[0], expected)
+    widget.set_units('eV', 515.)
+    assert np.allclose(widget.tracker.ranges[0], sorted(units.from_nm(np.array([530., 532.]), 'eV')))
+    widget.set_units('nm', 515.)
+    assert np.allclose(widget.tracker.ranges[0], (530., 532.))
+    widget.close()
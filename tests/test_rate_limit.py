@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+import pytest
+
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils import rate_limit
+from pymodaq_spectro.utils.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual time.perf_counter of the rate_limit module (s)"""
+    clock = SimpleNamespace(now=1000.)
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(perf_counter=lambda: clock.now))
+    return clock
+
+
+@pytest.fixture
+def limiter(qapp):
+    calls = []
+    limiter = RateLimiter(lambda *args: calls.append(args), min_interval_ms=125)
+    limiter.calls = calls
+    yield limiter
+    limiter.cancel()
+
+
+def test_window_boundaries(clock, limiter):
+    limiter(1)
+    assert limiter.calls == [(1,)]  # the first call is immediate
+    clock.now += 0.125 - 2**-10
+    limiter(2)
+    assert limiter.calls == [(1,)] and limiter._timer.isActive()  # deferred to the end of the window
+    assert limiter._timer.interval() == 0  # int(125 - 124.02 ms)
+    limiter._call_pending()  # the timer fired
+    assert limiter.calls == [(1,), (2,)]
+    clock.now += 0.125
+    limiter._timer.stop()
+    limiter(3)
+    assert limiter.calls == [(1,), (2,), (3,)]  # exactly min_interval_ms after the previous call: immediate
+
+
+def test_last_value_only(clock, limiter):
+    limiter(1)
+    for value in [2, 3, 4]:
+        clock.now += 0.015625
+        limiter(value)
+    assert limiter._timer.interval() == 109  # the window of the first call, not restarted by the later ones
+    clock.now += 0.125  # a call while the timer is still active waits for it, even if the window has elapsed
+    limiter(5)
+    limiter._call_pending()
+    assert limiter.calls == [(1,), (5,)]
+
+
+def test_cancel(clock, limiter):
+    limiter(1)
+    limiter(2)
+    limiter.cancel()
+    assert not limiter._timer.isActive()
+    limiter._call_pending()
+    assert limiter.calls == [(1,)]
+
+
+def test_deferred_call(qapp, limiter):
+    limiter('a')
+    limiter('b')
+    limiter('c')
+    start = time.perf_counter()
+    while len(limiter.calls) < 2 and time.perf_counter() - start < 5:
+        qapp.processEvents()
+        time.sleep(0.001)
+    assert limiter.calls == [('a',), ('c',)]
+    assert time.perf_counter() - start >= 0.1
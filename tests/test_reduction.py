@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from pymodaq_spectro.utils.reduction import ImageReducer, parse_tracks, tracks_to_str
+
+
+def test_parse_tracks():
+    assert parse_tracks('0-127; 128-255') == [(0, 127), (128, 255)]
+    assert parse_tracks('10-5, 20-20;') == [(5, 10), (20, 20)]
+    assert parse_tracks(tracks_to_str([(0, 9), (12, 40)])) == [(0, 9), (12, 40)]
+    with pytest.raises(ValueError):
+        parse_tracks(' ; ')
+
+
+def test_fvb():
+    image = np.arange(24.).reshape((4, 6))
+    spectra = ImageReducer().reduce(image)
+    assert len(spectra) == 1 and np.array_equal(spectra[0], image.sum(axis=0))
+
+
+def test_tracks():
+    image = np.arange(40.).reshape((8, 5))
+    reducer = ImageReducer('Tracks', [(0, 2), (3, 7), (6, 20), (10, 12)])
+    spectra = reducer.reduce(image)
+    assert np.array_equal(spectra[0], image[:3].sum(axis=0))
+    assert np.array_equal(spectra[1], image[3:].sum(axis=0))
+    assert np.array_equal(spectra[2], image[6:].sum(axis=0))  # clipped to the image
+    assert np.array_equal(spectra[3], np.zeros(5))  # out of the image
+    assert reducer.names() == ['Track 0-2', 'Track 3-7', 'Track 6-20', 'Track 10-12']
+
+
+def test_no_overflow():
+    image = np.full((1024, 8), 65535, dtype=np.uint16)
+    assert np.all(ImageReducer().reduce(image)[0] == 1024 * 65535)
+
+
+def test_spectrum_passes_through():
+    spectrum = np.arange(10.)
+    assert ImageReducer('Tracks', [(0, 3)]).reduce(spectrum)[0] is spectrum
+
+
+@pytest.mark.parametrize('smile', [0.7, 3.4, -2.5])
+def test_smile(smile):
+    n_rows, n_cols, first, last = 21, 64, 2, 18
+    columns = np.arange(n_cols)
+    rows = np.arange(first, last + 1)
+    shifts = smile * ((rows - (first + last) / 2) / ((last - first) / 2)) ** 2
+    rng = np.random.default_rng(0)
+    image = rng.random((n_rows, n_cols))
+    expected = np.sum([np.interp(columns + shift, columns, image[row]) for row, shift in zip(rows, shifts)], axis=0)
+    reducer = ImageReducer('Tracks', [(first, last)], smile)
+    assert np.allclose(reducer.reduce(image)[0], expected)
+    assert np.allclose(reducer.reduce(image)[0], expected)  # shift maps reused
+
+
+def test_smile_correction():
+    """A curved line is straightened by the opposite smile"""
+    n_rows, n_cols, smile = 31, 100, 4.
+    rows = np.arange(n_rows)
+    shifts = smile * ((rows - 15) / 15) ** 2
+    image = np.array([np.exp(-(np.arange(n_cols) - 50 - shift) ** 2 / 2) for shift in shifts])
+    curved = ImageReducer('Tracks', [(0, 30)]).reduce(image)[0]
+    straight = ImageReducer('Tracks', [(0, 30)], smile).reduce(image)[0]
+    assert straight.max() > 1.2 * curved.max()
+    assert np.argmax(straight) == 50
+
+
+def test_configure():
+    reducer = ImageReducer()
+    reducer.reduce(np.ones((4, 4)))
+    reducer.configure(mode='Tracks', tracks=[(0, 1)])
+    assert np.array_equal(reducer.reduce(np.ones((4, 4)))[0], [2, 2, 2, 2])
+    assert reducer.state == dict(mode='Tracks', tracks=[[0, 1]], smile=0.)
+    with pytest.raises(ValueError):
+        reducer.configure(mode='Binning')
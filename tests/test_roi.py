@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils import units
+from pymodaq_spectro.utils.indexing import range_to_indexes
+from pymodaq_spectro.utils.roi import RoiIntegrator, SpectralRoi
+
+laser_wl = 532.
+
+
+def axis_in(axis_nm):
+    return lambda unit: units.from_nm(axis_nm, unit, laser_wl)
+
+
+def test_range_to_indexes():
+    axis = np.arange(10.)
+    assert range_to_indexes(axis, (2.5, 5)) == (3, 5)
+    assert range_to_indexes(axis[::-1], (5, 2.5)) == (4, 6)  # decreasing axis
+    assert range_to_indexes(axis, (20, 30)) is None
+
+
+def test_integrate():
+    axis_nm = np.linspace(540, 600, 61)
+    spectra = np.array([np.ones(61), np.arange(61.)])
+    integrator = RoiIntegrator()
+    integrator.set_rois([SpectralRoi('a', (550, 559.5), 'nm'), SpectralRoi('out', (700, 800), 'nm')])
+    values = integrator.process(spectra, axis_nm, axis_in(axis_nm))
+    assert np.array_equal(values[:, 0], [10, np.sum(np.arange(10, 20))])
+    assert np.all(np.isnan(values[:, 1]))
+
+
+def test_units():
+    axis_nm = np.linspace(540, 600, 601)
+    spectrum = np.random.default_rng(0).random(601)
+    bounds_nm = (560, 570)
+    shift = sorted(units.from_nm(np.array(bounds_nm), 'cm-1', laser_wl))
+    energy = sorted(units.from_nm(np.array(bounds_nm), 'eV'))
+    integrator = RoiIntegrator()
+    integrator.set_rois([SpectralRoi('nm', bounds_nm, 'nm'), SpectralRoi('cm-1', shift, 'cm-1'),
+                         SpectralRoi('eV', energy, 'eV')])
+    values = integrator.process([spectrum], axis_nm, axis_in(axis_nm))[0]
+    assert values[1] == pytest.approx(values[0]) and values[2] == pytest.approx(values[0])
+
+
+def test_indexes_follow_the_axis():
+    axis_nm = np.linspace(540, 600, 61)
+    integrator = RoiIntegrator()
+    integrator.set_rois([SpectralRoi('a', (550, 555), 'nm')])
+    integrator.process([np.ones(61)], axis_nm, axis_in(axis_nm))
+    assert integrator.rois[0].indexes == (10, 15)
+    shifted = axis_nm + 5
+    integrator.process([np.ones(61)], shifted, axis_in(shifted))
+    assert integrator.rois[0].indexes == (5, 10)
+
+
+def test_series():
+    axis_nm = np.arange(10.)
+    integrator = RoiIntegrator(history=3)
+    integrator.set_rois([SpectralRoi('a', (0, 9), 'nm')])
+    for ind in range(5):
+        integrator.process([np.full(10, ind), np.zeros(10)], axis_nm, axis_in(axis_nm), channel=0)
+    assert integrator.count == 5
+    assert np.array_equal(integrator.get_series()[:, 0], [20, 30, 40])
+    assert integrator.process([np.ones(10)], axis_nm, axis_in(axis_nm), channel=3) is not None
+    assert integrator.count == 5  # missing channel: not in the series
@@ -0,0 +1,136 @@
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq.daq_utils.daq_utils import ThreadCommand
+from pymodaq_spectro.utils.sequencer import Sequencer, ack_commands, sequence_steps
+
+
+@pytest.fixture
+def stub_detector(qapp):
+    """A detector whose stub module records the commands and snaps it receives, without answering"""
+    from types import SimpleNamespace
+    from qtpy import QtWidgets
+    from qtpy.QtCore import QObject, Signal
+    from pymodaq_spectro.utils.spectro_detector import SpectroDetector
+
+    class StubModule(QObject):
+        command_detector = Signal(ThreadCommand)
+
+        def __init__(self):
+            super().__init__()
+            self.title = 'Stub'
+            self.received = []
+            self.command_detector.connect(lambda command: self.received.append((command.command,
+                                                                                 command.attributes[0])))
+            self.ui = SimpleNamespace(single_pb=QtWidgets.QPushButton())
+            self.ui.single_pb.clicked.connect(lambda: self.received.append(('snap', None)))
+
+    det = SpectroDetector(StubModule(), dict(laser=False, laser_list=[''], movable=True, calib=True))
+    det.raw_data = [np.arange(8.)]
+    det.viewer_freq_axis['data'] = np.linspace(500, 600, 8)
+    return det
+
+
+@pytest.fixture
+def sequencer(qapp):
+    sequencer = Sequencer()
+    yield sequencer
+    sequencer.stop()
+    if sequencer.saver_thread is not None:
+        assert sequencer.saver_thread.wait(5000)
+
+
+def wait_for(qapp, condition, timeout_s=5):
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout_s:
+        qapp.processEvents()
+        time.sleep(0.001)
+    return condition()
+
+
+def answer(sequencer, det):
+    """Acknowledge the last command sent by the sequencer as the plugin would"""
+    command, value = det.module.received[-1]
+    if command == 'snap':
+        sequencer.data_received(det)
+    else:
+        sequencer.ack(ThreadCommand(ack_commands[command], [value]), det)
+
+
+def test_sequence_steps():
+    assert sequence_steps('set_exposure_ms', [10, 100], 2) == [
+        dict(command='set_exposure_ms', value=10), dict(command='snap'), dict(command='snap'),
+        dict(command='set_exposure_ms', value=100), dict(command='snap'), dict(command='snap')]
+    assert sequence_steps('set_spectro_wl', []) == []
+
+
+def test_get_steps(qapp):
+    sequencer = Sequencer()
+    sequencer.settings.child(('sequence_type')).setValue('Center wavelength scan')
+    sequencer.settings.child(('values')).setValue('600, 550,, 700 ')
+    assert sequencer.get_steps() == sequence_steps('set_spectro_wl', [600., 550., 700.])
+    assert not sequencer.running
+
+
+def test_steps_wait_for_the_acknowledgments(qapp, sequencer, stub_detector, tmp_path):
+    tables = pytest.importorskip('tables')
+    from pymodaq.daq_utils.h5backend import get_attr
+    det = stub_detector
+    path = tmp_path.joinpath('sequence.h5')
+    sequencer.start(det, sequence_steps('set_exposure_ms', [10., 20.], 2), path, attributes=dict(baseline='ALS'))
+    assert det.module.received == [('set_exposure_ms', 10.)]
+    sequencer.ack(ThreadCommand('spectro_wl', [600.]), det)  # not the awaited reply
+    sequencer.data_received(det)  # no snap requested yet
+    assert len(det.module.received) == 1
+    for ind in range(6):
+        answer(sequencer, det)
+        wait_for(qapp, lambda: len(det.module.received) > ind + 1 or not sequencer.running)  # possibly paused
+    assert not sequencer.running
+    assert det.module.received == [('set_exposure_ms', 10.), ('snap', None), ('snap', None),
+                                   ('set_exposure_ms', 20.), ('snap', None), ('snap', None)]
+    assert sequencer.saver_thread.wait(5000)  # the saver thread quits once the file is closed
+    with tables.open_file(str(path)) as h5file:
+        groups = sorted(h5file.root._v_groups.values(), key=lambda group: group._v_name)
+        assert [group._v_name for group in groups] == [f'frame_{ind:05d}' for ind in range(4)]
+        assert [get_attr(group, 'exposure_ms') for group in groups] == [10., 10., 20., 20.]
+        assert get_attr(groups[0], 'baseline') == 'ALS'
+        assert np.array_equal(groups[0].data.read(), [np.arange(8.)])
+
+
+@pytest.mark.parametrize('abort', [True, False])
+def test_step_timeout(qapp, sequencer, stub_detector, tmp_path, abort):
+    det = stub_detector
+    sequencer.settings.child(('timeout_ms')).setValue(10)
+    sequencer.settings.child(('abort_on_timeout')).setValue(abort)
+    messages = []
+    sequencer.status_signal.connect(messages.append)
+    sequencer.start(det, sequence_steps('set_spectro_wl', [600.]), tmp_path.joinpath('sequence.h5'))
+    assert wait_for(qapp, lambda: any(['no answer' in message for message in messages]))
+    if abort:
+        assert not sequencer.running and det.module.received == [('set_spectro_wl', 600.)]
+    else:  # the sequence goes on with the next step
+        assert sequencer.running and det.module.received[-1] == ('snap', None)
+
+
+def test_backpressure(qapp, sequencer, stub_detector, tmp_path):
+    det = stub_detector
+    sequencer.settings.child(('max_pending')).setValue(2)
+    sequencer.start(det, sequence_steps('set_exposure_ms', [10.], 4), tmp_path.joinpath('sequence.h5'))
+    sequencer.saver.saved_signal.disconnect(sequencer.frame_saved)  # the saves are acknowledged by the test
+    answer(sequencer, det)
+    for ind in range(2):
+        answer(sequencer, det)
+    assert len(det.module.received) == 3  # two frames waiting to be saved: paused
+    answer(sequencer, det)  # an unexpected frame does not restart the sequence
+    assert len(det.module.received) == 3 and sequencer.running
+    sequencer.frame_saved(0)
+    assert det.module.received[-1] == ('snap', None) and len(det.module.received) == 4
+    answer(sequencer, det)
+    sequencer.frame_saved(1)
+    sequencer.frame_saved(2)
+    answer(sequencer, det)
+    assert not sequencer.running and sequencer.settings.child(('progress')).value() == '5/5'
@@ -0,0 +1,110 @@
+"""
+SpectrumServer against a SpectrumClient on 127.0.0.1: the server runs in the Qt event loop, processed while waiting
+for the (blocking) client
+"""
+import select
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq_spectro.utils.server import (SpectrumServer, SpectrumClient, header_struct, max_header_length,
+                                          max_payload_length)
+
+
+def wait_until(qapp, condition, timeout=5.):
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError
+        qapp.processEvents()
+        time.sleep(0.001)
+
+
+def receive(qapp, client):
+    wait_until(qapp, lambda: len(select.select([client.socket], [], [], 0)[0]) != 0)
+    return client.receive()
+
+
+@pytest.fixture
+def server(qapp):
+    server = SpectrumServer()
+    assert server.start(0)
+    commands = []
+    server.command_signal.connect(commands.append)
+    server.commands = commands
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(qapp, server):
+    client = SpectrumClient('127.0.0.1', server.server.serverPort())
+    wait_until(qapp, lambda: len(server.clients) == 1)
+    yield client
+    client.close()
+
+
+def test_publish(qapp, server, client):
+    axis = np.linspace(500, 600, 32)
+    spectra = [np.arange(32.), np.ones(32)]
+    server.publish('det', spectra, axis, 'nm')
+    header, data = receive(qapp, client)
+    assert header['type'] == 'axis' and header['units'] == 'nm'
+    assert np.allclose(data, axis)
+    header, data = receive(qapp, client)
+    assert header['type'] == 'frame' and header['source'] == 'det'
+    assert np.allclose(data, spectra)
+
+    server.publish('det', spectra, axis, 'nm')  # same axis: not sent again
+    header, data = receive(qapp, client)
+    assert header['type'] == 'frame' and header['index'] == 1
+
+
+def test_command(qapp, server, client):
+    client.send_command('set_exposure_ms', 50, source='det')
+    wait_until(qapp, lambda: len(server.commands) == 1)
+    header = server.commands[0]
+    assert (header['command'], header['value'], header['source']) == ('set_exposure_ms', 50, 'det')
+    server.acknowledge(header['client'], header['command'])
+    header, data = receive(qapp, client)
+    assert header == dict(type='ack', command='set_exposure_ms', ok=True, message='')
+
+
+def test_unknown_command(qapp, server, client):
+    client.send_command('reboot')
+    header, data = receive(qapp, client)
+    assert header['type'] == 'ack' and header['command'] == 'reboot' and not header['ok']
+    assert len(server.commands) == 0
+
+
+@pytest.mark.parametrize('header', [b'[1, 2]', b'"snap"', b'null', b'{not json}', b'\xff'])
+def test_invalid_header(qapp, server, client, header):
+    client.socket.sendall(header_struct.pack(len(header), 0) + header)
+    header, data = receive(qapp, client)
+    assert header['type'] == 'ack' and not header['ok']
+    assert server.running and len(server.clients) == 1
+    client.send_command('snap')  # the connection is still usable
+    wait_until(qapp, lambda: len(server.commands) == 1)
+
+
+def test_acknowledge_disconnected(qapp, server, client):
+    client.send_command('snap')
+    wait_until(qapp, lambda: len(server.commands) == 1)
+    client.close()
+    wait_until(qapp, lambda: len(server.clients) == 0)
+    server.acknowledge(server.commands[0]['client'], 'snap', False, 'gone')
+
+
+@pytest.mark.parametrize('lengths', [(max_header_length + 1, 0), (2, max_payload_length + 1),
+                                     (2**32 - 1, 2**32 - 1)])
+def test_oversized_message(qapp, server, client, lengths):
+    client.socket.sendall(header_struct.pack(*lengths) + b'{}')
+    header, data = receive(qapp, client)
+    assert header['type'] == 'ack' and not header['ok'] and 'too large' in header['message']
+    wait_until(qapp, lambda: len(server.clients) == 0)
+    with pytest.raises(ConnectionError):
+        receive(qapp, client)  # disconnected by the server
+    assert server.running and len(server.commands) == 0
@@ -0,0 +1,74 @@
+import json
+import numpy as np
+
+from pymodaq_spectro.utils import session
+
+
+def test_round_trip(tmp_path):
+    axis = np.linspace(500, 600, 16)
+    spectra = dict(det0=(axis, [np.arange(16.), np.ones(16)]), det1=(None, [np.zeros(8)]), empty=(None, []))
+    state = dict(source='simulated', n_detectors=2, selected='det1', values=dict(value=np.float64(1.5),
+                                                                                     array=np.arange(3)))
+    session.save_session(tmp_path, state, spectra)
+    assert sorted([path.name for path in tmp_path.iterdir()]) == ['session.json', 'session.npz']
+
+    loaded, loaded_spectra = session.load_session(tmp_path)
+    assert loaded['source'] == 'simulated' and loaded['selected'] == 'det1'
+    assert loaded['values'] == dict(value=1.5, array=[0, 1, 2])
+    assert sorted(loaded_spectra.keys()) == ['det0', 'det1']
+    assert np.array_equal(loaded_spectra['det0'][0], axis)
+    assert np.array_equal(loaded_spectra['det0'][1], spectra['det0'][1])
+    assert loaded_spectra['det1'][0] is None
+    assert np.array_equal(loaded_spectra['det1'][1], [np.zeros(8)])
+
+
+def test_ragged_channels(tmp_path):
+    spectra = dict(det=(np.linspace(500, 600, 16), [np.arange(16.), np.ones(8), np.zeros(16)]))
+    session.save_session(tmp_path, dict([]), spectra)
+    state, loaded_spectra = session.load_session(tmp_path)
+    assert [data.shape for data in loaded_spectra['det'][1]] == [(16,), (8,), (16,)]
+    assert all([np.array_equal(data, spectrum) for data, spectrum in zip(loaded_spectra['det'][1], spectra['det'][1])])
+
+
+def test_single_array(tmp_path):
+    with open(tmp_path.joinpath('session.npz'), 'wb') as f:  # spectra saved as one 2D array per detector
+        np.savez(f, data_0=np.ones((2, 4)))
+    tmp_path.joinpath('session.json').write_text(json.dumps(dict(version=session.version,
+                                                                 spectra=[dict(title='det', index=0)])))
+    state, spectra = session.load_session(tmp_path)
+    assert spectra['det'][0] is None and len(spectra['det'][1]) == 2 and np.all(spectra['det'][1][1] == 1)
+
+
+def test_overwrite(tmp_path):
+    session.save_session(tmp_path, dict(index=0), dict(det=(None, [np.zeros(4)])))
+    session.save_session(tmp_path, dict(index=1), dict(det=(None, [np.ones(4)])))
+    state, spectra = session.load_session(tmp_path)
+    assert state['index'] == 1 and np.all(spectra['det'][1][0] == 1)
+
+
+def test_invalid_sessions(tmp_path):
+    assert session.load_session(tmp_path.joinpath('missing')) == (None, dict([]))
+    tmp_path.joinpath('session.json').write_text('{"version": 1, ')
+    assert session.load_session(tmp_path) == (None, dict([]))
+    tmp_path.joinpath('session.json').write_text(json.dumps(dict(version=session.version + 1)))
+    assert session.load_session(tmp_path) == (None, dict([]))
+    tmp_path.joinpath('session.json').write_text(json.dumps(dict(version=session.version,
+                                                                 spectra=[dict(title='det', index=0)])))
+    state, spectra = session.load_session(tmp_path)  # the spectra are lost but not the state
+    assert state is not None and spectra == dict([])
+
+
+def test_filter_settings():
+    state = dict(children=dict(
+        config_settings=dict(value=None, children=dict(selected_det=dict(value='det'), laser_wl=dict(value=532.))),
+        calib_settings=dict(children=dict(store_calib=dict(value=False), use_calib=dict(value=True)))))
+    state = session.filter_settings(state)
+    assert list(state['children']['config_settings']['children'].keys()) == ['laser_wl']
+    assert list(state['children']['calib_settings']['children'].keys()) == ['use_calib']
+
+
+def test_dock_state_to_json():
+    state = dict(main=('horizontal', [('dock', 'Viewer', {})], {'sizes': [100]}), float=[('dock', 'Floating')])
+    converted = session.dock_state_to_json(state)
+    assert converted == dict(main=['horizontal', [['dock', 'Viewer', {}]], {'sizes': [100]}], float=[])
+    assert state['float'] == [('dock', 'Floating')]
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+import pytest
+
+from pymodaq_spectro.utils.shared_memory import SharedSpectraReader, SharedSpectraWriter, segment_name
+
+
+@pytest.fixture
+def name():
+    return segment_name('pymodaq_spectro_test', f'{os.getpid()}-shm')
+
+
+@pytest.fixture
+def writer(name):
+    writer = SharedSpectraWriter(name, 4, 2, 16, np.float32)
+    yield writer
+    if writer.header is not None:
+        writer.close()
+
+
+def frame(seq):
+    return np.full((2, 16), seq, dtype=np.float32)
+
+
+def test_segment_name():
+    assert segment_name('pymodaq_spectro', 'Spectro 1/CH0') == 'pymodaq_spectro_Spectro_1_CH0'
+
+
+def test_write_read(writer, name):
+    reader = SharedSpectraReader(name)
+    assert reader.latest() == (-1, None)
+    axis = np.linspace(500, 600, 16)
+    for seq in range(3):
+        assert writer.write(frame(seq), axis) == seq
+    assert reader.axis_seq == 1  # the axis is only written when it changes
+    assert np.array_equal(reader.axis, axis)
+    seq, view = reader.latest()
+    assert seq == 2 and view.dtype == np.float32 and np.all(view == 2)
+    assert np.shares_memory(view, reader.data)
+    writer.write(frame(3))
+    frames, missed = reader.new_frames()
+    assert [seq for seq, view in frames] == [3] and missed == 0
+    reader.close()
+
+
+def test_overrun(writer, name):
+    reader = SharedSpectraReader(name)
+    seq = writer.write(frame(0))
+    view = reader.get(seq)
+    for ind in range(1, 6):
+        writer.write(frame(ind))
+    assert not reader.is_valid(seq) and reader.get(seq) is None
+    assert np.all(view == 4)  # the slot now holds another frame
+    frames, missed = reader.new_frames()
+    assert [seq for seq, view in frames] == [2, 3, 4, 5] and missed == 2
+    assert all([np.all(view == seq) for seq, view in frames])
+    del view, frames
+    reader.close()
+
+
+def test_reattach(writer, name):
+    reader = SharedSpectraReader(name)
+    writer.write(frame(0))
+    assert not reader.reattach_if_closed()
+    writer.close()
+    new_writer = SharedSpectraWriter(name, 8, 1, 32)
+    try:
+        assert reader.reattach_if_closed()
+        assert reader.shape == (1, 32) and reader.data.dtype == np.float64
+        assert reader.latest() == (-1, None)
+        new_writer.write(np.ones((1, 32)))
+        seq, view = reader.latest()
+        assert seq == 0 and np.all(view == 1)
+        del view
+        reader.close()
+    finally:
+        new_writer.close()
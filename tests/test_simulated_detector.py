@@ -0,0 +1,59 @@
+import time
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+pytest.importorskip('qtpy')
+
+from pymodaq.daq_utils.daq_utils import ThreadCommand
+from pymodaq_spectro.utils.simulated_detector import SimulatedSpectrometer, simulated_spectra
+
+
+@pytest.fixture
+def simulated(qapp):
+    simulated = SimulatedSpectrometer()
+    frames = []
+    simulated.grab_done_signal.connect(frames.append)
+    simulated.frames = frames
+    yield simulated
+    simulated.quit_fun()
+
+
+def snap(qapp, simulated, timeout_s=5):
+    n_frames = len(simulated.frames)
+    simulated.ui.single_pb.click()
+    start = time.perf_counter()
+    while len(simulated.frames) == n_frames and time.perf_counter() - start < timeout_s:
+        qapp.processEvents()
+        time.sleep(0.001)
+    return simulated.frames[-1]
+
+
+def test_simulated_spectra():
+    axis = np.linspace(540, 600, 1000)
+    spectra = simulated_spectra(axis, 532., np.array([1000.]), np.array([100.]), np.array([0.5]), exposure_ms=200,
+                                n_channels=2, noise=0, rng=np.random.default_rng(0))
+    assert spectra.shape == (2, 1000)
+    assert spectra.max() == pytest.approx(200, rel=0.05)  # scales with the exposure (peak between two pixels)
+    assert axis[np.argmax(spectra[0])] == pytest.approx(1e7 / (1e7 / 532 - 1000), abs=0.1)
+
+
+def test_frames_follow_the_settings(qapp, simulated):
+    simulated.settings.child('simulation', 'n_pixels').setValue(256)
+    simulated.settings.child('simulation', 'n_channels').setValue(3)
+    frame = snap(qapp, simulated)
+    assert len(frame['data1D']) == 3 and frame['data1D']['CH000']['data'].size == 256
+    simulated.command_detector.emit(ThreadCommand('set_exposure_ms', [50.]))
+    simulated.grating_moved(700.)
+    frame = snap(qapp, simulated)
+    assert simulated.worker.config['exposure_ms'] == 50.
+    assert np.mean(frame['data1D']['CH000']['x_axis']['data']) == pytest.approx(700.)
+    assert frame['frame_index'] == 1
+
+
+def test_worker_uses_its_snapshot(qapp, simulated, monkeypatch):
+    snap(qapp, simulated)
+    monkeypatch.setattr(simulated, 'get_axis', lambda: pytest.fail('axis cache used by the worker thread'))
+    monkeypatch.setattr(simulated, 'settings', None)  # no access to the main thread parameters either
+    frame = snap(qapp, simulated)
+    assert frame['frame_index'] == 1
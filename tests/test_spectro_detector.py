@@ -0,0 +1,93 @@
+import itertools
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+
+from pymodaq_spectro.utils.spectro_detector import SpectroDetector, merge_spectra
+
+
+def stub_detector(title, axis=None, datas=(), **capabilities):
+    current_det = dict(laser=False, laser_list=[''], movable=False, calib=True)
+    current_det.update(capabilities)
+    det = SpectroDetector(current_det=current_det, title=title)
+    det.viewer_freq_axis['data'] = axis
+    det.processed_data = list(datas)
+    return det
+
+
+def test_init_queries():
+    det = stub_detector('det', laser=True)
+    assert det.init_queries() == ['get_exposure_ms', 'get_spectro_wl', 'get_axis', 'get_laser_wl']
+    assert det.required_replies == {'spectro_wl', 'laser_wl'}
+    assert det.pending_replies == {'exposure_ms', 'spectro_wl', 'x_axis', 'laser_wl'}
+    assert not det.ready
+
+
+@pytest.mark.parametrize('replies', list(itertools.permutations(['exposure_ms', 'spectro_wl', 'x_axis', 'laser_wl'])))
+def test_replies_in_any_order(replies):
+    det = stub_detector('det', laser=True)
+    det.init_queries()
+    became_ready = [det.reply_received(reply) for reply in replies]
+    assert became_ready.count(True) == 1  # signalled once, by the last of the required replies
+    last_required = max([replies.index(reply) for reply in det.required_replies])
+    assert became_ready.index(True) == last_required
+    assert det.ready and len(det.pending_replies) == 0
+
+
+def test_unexpected_replies():
+    det = stub_detector('det')
+    det.init_queries()
+    assert not det.reply_received('laser_wl')  # not queried: the detector has no laser
+    assert not det.reply_received('exposure_ms')
+    assert not det.reply_received('exposure_ms')  # repeated (for instance after a change of the exposure)
+    assert not det.ready
+    assert det.reply_received('spectro_wl')
+    assert not det.reply_received('spectro_wl')  # already ready: not signalled again
+    assert det.ready
+
+
+def test_nothing_required():
+    det = stub_detector('det', calib=False)
+    assert det.init_queries() == ['get_exposure_ms']
+    assert det.ready  # ready right away, no reply will signal it
+    assert not det.reply_received('exposure_ms')
+
+
+def test_queried_again():
+    det = stub_detector('det')
+    det.init_queries()
+    det.reply_received('spectro_wl')
+    det.init_queries()  # for instance after a reinitialization of the plugin
+    assert not det.ready
+    assert det.reply_received('spectro_wl')
+
+
+def test_merge_overlapping_ranges():
+    axis0 = np.linspace(500, 600, 11)
+    axis1 = np.linspace(550, 650, 21)
+    detectors = [stub_detector('det0', axis0, [axis0, 2 * axis0]), stub_detector('det1', axis1, [-axis1])]
+    common_axis, datas, labels = merge_spectra(detectors)
+    assert np.array_equal(common_axis, np.unique(np.concatenate((axis0, axis1))))
+    assert labels == ['det0 CH00', 'det0 CH01', 'det1 CH00']
+    inside0 = common_axis <= 600
+    inside1 = common_axis >= 550
+    assert np.allclose(datas[0][inside0], common_axis[inside0])
+    assert np.allclose(datas[1][inside0], 2 * common_axis[inside0])
+    assert np.allclose(datas[2][inside1], -common_axis[inside1])
+    assert np.all(np.isnan(datas[0][~inside0])) and np.all(np.isnan(datas[2][~inside1]))  # not extrapolated
+    assert not np.any(np.isnan(datas[0][inside0 & inside1])) and not np.any(np.isnan(datas[2][inside0 & inside1]))
+
+
+def test_merge_descending_axis():
+    axis = np.linspace(1000, 500, 6)  # for instance converted from cm-1
+    common_axis, datas, labels = merge_spectra([stub_detector('det', axis, [np.arange(6.)])])
+    assert np.array_equal(common_axis, axis[::-1])
+    assert np.array_equal(datas[0], np.arange(6.)[::-1])
+
+
+def test_merge_without_data():
+    detectors = [stub_detector('empty', np.arange(4.)), stub_detector('no axis', None, [np.ones(4)])]
+    assert merge_spectra(detectors) == (None, [], [])
+    common_axis, datas, labels = merge_spectra(detectors + [stub_detector('det', np.arange(4.), [np.ones(4)])])
+    assert labels == ['det CH00'] and np.array_equal(common_axis, np.arange(4.))
@@ -0,0 +1,152 @@
+"""
+Per frame processing of the Spectrometer on a stub detector: the raw spectra are kept as received, the processed ones
+being displayed and analysed
+"""
+import time
+from collections import OrderedDict
+import numpy as np
+import pytest
+
+pytest.importorskip('pymodaq')
+
+
+@pytest.fixture
+def frame():
+    x = np.linspace(500, 600, 512)
+    datas = [10 + x / 100 + np.exp(-(x - center) ** 2 / 0.5) for center in [530, 560]]
+    return OrderedDict(name='Synthetic', data1D=OrderedDict(
+        [(f'CH{ind:03d}', dict(data=data, x_axis=dict(data=x, units='nm', label='')))
+         for ind, data in enumerate(datas)]))
+
+
+def test_raw_data_untouched(spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'baseline', 'baseline_method', value='ALS')
+    spectrometer.configure_baseline(detector)
+    copies = [np.array(channel['data']) for channel in frame['data1D'].values()]
+    spectrometer.show_data(frame, detector)
+    assert all([np.array_equal(data, copy) for data, copy in zip(detector.raw_data, copies)])
+    assert np.all(np.abs(np.array(detector.processed_data)).min(axis=1) < 0.5)  # the background has been removed
+    assert spectrometer.processing_state(detector)['baseline_method'] == 'ALS'
+
+
+def test_no_processing(spectrometer, detector, frame):
+    spectrometer.show_data(frame, detector)
+    assert detector.processed_data is detector.raw_data
+    assert spectrometer.processing_state(detector) == dict(baseline_method='None', filter_method='None')
+
+
+def test_saved_attributes(spectrometer, detector, frame, set_setting, tmp_path, monkeypatch):
+    tables = pytest.importorskip('tables')
+    from pymodaq.daq_utils.h5backend import get_attr
+    set_setting('acq_settings', 'baseline', 'baseline_method', value='Rolling ball')
+    spectrometer.configure_baseline(detector)
+    spectrometer.show_data(frame, detector)
+    path = tmp_path.joinpath('saved.h5')
+    monkeypatch.setattr('pymodaq_spectro.spectrometer.select_file', lambda *args, **kwargs: path)
+    spectrometer.save_data()
+    with tables.open_file(str(path)) as h5file:
+        groups = [group for group in h5file.walk_groups() if 'baseline_method' in group._v_attrs]
+        assert len(groups) == 1
+        assert get_attr(groups[0], 'baseline_method') == 'Rolling ball'  # json encoded by pymodaq
+        assert get_attr(groups[0], 'baseline_radius') == detector.baseline.options['radius']
+        arrays = [array.read() for array in h5file.walk_nodes(groups[0], classname='Array')
+                  if array.name.startswith('Data')]
+        assert any([np.allclose(array, frame['data1D']['CH000']['data']) for array in arrays])  # raw data saved
+
+
+def test_filter_on_the_processed_copy(spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'filter', 'filter_method', value='Savitzky-Golay')
+    set_setting('acq_settings', 'filter', 'derivative', value=1)
+    spectrometer.show_data(frame, detector)
+    assert np.array_equal(detector.raw_data[0], frame['data1D']['CH000']['data'])
+    assert np.abs(np.mean(detector.processed_data[0])) < 0.1  # derivative of the spectrum
+    state = spectrometer.processing_state(detector)
+    assert state['filter_method'] == 'Savitzky-Golay' and state['filter_derivative'] == 1
+    assert state['filter_window'] == spectrometer.spectral_filter.window
+
+
+def test_ragged_channels(spectrometer, detector, frame, set_setting):
+    set_setting('acq_settings', 'baseline', 'baseline_method', value='ALS')
+    set_setting('acq_settings', 'filter', 'filter_method', value='Savitzky-Golay')
+    spectrometer.configure_baseline(detector)
+    channel = frame['data1D']['CH001']
+    channel['data'] = channel['data'][:256]
+    spectrometer.show_data(frame, detector)
+    assert [np.size(data) for data in detector.processed_data] == [512, 256]
+    for data, raw in zip(detector.processed_data, detector.raw_data):
+        assert np.abs(data).max() < 0.5 * np.abs(raw).max()  # processed despite the different sizes
+
+
+@pytest.mark.parametrize('unit', ['nm', 'cm-1'])
+def test_ragged_channels_displayed(spectrometer, detector, set_setting, unit):
+    x = np.linspace(500, 600, 16384)
+    frame = OrderedDict(name='Synthetic', data1D=OrderedDict(
+        [(f'CH{ind:03d}', dict(data=np.sin(x[:size]), x_axis=dict(data=x, units='nm', label='')))
+         for ind, size in enumerate([16384, 8192])]))
+    set_setting('acq_settings', 'lod', value=True)
+    set_setting('acq_settings', 'jacobian', value=True)
+    set_setting('acq_settings', 'units', value=unit)
+    spectrometer.show_data(frame, detector)  # decimated (and rescaled) channel by channel
+    assert [np.size(data) for data in detector.processed_data] == [16384, 8192]
+    if unit == 'nm':  # in cm-1, the view range (in nm) is seen as a zoom: full resolution
+        assert detector.display_cache.get('n_bins', None) is not None
+
+
+def test_process_data_baseline(spectrometer, detector, frame, set_setting):
+    from pymodaq_spectro.utils.baseline import BaselineRemover
+    set_setting('acq_settings', 'baseline', 'baseline_method', value='Rolling ball')
+    spectrometer.configure_baseline(detector)
+    detector.raw_data = [np.array(channel['data']) for channel in frame['data1D'].values()]
+    copies = [data.copy() for data in detector.raw_data]
+    spectrometer.process_data(detector)
+    expected = BaselineRemover('Rolling ball', radius=detector.baseline.options['radius']).process(copies)
+    assert all([np.array_equal(data, copy) for data, copy in zip(detector.raw_data, copies)])
+    assert all([np.allclose(data, spectrum) for data, spectrum in zip(detector.processed_data, expected)])
+
+
+def test_process_data_baseline_then_filter(spectrometer, detector, frame, set_setting):
+    from pymodaq_spectro.utils.baseline import BaselineRemover
+    from pymodaq_spectro.utils.filters import SpectralFilter
+    set_setting('acq_settings', 'baseline', 'baseline_method', value='Rolling ball')
+    set_setting('acq_settings', 'filter', 'filter_method', value='Savitzky-Golay')
+    set_setting('acq_settings', 'filter', 'derivative', value=1)
+    spectrometer.configure_baseline(detector)
+    detector.raw_data = [np.array(channel['data']) for channel in frame['data1D'].values()]
+    spectrometer.process_data(detector)
+    remover = BaselineRemover('Rolling ball', radius=detector.baseline.options['radius'])
+    spectral_filter = SpectralFilter('Savitzky-Golay', spectrometer.spectral_filter.window,
+                                     spectrometer.spectral_filter.order, 1)
+    expected = spectral_filter.process(remover.process(detector.raw_data))
+    swapped = remover.process(spectral_filter.process(detector.raw_data))
+    assert all([np.allclose(data, spectrum) for data, spectrum in zip(detector.processed_data, expected)])
+    assert not all([np.allclose(data, spectrum) for data, spectrum in zip(detector.processed_data, swapped)])
+
+
+def test_schedule_update(qapp, spectrometer):
+    calls = []
+    for ind in range(3):
+        spectrometer.schedule_update('first', lambda: calls.append('first'))
+    spectrometer.schedule_update('second', lambda: spectrometer.schedule_update('third', lambda: calls.append('third')))
+    spectrometer.schedule_update('failing', lambda: 1 / 0)
+    spectrometer.schedule_update('last', lambda: calls.append('last'))
+    assert calls == []  # run at the next event loop iteration
+    assert spectrometer._tree_timer.isActive()
+    start = time.perf_counter()
+    while spectrometer._tree_timer.isActive() and time.perf_counter() - start < 5:
+        qapp.processEvents()
+    assert calls == ['first', 'last', 'third']  # once each, in order, an exception not stopping the others
+    assert len(spectrometer._pending_updates) == 0
+
+
+def test_ready_once_on_out_of_order_replies(spectrometer, monkeypatch):
+    from pymodaq.daq_utils.daq_utils import ThreadCommand
+    from pymodaq_spectro.utils.spectro_detector import SpectroDetector
+    det = SpectroDetector(current_det=dict(laser=True, laser_list=['532'], movable=False, calib=True), title='Other')
+    ready = []
+    monkeypatch.setattr(spectrometer, 'detector_ready', lambda det: ready.append((det.spectro_wl, det.laser_wl)))
+    det.init_queries()
+    for command, value in [('laser_wl', 532.), ('exposure_ms', 10.), ('laser_wl', 532.), ('spectro_wl', 600.),
+                           ('exposure_ms', 20.), ('spectro_wl', 610.)]:
+        spectrometer.cmd_from_det(ThreadCommand(command, [value]), det)
+    assert ready == [(600., 532.)]  # once, with the reply that made it ready already applied
+    assert det.exposure_ms == 20. and det.spectro_wl == 610.
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pymodaq_spectro.utils import units
+
+laser_wl = 532.
+
+
+@pytest.mark.parametrize('unit', list(units.units.keys()))
+def test_round_trip(unit):
+    wavelengths = np.linspace(540, 900, 101)
+    converted = units.from_nm(wavelengths, unit, laser_wl)
+    assert np.allclose(units.to_nm(converted, unit, laser_wl), wavelengths)
+    assert units.to_nm(units.from_nm(633., unit, laser_wl), unit, laser_wl) == pytest.approx(633.)
+
+
+@pytest.mark.parametrize('from_unit', list(units.units.keys()))
+@pytest.mark.parametrize('to_unit', list(units.units.keys()))
+def test_convert(from_unit, to_unit):
+    wavelengths = np.linspace(540, 900, 11)
+    values = units.from_nm(wavelengths, from_unit, laser_wl)
+    assert np.allclose(units.convert(values, from_unit, to_unit, laser_wl),
+                       units.from_nm(wavelengths, to_unit, laser_wl))
+
+
+def test_values():
+    assert units.from_nm(1000., 'eV') == pytest.approx(1.23984, rel=1e-5)
+    assert units.from_nm(1000., 'cm-1 abs') == pytest.approx(1e4)
+    assert units.from_nm(1000., 'THz') == pytest.approx(299.792458)
+    assert units.from_nm(1000., 'rad/fs') == pytest.approx(1.883652, rel=1e-6)
+    assert units.from_nm(laser_wl, 'cm-1', laser_wl) == pytest.approx(0)
+    assert units.from_nm(1e7 / (1e7 / laser_wl - 1000), 'cm-1', laser_wl) == pytest.approx(1000)  # Stokes shift
+
+
+def test_in_place():
+    wavelengths = np.linspace(500, 600, 11)
+    expected = units.from_nm(wavelengths, 'cm-1', laser_wl)
+    out = wavelengths.copy()
+    assert units.from_nm(out, 'cm-1', laser_wl, out=out) is out
+    assert np.allclose(out, expected)
+    assert units.to_nm(out, 'cm-1', laser_wl, out=out) is out
+    assert np.allclose(out, wavelengths)
+    nm = np.empty_like(wavelengths)
+    assert units.from_nm(wavelengths, 'nm', out=nm) is nm and np.array_equal(nm, wavelengths)
+
+
+def test_laser_needed():
+    with pytest.raises(ValueError):
+        units.from_nm(600., 'cm-1')
+    with pytest.raises(ValueError):
+        units.from_nm(600., 'Hz')
+
+
+@pytest.mark.parametrize('unit', list(units.units.keys()))
+def test_jacobian(unit):
+    wavelengths = np.linspace(540, 900, 101)
+    derivative = np.abs(np.gradient(wavelengths, units.from_nm(wavelengths, unit, laser_wl)))
+    assert np.allclose(units.jacobian(wavelengths, unit)[1:-1], derivative[1:-1], rtol=1e-3)
+    assert units.jacobian(700., unit) == pytest.approx(units.jacobian(np.array([700.]), unit)[0])
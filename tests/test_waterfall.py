@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pyqtgraph')
+
+from pymodaq_spectro.utils.waterfall import WaterfallBuffer
+
+
+def test_levels_follow_the_buffer():
+    buffer = WaterfallBuffer(3)
+    buffer.add(np.array([0., 100.]))
+    for ind in range(3):
+        buffer.add(np.array([1., 2.]))
+    assert buffer.levels() == (1., 2.)  # the first spectrum has been overwritten
+    buffer.add(np.full((2,), np.nan))
+    assert buffer.levels() == (1., 2.)
+
+
+def test_new_rows():
+    buffer = WaterfallBuffer(4)
+    for ind in range(6):
+        buffer.add(np.full((3,), ind))
+    assert list(buffer.new_rows(3)) == [3, 0, 1]
+    assert list(buffer.new_rows(1)) == [0, 1, 2, 3]
+    assert list(buffer.new_rows(-1)) == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('max_rows', [100, 3])
+def test_incremental_image(qapp, max_rows):
+    from pymodaq_spectro.utils.waterfall import WaterfallWidget
+    widget = WaterfallWidget(n_rows=10)
+    widget.timer.stop()
+    widget.max_rows_sb.setValue(max_rows)
+    widget.show()
+    rng = np.random.default_rng(0)
+    for count in [1, 4, 15, 2]:
+        for ind in range(count):
+            widget.add_spectra([rng.standard_normal(16)])
+        widget.refresh()
+        image, step = widget.buffer.display_rows(max_rows)
+        assert np.shares_memory(widget.image_item.image, widget._image)  # updated in place
+        assert np.allclose(widget._image, image, equal_nan=True)
+        assert tuple(widget.image_item.getLevels()) == widget.buffer.levels()
+    widget.close()